@@ -0,0 +1,400 @@
+"""Rolling analytics.
+
+Keeps rolling statistics of every ticker next to the returns calculation:
+52-week highs and lows in monotonic deques, volatility of daily returns over
+the same window with Welford's algorithm and the running peak of drawdowns.
+A new bar updates the state of a ticker in O(1), amortized for deques, and
+the state is saved between runs, so a run reads only bars since the last one.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from price_matrix import PriceMatrix
+
+# sessions of 52 weeks
+WINDOW = 252
+# daily returns needed for a volatility
+MIN_OBSERVATIONS = 20
+# columns of rolling analytics
+ANALYTICS = ("high_52w", "low_52w", "from_high", "from_low", "volatility", "drawdown")
+
+
+def _flatten(extremes: list[deque[tuple[int, float]]]) -> dict[str, np.ndarray]:
+    return {
+        "sizes": np.fromiter((len(extreme) for extreme in extremes), dtype=np.int64),
+        "bars": np.array([bar for extreme in extremes for bar, _ in extreme], dtype=np.int64),
+        "prices": np.array(
+            [price for extreme in extremes for _, price in extreme],
+            dtype=np.float64,
+        ),
+    }
+
+
+def _unflatten(sizes: np.ndarray, bars: np.ndarray, prices: np.ndarray) -> list[deque]:
+    if not len(sizes):
+        return []
+    splits = np.cumsum(sizes)[:-1]
+    return [
+        deque(zip(slot_bars.tolist(), slot_prices.tolist(), strict=True))
+        for slot_bars, slot_prices in zip(
+            np.split(bars, splits),
+            np.split(prices, splits),
+            strict=True,
+        )
+    ]
+
+
+class RollingAnalytics:
+    """Rolling state of tickers, moved bar by bar.
+
+    Tickers have slots in arrays of the state. Highs and lows are deques of
+    (bar, price) with prices decreasing, respectively increasing, from the
+    front, whose front is the extreme of the window. Daily returns of the
+    window are kept in a ring buffer, so the return leaving the window can be
+    taken out of the running mean and sum of squares.
+
+    Attributes:
+        window (int): sessions of highs, lows and volatility
+        tickers (list[str]): ticker of every slot
+        date (np.datetime64 | None): date of the last bar, None before the first one
+        bar (int): number of the last bar, -1 before the first one
+        last (np.ndarray): last price of every slot
+        peak (np.ndarray): highest price of every slot since it is tracked
+        returns (np.ndarray): ring buffer of daily returns with rows of bars of the window
+        count (np.ndarray): number of daily returns in the window
+        mean (np.ndarray): mean of daily returns in the window
+        m2 (np.ndarray): sum of squared deviations of daily returns in the window
+        highs (list[deque[tuple[int, float]]]): candidates for the high of every slot
+        lows (list[deque[tuple[int, float]]]): candidates for the low of every slot
+
+    """
+
+    def __init__(self, window: int = WINDOW) -> None:
+        """Init method.
+
+        Args:
+            window (int, optional): sessions of highs, lows and volatility.
+                Defaults to 252, i.e. 52 weeks.
+
+        """
+        self.window = window
+        self._clear()
+
+    def _clear(self) -> None:
+        self.tickers: list[str] = []
+        self._slots: dict[str, int] = {}
+        self.date: np.datetime64 | None = None
+        self.bar = -1
+        self.last = np.empty(0)
+        self.peak = np.empty(0)
+        self.returns = np.empty((self.window, 0))
+        self.count = np.empty(0, dtype=np.int64)
+        self.mean = np.empty(0)
+        self.m2 = np.empty(0)
+        self.highs: list[deque[tuple[int, float]]] = []
+        self.lows: list[deque[tuple[int, float]]] = []
+
+    def slots(self, tickers: np.ndarray | list[str]) -> np.ndarray:
+        """Get slots of tickers, new tickers get empty slots.
+
+        Args:
+            tickers (np.ndarray | list[str]): tickers
+
+        Returns:
+            np.ndarray: slot of every ticker
+
+        """
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self._slots]
+        if new:
+            n_new = len(new)
+            self._slots.update({ticker: len(self.tickers) + i for i, ticker in enumerate(new)})
+            self.tickers.extend(new)
+            self.last = np.append(self.last, np.full(n_new, np.nan))
+            self.peak = np.append(self.peak, np.full(n_new, np.nan))
+            self.returns = np.hstack((self.returns, np.full((self.window, n_new), np.nan)))
+            self.count = np.append(self.count, np.zeros(n_new, dtype=np.int64))
+            self.mean = np.append(self.mean, np.zeros(n_new))
+            self.m2 = np.append(self.m2, np.zeros(n_new))
+            self.highs.extend(deque() for _ in new)
+            self.lows.extend(deque() for _ in new)
+
+        return np.fromiter((self._slots[ticker] for ticker in tickers), dtype=np.intp)
+
+    def _reset(self, slots: np.ndarray) -> None:
+        self.last[slots] = np.nan
+        self.peak[slots] = np.nan
+        self.returns[:, slots] = np.nan
+        self.count[slots] = 0
+        self.mean[slots] = 0.0
+        self.m2[slots] = 0.0
+        for slot in slots.tolist():
+            self.highs[slot].clear()
+            self.lows[slot].clear()
+
+    def _add(self, slots: np.ndarray, returns: np.ndarray) -> None:
+        count = self.count[slots] + 1
+        delta = returns - self.mean[slots]
+        mean = self.mean[slots] + delta / count
+        self.m2[slots] += delta * (returns - mean)
+        self.mean[slots] = mean
+        self.count[slots] = count
+
+    def _remove(self, slots: np.ndarray, returns: np.ndarray) -> None:
+        count = self.count[slots] - 1
+        delta = returns - self.mean[slots]
+        mean = np.where(count > 0, self.mean[slots] - delta / np.maximum(count, 1), 0.0)
+        self.m2[slots] = np.where(count > 0, self.m2[slots] - delta * (returns - mean), 0.0)
+        self.mean[slots] = mean
+        self.count[slots] = count
+
+    def _push(self, bar: int, slots: np.ndarray, prices: np.ndarray) -> None:
+        """Add a bar of prices to slots.
+
+        Args:
+            bar (int): number of the bar
+            slots (np.ndarray): unique slots
+            prices (np.ndarray): price of every slot, NaN if it has none
+
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        ring = bar % self.window
+
+        # the return leaving the window is taken out of the running moments
+        leaving = self.returns[ring, slots]
+        left = ~np.isnan(leaving)
+        self._remove(slots[left], leaving[left])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = prices / self.last[slots] - 1
+        entering = np.isfinite(returns)
+        self.returns[ring, slots] = np.where(entering, returns, np.nan)
+        self._add(slots[entering], returns[entering])
+
+        priced = ~np.isnan(prices)
+        slots, prices = slots[priced], prices[priced]
+        self.last[slots] = prices
+        self.peak[slots] = np.fmax(self.peak[slots], prices)
+
+        expired = bar - self.window
+        for slot, price in zip(slots.tolist(), prices.tolist(), strict=True):
+            high = self.highs[slot]
+            while high and high[-1][1] <= price:
+                high.pop()
+            high.append((bar, price))
+            while high[0][0] <= expired:
+                high.popleft()
+
+            low = self.lows[slot]
+            while low and low[-1][1] >= price:
+                low.pop()
+            low.append((bar, price))
+            while low[0][0] <= expired:
+                low.popleft()
+
+    def _seed(self, bar: int, slots: np.ndarray, values: np.ndarray) -> None:
+        """Read all bars of empty slots.
+
+        Bars before the window only move peaks, so they are read at once.
+
+        Args:
+            bar (int): number of the last bar
+            slots (np.ndarray): unique empty slots
+            values (np.ndarray): prices with rows of bars up to the last one and columns of slots
+
+        """
+        skip = max(len(values) - self.window, 0)
+        if skip:
+            self.peak[slots] = np.fmax.reduce(values[:skip], axis=0)
+            self.last[slots] = values[skip - 1]
+
+        first = bar - len(values) + 1
+        for i in range(skip, len(values)):
+            self._push(first + i, slots, values[i])
+
+    def update(self, prices: PriceMatrix, row: int) -> int:
+        """Move the state to a bar of prices.
+
+        Only bars after the date of the state are read. Tickers seen for the
+        first time and tickers whose price at the date of the state changed,
+        e.g. with history adjusted for a split, are read again from the first bar.
+        The state starts over if prices do not contain its date or end before it.
+
+        Args:
+            prices (PriceMatrix): filled prices
+            row (int): row of the bar to move to
+
+        Returns:
+            int: number of bars read
+
+        """
+        position = -1
+        if self.date is not None:
+            position = int(np.searchsorted(prices.dates, self.date))
+            if position > row or prices.dates[position] != self.date:
+                info = f"rolling analytics of {self.date} do not continue prices, starting over"
+                logging.info(info)
+                self._clear()
+                position = -1
+
+        slots = self.slots(prices.tickers)
+        if position < 0:
+            # a new state reads all bars up to the row at once
+            self.bar = row
+            self._seed(self.bar, slots, prices.values[: row + 1])
+            self.date = prices.dates[row]
+            return row + 1
+
+        stale = ~np.isclose(
+            self.last[slots],
+            prices.values[position].astype(np.float64),
+            rtol=1e-6,
+            equal_nan=True,
+        )
+        columns = np.flatnonzero(stale)
+        if len(columns):
+            self._reset(slots[columns])
+            self._seed(self.bar, slots[columns], prices.values[: position + 1, columns])
+
+        for bar_row in range(position + 1, row + 1):
+            self.bar += 1
+            self._push(self.bar, slots, prices.values[bar_row])
+        self.date = prices.dates[row]
+
+        return row - position
+
+    def columns(self, tickers: np.ndarray | list[str]) -> dict[str, np.ndarray]:
+        """Get rolling analytics of tickers at the last bar.
+
+        Args:
+            tickers (np.ndarray | list[str]): tickers
+
+        Returns:
+            dict[str, np.ndarray]: column of ANALYTICS with a value of every ticker,
+                NaN if the ticker is not tracked or there are too few bars for the value
+
+        """
+        slots = np.fromiter((self._slots.get(ticker, -1) for ticker in tickers), dtype=np.intp)
+        known = np.flatnonzero(slots >= 0)
+        slots = slots[known]
+
+        high = np.full(len(slots), np.nan)
+        low = np.full(len(slots), np.nan)
+        expired = self.bar - self.window
+        for i, slot in enumerate(slots.tolist()):
+            highs, lows = self.highs[slot], self.lows[slot]
+            # deques of tickers without recent prices may hold bars out of the window
+            while highs and highs[0][0] <= expired:
+                highs.popleft()
+            while lows and lows[0][0] <= expired:
+                lows.popleft()
+            if highs:
+                high[i], low[i] = highs[0][1], lows[0][1]
+
+        last = self.last[slots]
+        count = self.count[slots]
+        # highs and lows of shorter histories, e.g. of backfills, are not 52-week ones
+        short = count < self.window - 1
+        high[short] = np.nan
+        low[short] = np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = self.m2[slots].clip(min=0) / (count - 1)
+            values = {
+                "high_52w": high,
+                "low_52w": low,
+                "from_high": last / high - 1,
+                "from_low": last / low - 1,
+                "volatility": np.where(
+                    count >= MIN_OBSERVATIONS,
+                    np.sqrt(variance * WINDOW),
+                    np.nan,
+                ),
+                "drawdown": last / self.peak[slots] - 1,
+            }
+
+        columns = {}
+        for name in ANALYTICS:
+            columns[name] = np.full(len(tickers), np.nan)
+            columns[name][known] = values[name]
+        return columns
+
+    def save(self, path: str | Path) -> None:
+        """Save the state.
+
+        Args:
+            path (str | Path): .npz file of the state
+
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        highs, lows = _flatten(self.highs), _flatten(self.lows)
+        np.savez(
+            tmp_path,
+            window=self.window,
+            tickers=np.array(self.tickers, dtype=str),
+            date=np.array([] if self.date is None else [self.date], dtype="datetime64[ns]"),
+            bar=self.bar,
+            last=self.last,
+            peak=self.peak,
+            returns=self.returns,
+            count=self.count,
+            mean=self.mean,
+            m2=self.m2,
+            **{f"high_{name}": array for name, array in highs.items()},
+            **{f"low_{name}": array for name, array in lows.items()},
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path, window: int = WINDOW) -> RollingAnalytics:
+        """Load a saved state.
+
+        Args:
+            path (str | Path): .npz file of the state
+            window (int, optional): sessions of highs, lows and volatility,
+                a state of another window starts over. Defaults to 252.
+
+        Returns:
+            RollingAnalytics: saved state, empty if there is none
+
+        """
+        analytics = cls(window)
+        path = Path(path)
+        if not path.exists():
+            return analytics
+
+        try:
+            with np.load(path) as stored:
+                if int(stored["window"]) != window:
+                    return analytics
+                tickers = stored["tickers"].tolist()
+                analytics.tickers = tickers
+                analytics._slots = {ticker: slot for slot, ticker in enumerate(tickers)}
+                analytics.date = stored["date"][0] if len(stored["date"]) else None
+                analytics.bar = int(stored["bar"])
+                for name in ("last", "peak", "returns", "count", "mean", "m2"):
+                    setattr(analytics, name, stored[name])
+                analytics.highs = _unflatten(
+                    stored["high_sizes"],
+                    stored["high_bars"],
+                    stored["high_prices"],
+                )
+                analytics.lows = _unflatten(
+                    stored["low_sizes"],
+                    stored["low_bars"],
+                    stored["low_prices"],
+                )
+        except (OSError, ValueError, KeyError):
+            err = f"rolling analytics at {path} are corrupted, starting from scratch"
+            logging.exception(err)
+            return cls(window)
+
+        return analytics
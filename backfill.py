@@ -0,0 +1,160 @@
+"""Historical backfill.
+
+Regenerates heatmaps of past days, e.g. of missed posts or for a year in
+review archive. Prices of the whole range are loaded once, returns of every
+day are calculated from them by moving the as-of date of the bot, and images
+are rendered in batches by the pool of rendering processes. Nothing is posted.
+Components are the current ones, also for past days.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from instrumentation import TRACER, span
+
+if TYPE_CHECKING:
+    from main import TwitterBot
+
+# prices of a year before the first day are needed for 1Y returns
+HISTORY = timedelta(days=400)
+
+
+@dataclass
+class BackfillEntry:
+    """Heatmap of a past day.
+
+    Attributes:
+        date (str): as-of date in ISO format
+        index (str): name of the index
+        period (str): period of the heatmap
+        path (str): path of the image relative to the output directory
+        index_return (float): return of the index in the period
+        text (str): text of the tweet
+
+    """
+
+    date: str
+    index: str
+    period: str
+    path: str
+    index_return: float
+    text: str
+
+
+def trading_days(bot: TwitterBot, start: date, end: date) -> list[date]:
+    """Get sessions between two dates in loaded prices.
+
+    Args:
+        bot (TwitterBot): bot with loaded data
+        start (date): first day, inclusive
+        end (date): last day, inclusive
+
+    Returns:
+        list[date]: days with a session
+
+    """
+    dates = bot.prices.index
+    return [day.date() for day in dates[(dates.date >= start) & (dates.date <= end)]]
+
+
+def backfill(
+    bot: TwitterBot,
+    start: date,
+    end: date,
+    periods: list[str],
+    output: str | Path = "archive",
+    batch: int | None = None,
+) -> list[BackfillEntry]:
+    """Render heatmaps of every session between two dates.
+
+    Images are written to the output directory together with index.json
+    describing them.
+
+    Args:
+        bot (TwitterBot): bot with indices, backend and rendering processes to use
+        start (date): first day, inclusive
+        end (date): last day, inclusive
+        periods (list[str]): periods of heatmaps of every day
+        output (str | Path, optional): output directory. Defaults to "archive".
+        batch (int | None, optional): heatmaps rendered at once.
+            Defaults to 8 per rendering process.
+
+    Returns:
+        list[BackfillEntry]: rendered heatmaps in order of days, indices and periods
+
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    batch = batch or 8 * bot.render_workers
+    prepare = bot._prepare_data_for_heatmap_and_tweet  # noqa: SLF001
+    tweet_text = bot._prepare_tweet_text  # noqa: SLF001
+
+    began = time.perf_counter()
+    entries: list[BackfillEntry] = []
+    try:
+        with span("backfill", profile=False):
+            bot.load_data(start=datetime.combine(start, datetime.min.time()) - HISTORY)
+            days = trading_days(bot, start, end)
+            indices = [index for index in bot.indices if index in bot.index_prices.columns]
+
+            info = f"backfilling {len(days)} sessions from {start} to {end}: {indices} {periods}"
+            logging.info(info)
+
+            jobs = []
+            for day in days:
+                bot.set_asof(day)
+                for index in indices:
+                    for period in periods:
+                        try:
+                            data, index_return = prepare(period, index)
+                        except NotImplementedError:  # not enough history for the period
+                            warn = f"{index} {period} of {day} could not be resolved"
+                            logging.warning(warn)
+                            continue
+
+                        name = f"{day:%Y-%m-%d}_{index.lower()}_{period}.png"
+                        jobs.append((bot.build_heatmap(data, period, index), str(output / name)))
+                        entries.append(
+                            BackfillEntry(
+                                date=day.isoformat(),
+                                index=index,
+                                period=period,
+                                path=name,
+                                index_return=index_return,
+                                text=tweet_text(data, index_return, period, index),
+                            ),
+                        )
+
+                if len(jobs) >= batch:
+                    with span("render"):
+                        bot.renderer.render(jobs)
+                    jobs = []
+
+            if jobs:
+                with span("render"):
+                    bot.renderer.render(jobs)
+
+        # index is replaced at once, so it never lists missing images
+        tmp_path = output / "index.json.tmp"
+        tmp_path.write_text(
+            json.dumps([asdict(entry) for entry in entries], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        tmp_path.replace(output / "index.json")
+    finally:
+        bot.renderer.close()
+        TRACER.flush()
+
+    info = (
+        f"backfilled {len(entries)} heatmaps to {output} "
+        f"in {time.perf_counter() - began:.1f}s"
+    )
+    logging.info(info)
+    return entries
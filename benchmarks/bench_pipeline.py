@@ -0,0 +1,225 @@
+"""Benchmark compute and render hot paths on synthetic data, fully offline.
+
+Times every stage of every period at scaled universes and histories, tracks
+memory and compares medians with a stored baseline. Baselines depend on the
+machine, store one with --save-baseline before changing the code.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--tickers 330 1000 5000] [--years 1 5 20]
+        [--repeat 5] [--render] [--mmap] [--baseline benchmarks/baseline.json]
+        [--threshold 0.25] [--save-baseline]
+"""
+
+import argparse
+import gc
+import json
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+PERIODS = ("1D", "1W", "MTD", "QTD", "YTD", "1Y")
+# timings shorter than this are too noisy to flag as regressions
+MIN_SECONDS = 0.005
+
+
+def measure(function: Callable[[], object], repeat: int) -> dict:
+    """Time a function and measure its peak of traced memory.
+
+    Args:
+        function (Callable[[], object]): stage to measure
+        repeat (int): number of timed calls
+
+    Returns:
+        dict: median and min seconds and peak traced memory in MB
+
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        began = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - began)
+
+    # memory is measured in a separate call, tracemalloc slows down allocations
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"median": statistics.median(times), "min": min(times), "peak_mb": peak / 2**20}
+
+
+def bench_scale(
+    n_tickers: int,
+    years: float,
+    repeat: int,
+    *,
+    render: bool,
+    mmap: bool = False,
+) -> dict[str, dict]:
+    """Benchmark all stages of one universe.
+
+    Args:
+        n_tickers (int): number of components
+        years (float): length of history
+        repeat (int): number of timed calls of every stage
+        render (bool): whether to render heatmaps with the native backend
+        mmap (bool, optional): read prices from a memory-mapped price matrix.
+            Defaults to False.
+
+    Returns:
+        dict[str, dict]: measurements by stage
+
+    """
+    import logging
+
+    from analytics import RollingAnalytics
+    from main import TwitterBot
+    from price_matrix import PriceMatrix
+    from synthetic import make_components, make_prices
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    components = make_components(n_tickers)
+    prices, wig = make_prices(components, years=years, end="2024-12-31")
+
+    tmp = tempfile.TemporaryDirectory()
+    bot = TwitterBot(data_dir=tmp.name, dry_run=True, renderer_backend="native")
+    matrix = PriceMatrix.from_frame(prices)
+    if mmap:
+        matrix.save(f"{tmp.name}/matrix")
+        matrix = PriceMatrix.load(f"{tmp.name}/matrix")
+    bot.set_data({"WIG": components}, matrix, wig.to_frame("WIG"), today=prices.index[-1])
+    prepare = bot._prepare_data_for_heatmap_and_tweet  # noqa: SLF001
+    tweet_text = bot._prepare_tweet_text  # noqa: SLF001
+
+    def build_engine() -> None:
+        bot.returns_engines = {"WIG": bot._build_returns_engine()}  # noqa: SLF001
+
+    results = {
+        "fill_prices": measure(lambda: PriceMatrix.from_frame(prices).fill(), repeat),
+        "seed_analytics": measure(
+            lambda: RollingAnalytics().update(matrix, len(matrix) - 1),
+            repeat,
+        ),
+        "build_returns_engine": measure(build_engine, repeat),
+    }
+    for period in PERIODS:
+        data, wig_return = prepare(period)
+        path = f"{tmp.name}/{period}.png"
+        stages = {
+            "get_periods_indicies": lambda p=period: bot.get_periods_indicies(p),
+            "prepare_data": lambda p=period: prepare(p),
+            "prepare_tweet_text": lambda d=data, w=wig_return, p=period: tweet_text(d.copy(), w, p),
+            "build_heatmap": lambda d=data, p=period: bot.build_heatmap(d, p),
+        }
+        if render:
+            stages["chart_heatmap"] = lambda d=data, p=period, f=path: bot.chart_heatmap(d, f, p)
+
+        for stage, function in stages.items():
+            # one render is slow enough to time
+            calls = 1 if stage == "chart_heatmap" else repeat
+            results[f"{stage} {period}"] = measure(function, calls)
+
+    tmp.cleanup()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Find stages slower than the baseline.
+
+    Args:
+        results (dict): measurements by scale and stage
+        baseline (dict): stored measurements by scale and stage
+        threshold (float): accepted relative slowdown, e.g. 0.25
+
+    Returns:
+        list[str]: descriptions of regressions
+
+    """
+    regressions = []
+    for scale, stages in results.items():
+        for stage, result in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            if before is None or before["median"] < MIN_SECONDS:
+                continue
+            change = result["median"] / before["median"] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{scale} {stage}: {before['median'] * 1e3:.1f} ms -> "
+                    f"{result['median'] * 1e3:.1f} ms (+{change:.0%})",
+                )
+    return regressions
+
+
+def main() -> None:
+    """Run the suite, print results and compare them with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[330, 1000, 5000])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--render", action="store_true", help="render heatmaps, slow")
+    parser.add_argument("--mmap", action="store_true", help="memory-map the price matrix")
+    parser.add_argument("--baseline", type=Path, default=ROOT / "benchmarks" / "baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="accepted slowdown")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="write results as json")
+    args = parser.parse_args()
+
+    results = {}
+    for n_tickers in args.tickers:
+        for years in args.years:
+            scale = f"{n_tickers}x{years:g}y"
+            began = time.perf_counter()
+            results[scale] = bench_scale(
+                n_tickers,
+                years,
+                args.repeat,
+                render=args.render,
+                mmap=args.mmap,
+            )
+
+            print(f"\n{scale} ({time.perf_counter() - began:.1f}s)")  # noqa: T201
+            for stage, result in results[scale].items():
+                print(  # noqa: T201
+                    f"  {stage:<28} {result['median'] * 1e3:>10.2f} ms "
+                    f"{result['peak_mb']:>9.1f} MB",
+                )
+
+    # ru_maxrss is in kilobytes on linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\npeak RSS {peak_rss:.0f} MB")  # noqa: T201
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({**stored, **results}, indent=2), encoding="utf-8")
+        print(f"baseline saved to {args.baseline}")  # noqa: T201
+        return
+
+    if not args.baseline.exists():
+        print("no baseline to compare with, store one with --save-baseline")  # noqa: T201
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regressions above {args.threshold:.0%}:")  # noqa: T201
+        for regression in regressions:
+            print(f"  {regression}")  # noqa: T201
+        sys.exit(1)
+    print(f"\nno regressions above {args.threshold:.0%}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
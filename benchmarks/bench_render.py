@@ -0,0 +1,123 @@
+"""Compare render time and peak memory of heatmap renderer backends.
+
+Every backend runs in its own process, so peak RSS (including Kaleido and
+its browser) is measured separately.
+
+Usage:
+    python benchmarks/bench_render.py [--tickers 330] [--repeat 3]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+def run_backend(backend: str, n_tickers: int, repeat: int) -> dict:
+    """Render the same heatmap a few times with one backend.
+
+    Args:
+        backend (str): 'plotly' or 'native'
+        n_tickers (int): number of components
+        repeat (int): number of renders
+
+    Returns:
+        dict: backend, warm up and render times in seconds and peak RSS in MB
+
+    """
+    import tempfile
+
+    import pandas as pd
+
+    from main import TwitterBot
+    from price_matrix import PriceMatrix
+    from render import HeatmapRenderer
+    from returns import ReturnsEngine
+    from synthetic import make_components, make_prices
+
+    components = make_components(n_tickers)
+    prices, index = make_prices(components, years=1)
+    rows = {"1D": (len(prices) - 2, len(prices) - 1)}
+    engine = ReturnsEngine(PriceMatrix.from_frame(prices), index, components, rows)
+    data, _ = engine.get("1D")
+
+    bot = TwitterBot(dry_run=True, renderer_backend=backend)
+    bot.today = pd.Timestamp(bot.now.today())
+    figure = bot.build_heatmap(data, "1D")
+
+    renderer = HeatmapRenderer(backend=backend)
+    began = time.perf_counter()
+    renderer._start()  # noqa: SLF001
+    warm_up = time.perf_counter() - began
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = renderer.render([(figure, f"{tmp}/{i}.png") for i in range(repeat)])
+
+    # ru_maxrss is in kilobytes on linux
+    peak_rss = sum(
+        resource.getrusage(who).ru_maxrss
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+    return {
+        "backend": backend,
+        "warm_up": warm_up,
+        "render": [result.seconds for result in results],
+        "peak_rss_mb": peak_rss / 1024,
+    }
+
+
+def main() -> None:
+    """Run every backend in a subprocess and print comparison."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=330)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per backend")
+    parser.add_argument("--backend", help="run only this backend and print json")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.tickers, args.repeat)))  # noqa: T201
+        return
+
+    for backend in ("native", "plotly"):
+        command = [
+            sys.executable,
+            __file__,
+            *("--backend", backend),
+            *("--tickers", str(args.tickers)),
+            *("--repeat", str(args.repeat)),
+        ]
+        try:
+            completed = subprocess.run(  # noqa: S603
+                command,
+                capture_output=True,
+                text=True,
+                check=False,
+                timeout=args.timeout,
+            )
+        except subprocess.TimeoutExpired:
+            print(f"{backend:>7}: timed out after {args.timeout:.0f}s")  # noqa: T201
+            continue
+
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1]
+            print(f"{backend:>7}: failed\n{error}")  # noqa: T201
+            continue
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        render = sorted(result["render"])[len(result["render"]) // 2]
+        print(  # noqa: T201
+            f"{backend:>7}: warm up {result['warm_up']:.2f}s, "
+            f"render median {render:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB",
+        )
+
+
+if __name__ == "__main__":
+    main()
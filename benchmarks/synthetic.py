@@ -0,0 +1,81 @@
+"""Synthetic market data for benchmarks.
+
+Builds realistic inputs without network access: market caps with WIG-like skew
+and sector/industry mix drawn from wig_comps.csv.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+WIG_COMPS = Path(__file__).parent.parent / "wig_comps.csv"
+
+
+def make_components(n_tickers: int, seed: int = 0) -> pd.DataFrame:
+    """Make index components.
+
+    Args:
+        n_tickers (int): number of components
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: cols('company', 'ISIN', 'yf_ticker', 'sector', 'industry',
+            'shares_num', 'ticker')
+
+    """
+    rng = np.random.default_rng(seed)
+    comps = pd.read_csv(WIG_COMPS).dropna()
+    sample = comps.sample(n_tickers, replace=n_tickers > len(comps), random_state=seed)
+
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    return pd.DataFrame(
+        {
+            "company": [f"COMPANY{i}" for i in range(n_tickers)],
+            "ISIN": [f"PLSYN{i:07d}" for i in range(n_tickers)],
+            "yf_ticker": [f"{ticker}.WA" for ticker in tickers],
+            "sector": sample.sector.to_numpy(),
+            "industry": sample.industry.to_numpy(),
+            # pareto shares give few giants and a long tail of small companies like in WIG
+            "shares_num": (rng.pareto(1.1, n_tickers) * 1e6 + 1e5).round(),
+            "ticker": tickers,
+        },
+    )
+
+
+def make_prices(
+    components: pd.DataFrame,
+    years: float,
+    end: str | None = None,
+    seed: int = 0,
+) -> tuple[pd.DataFrame, pd.Series]:
+    """Make daily close prices of components and of the index.
+
+    Args:
+        components (pd.DataFrame): components with 'ticker' column
+        years (float): length of history
+        end (str | None, optional): last date. Defaults to today.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        tuple[pd.DataFrame, pd.Series]: prices with index of dates and columns of tickers
+            and prices of the index
+
+    """
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize()
+    dates = pd.bdate_range(end=end_date, periods=max(int(252 * years), 2), name="Date")
+
+    log_returns = rng.normal(0, 0.02, (len(dates), len(components)))
+    start_prices = rng.lognormal(3.5, 1.2, len(components))
+    prices = pd.DataFrame(
+        start_prices * np.exp(np.cumsum(log_returns, axis=0)),
+        index=dates,
+        columns=components.ticker.to_list(),
+    )
+    index = pd.Series(
+        50_000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates)))),
+        index=dates,
+        name="WIG",
+    )
+    return prices, index
@@ -0,0 +1,162 @@
+"""Trading calendar index.
+
+Sorted array of trading dates with precomputed period boundaries, answering
+"first bar of period" and "is this a trading date" by binary search.
+"""
+
+import numpy as np
+import pandas as pd
+
+# periods starting with the first bar of a calendar period
+CALENDAR_PERIODS = {"YTD": "year", "QTD": "quarter", "MTD": "month", "1W": "week"}
+
+# number of bars in a year
+BARS_IN_YEAR = 252
+
+
+def _period_keys(days: np.ndarray, freq: str) -> np.ndarray:
+    """Get integer key of a calendar period of every date.
+
+    Keys are monotonic in time. Weeks are keyed by their monday, so ISO week 53
+    and weeks spanning two years belong to a single period.
+
+    Args:
+        days (np.ndarray): dates as datetime64[D]
+        freq (str): one of 'year', 'quarter', 'month', 'week'
+
+    Returns:
+        np.ndarray: int64 keys
+
+    """
+    if freq == "year":
+        return days.astype("datetime64[Y]").astype(np.int64)
+    if freq == "quarter":
+        return days.astype("datetime64[M]").astype(np.int64) // 3
+    if freq == "month":
+        return days.astype("datetime64[M]").astype(np.int64)
+    if freq == "week":
+        # 1970-01-01 was a thursday, (days + 3) % 7 is 0 on mondays
+        epoch_days = days.astype(np.int64)
+        return (epoch_days - (epoch_days + 3) % 7) // 7
+    msg = f"frequency {freq} not available"
+    raise NotImplementedError(msg)
+
+
+class TradingCalendar:
+    """Index of trading dates.
+
+    Attributes:
+        dates (np.ndarray): sorted trading dates as datetime64[D]
+        boundaries (dict[str, tuple[np.ndarray, np.ndarray]]): for every frequency
+            positions of the first bars of periods and keys of these periods
+
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex) -> None:
+        """Init method.
+
+        Args:
+            dates (pd.DatetimeIndex): trading dates
+
+        """
+        self.dates: np.ndarray = np.sort(np.asarray(dates, dtype="datetime64[D]"))
+
+        self.boundaries: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for freq in CALENDAR_PERIODS.values():
+            keys = _period_keys(self.dates, freq)
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else keys
+            self.boundaries[freq] = (starts, keys[starts])
+
+    def __len__(self) -> int:
+        """Get number of trading dates."""
+        return len(self.dates)
+
+    @staticmethod
+    def _day(date: object) -> np.datetime64:
+        return np.datetime64(pd.Timestamp(date).date(), "D")
+
+    def is_trading_date(self, date: object) -> bool:
+        """Check if date is in the calendar.
+
+        Args:
+            date (object): anything pd.Timestamp accepts
+
+        Returns:
+            bool
+
+        """
+        day = self._day(date)
+        position = np.searchsorted(self.dates, day)
+        return bool(position < len(self.dates) and self.dates[position] == day)
+
+    def position(self, asof: object) -> int:
+        """Get position of the last bar at or before a date.
+
+        Args:
+            asof (object): anything pd.Timestamp accepts
+
+        Raises:
+            ValueError: there are no bars before the date
+
+        Returns:
+            int: position of the bar
+
+        """
+        position = int(np.searchsorted(self.dates, self._day(asof), side="right")) - 1
+        if position < 0:
+            msg = f"no trading dates before {asof}"
+            raise ValueError(msg)
+        return position
+
+    def first_bar(self, freq: str, asof: object) -> int | None:
+        """Get position of the first bar of a calendar period containing a date.
+
+        Args:
+            freq (str): one of 'year', 'quarter', 'month', 'week'
+            asof (object): anything pd.Timestamp accepts
+
+        Returns:
+            int | None: position of the bar, None if there are no bars in the period up to the date
+
+        """
+        starts, keys = self.boundaries[freq]
+        key = _period_keys(np.array([self._day(asof)]), freq)[0]
+        i = int(np.searchsorted(keys, key))
+        if i == len(keys) or keys[i] != key:
+            return None
+
+        first = int(starts[i])
+        if first > self.position(asof):
+            return None
+        return first
+
+    def period_rows(self, period: str, asof: object) -> tuple[int, int]:
+        """Get positions of the start and end bars of a period.
+
+        Start bar is the last bar before the period, so returns include the first session.
+
+        possible periods: YTD, QTD, MTD, 1W, 1D, 1Y
+
+        Args:
+            period (str): period to resolve
+            asof (object): last date of the period
+
+        Raises:
+            NotImplementedError: period is not available
+
+        Returns:
+            tuple[int, int]: positions of the start and end bars
+
+        """
+        end = self.position(asof)
+        if period == "1D":
+            return max(end - 1, 0), end
+        if period == "1Y":
+            return max(end - BARS_IN_YEAR, 0), end
+        if period in CALENDAR_PERIODS:
+            first = self.first_bar(CALENDAR_PERIODS[period], asof)
+            if first is None:  # no sessions in the period yet
+                return end, end
+            return max(first - 1, 0), end
+        msg = f"period {period} not available"
+        raise NotImplementedError(msg)
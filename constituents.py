@@ -0,0 +1,136 @@
+"""Index components cache.
+
+Keeps the parsed table of index components on disk together with the time it
+was fetched and HTTP validators, so the table is downloaded and parsed again
+only when the source has changed.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+
+@dataclass
+class CachedComponents:
+    """Cached table of index components.
+
+    Attributes:
+        table (pd.DataFrame): cols('company', 'ISIN', 'shares_num')
+        fetched_at (datetime): when the table was last downloaded or revalidated
+        etag (str | None): ETag header of the response
+        last_modified (str | None): Last-Modified header of the response
+
+    """
+
+    table: pd.DataFrame
+    fetched_at: datetime
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def is_fresh(self, ttl: timedelta) -> bool:
+        """Check if the table is younger than ttl.
+
+        Args:
+            ttl (timedelta): time to live of the table
+
+        Returns:
+            bool
+
+        """
+        return datetime.now(UTC) - self.fetched_at < ttl
+
+    def validators(self) -> dict[str, str]:
+        """Get headers of a conditional request.
+
+        Returns:
+            dict[str, str]: If-None-Match and If-Modified-Since headers
+
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ConstituentsCache:
+    """On-disk cache of index components keyed by index ISIN.
+
+    Attributes:
+        path (Path): cache directory
+
+    """
+
+    def __init__(self, path: str | Path = "data") -> None:
+        """Init method.
+
+        Args:
+            path (str | Path, optional): cache directory. Defaults to "data".
+
+        """
+        self.path = Path(path)
+
+    def _files(self, isin: str) -> tuple[Path, Path]:
+        return self.path / f"components_{isin}.csv", self.path / f"components_{isin}.json"
+
+    def load(self, isin: str) -> CachedComponents | None:
+        """Load cached components of an index.
+
+        Args:
+            isin (str): ISIN of the index
+
+        Returns:
+            CachedComponents | None: cached components, None if there are none
+
+        """
+        table_file, meta_file = self._files(isin)
+        if not table_file.exists() or not meta_file.exists():
+            return None
+
+        try:
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            table = pd.read_csv(table_file)
+        except Exception:
+            warn = f"cached components of {isin} are corrupted"
+            logging.exception(warn)
+            return None
+
+        return CachedComponents(
+            table=table,
+            fetched_at=datetime.fromisoformat(meta["fetched_at"]),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+
+    def save(self, isin: str, cached: CachedComponents) -> None:
+        """Save components of an index.
+
+        Files are written aside and replace the stored ones only after both are
+        written. The old metadata is removed first, so a table never pairs with
+        validators of another one, an interrupted save loses the cache instead.
+
+        Args:
+            isin (str): ISIN of the index
+            cached (CachedComponents): components to save
+
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        table_file, meta_file = self._files(isin)
+        tmp_table = table_file.with_suffix(".tmp.csv")
+        tmp_meta = meta_file.with_suffix(".tmp.json")
+        cached.table.to_csv(tmp_table, index=False)
+        meta = {
+            "fetched_at": cached.fetched_at.isoformat(),
+            "etag": cached.etag,
+            "last_modified": cached.last_modified,
+        }
+        tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+        meta_file.unlink(missing_ok=True)
+        tmp_table.replace(table_file)
+        tmp_meta.replace(meta_file)
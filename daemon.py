@@ -0,0 +1,321 @@
+"""Long-running mode of the bot.
+
+BotDaemon keeps one TwitterBot alive, so prices, calendar, components and
+the renderer stay warm in memory, and triggers posts at Warsaw time slots
+of their reasons. Every slot only refreshes data incrementally and renders
+due heatmaps. Health and metrics are served on a local HTTP endpoint.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import resource
+import signal
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+from instrumentation import TRACER, span
+from planner import PlannedPost, plan_posts
+
+if TYPE_CHECKING:
+    from main import TwitterBot
+
+# Warsaw time of posts by reason, session closes at 17:05 and Yahoo lags a few minutes
+DEFAULT_SLOTS = {
+    "daily": clock(17, 45),
+    "weekly": clock(10, 0),
+    "monthly": clock(17, 50),
+    "quarterly": clock(17, 50),
+    "yearly": clock(17, 50),
+    "random ytd": clock(18, 0),
+}
+
+
+def parse_slot(value: str) -> tuple[str, clock]:
+    """Parse a slot given as reason=HH:MM.
+
+    Args:
+        value (str): e.g. 'daily=17:45'
+
+    Raises:
+        ValueError: unknown reason or malformed time
+
+    Returns:
+        tuple[str, clock]: reason and Warsaw time
+
+    """
+    reason, _, hhmm = value.partition("=")
+    if reason not in DEFAULT_SLOTS:
+        msg = f"unknown reason {reason}, use one of {list(DEFAULT_SLOTS)}"
+        raise ValueError(msg)
+    return reason, clock.fromisoformat(hhmm)
+
+
+@dataclass
+class DaemonStats:
+    """Counters exposed by the health endpoint.
+
+    Attributes:
+        started_at (float): unix time the daemon started
+        runs (int): number of slot runs
+        failures (int): number of failed slot runs
+        posts_queued (int): number of posts put to the outbox
+        last_run_at (float | None): unix time the last slot run finished
+        last_run_seconds (float | None): duration of the last slot run
+        last_error (str | None): error of the last failed slot run
+        next_run_at (float | None): unix time of the next slot
+
+    """
+
+    started_at: float
+    runs: int = 0
+    failures: int = 0
+    posts_queued: int = 0
+    last_run_at: float | None = None
+    last_run_seconds: float | None = None
+    last_error: str | None = None
+    next_run_at: float | None = None
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    server: _HealthServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        daemon = self.server.bot_daemon
+        if self.path == "/health":
+            healthy, body = daemon.health()
+            status = HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE
+            self._reply(status, "application/json", json.dumps(body))
+        elif self.path == "/metrics":
+            self._reply(HTTPStatus.OK, "text/plain; version=0.0.4", daemon.metrics())
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, "text/plain", "not found\n")
+
+    def _reply(self, status: HTTPStatus, content_type: str, body: str) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        logging.debug(format, *args)
+
+
+class _HealthServer(ThreadingHTTPServer):
+    daemon_threads = True
+    bot_daemon: BotDaemon
+
+
+class BotDaemon:
+    """Runs the bot continuously and posts at configured Warsaw time slots.
+
+    Attributes:
+        bot (TwitterBot): bot kept warm between slots
+        slots (dict[str, clock]): Warsaw time of posts by reason
+        host (str): address of the health endpoint
+        port (int | None): port of the health endpoint, None disables it
+        max_sleep (float): longest pause of the scheduler in seconds
+        stats (DaemonStats): counters of the health endpoint
+
+    """
+
+    def __init__(
+        self,
+        bot: TwitterBot,
+        slots: dict[str, clock] | None = None,
+        host: str = "127.0.0.1",
+        port: int | None = 8765,
+        max_sleep: float = 300.0,
+    ) -> None:
+        """Init method.
+
+        Args:
+            bot (TwitterBot): bot kept warm between slots
+            slots (dict[str, clock] | None, optional): Warsaw time of posts by reason,
+                missing reasons use DEFAULT_SLOTS. Defaults to None.
+            host (str, optional): address of the health endpoint. Defaults to "127.0.0.1".
+            port (int | None, optional): port of the health endpoint, None disables it.
+                Defaults to 8765.
+            max_sleep (float, optional): longest pause of the scheduler in seconds.
+                Defaults to 300.0.
+
+        """
+        self.bot = bot
+        self.slots = {**DEFAULT_SLOTS, **(slots or {})}
+        self.host = host
+        self.port = port
+        self.max_sleep = max_sleep
+        self.stats = DaemonStats(started_at=time.time())
+
+        self._plan_date: date | None = None
+        self._plan: list[PlannedPost] = []
+        self._done: set[PlannedPost] = set()
+        self._stopping = threading.Event()
+        self._server: _HealthServer | None = None
+
+    def _slot_time(self, day: date, post: PlannedPost) -> datetime:
+        return self.bot.tzinfo.localize(datetime.combine(day, self.slots[post.reason]))
+
+    def _update_plan(self, now: datetime) -> None:
+        # plan once a day, so the random YTD draw is made once
+        if self._plan_date != now.date():
+            self._plan_date = now.date()
+            self._plan = plan_posts(now.date())
+            self._done = set()
+
+            info = f"plan for {now.date()}: {[(p.period, p.reason) for p in self._plan]}"
+            logging.info(info)
+
+    def _next_slot(self, now: datetime) -> datetime:
+        pending = [self._slot_time(now.date(), p) for p in self._plan if p not in self._done]
+        if pending:
+            return min(pending)
+
+        # plan of tomorrow is made just after midnight
+        midnight = datetime.combine(now.date() + timedelta(days=1), clock(0, 0, 1))
+        return self.bot.tzinfo.localize(midnight)
+
+    def run_slot(self, due: list[PlannedPost], slot: datetime) -> None:
+        """Refresh data and queue due posts.
+
+        Args:
+            due (list[PlannedPost]): posts of the slot
+            slot (datetime): scheduled time of the slot
+
+        """
+        began = time.perf_counter()
+        try:
+            with span(f"slot {slot:%H:%M}", profile=False):
+                self.bot.refresh()
+                self.stats.posts_queued += self.bot.post_due(due)
+        except (Exception, SystemExit) as e:
+            # one failed slot must not stop the daemon, e.g. sys.exit on missing data
+            self.stats.failures += 1
+            self.stats.last_error = f"{type(e).__name__}: {e}"
+            logging.exception("slot run failed")
+        else:
+            self.stats.last_error = None
+
+        TRACER.flush()
+        self.stats.runs += 1
+        self.stats.last_run_at = time.time()
+        self.stats.last_run_seconds = time.perf_counter() - began
+
+        info = (
+            f"slot {slot:%H:%M} done in {self.stats.last_run_seconds:.1f}s, "
+            f"{self.stats.last_run_at - slot.timestamp():.1f}s after the slot"
+        )
+        logging.info(info)
+
+    def tick(self) -> float:
+        """Run due slots.
+
+        Returns:
+            float: seconds to the next slot
+
+        """
+        now = datetime.now(self.bot.tzinfo)
+        self._update_plan(now)
+
+        due = [
+            post
+            for post in self._plan
+            if post not in self._done and self._slot_time(now.date(), post) <= now
+        ]
+        if due:
+            self.run_slot(due, max(self._slot_time(now.date(), post) for post in due))
+            # failed posts are not retried in the same day, their slot has passed
+            self._done.update(due)
+
+        next_slot = self._next_slot(datetime.now(self.bot.tzinfo))
+        self.stats.next_run_at = next_slot.timestamp()
+        return max(next_slot.timestamp() - time.time(), 0)
+
+    def _serve_health(self) -> None:
+        if self.port is None:
+            return
+
+        self._server = _HealthServer((self.host, self.port), _HealthHandler)
+        self._server.bot_daemon = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        info = f"health endpoint on http://{self.host}:{self.port}/health and /metrics"
+        logging.info(info)
+
+    def run_forever(self) -> None:
+        """Schedule posts until SIGINT or SIGTERM."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stop())
+
+        self._serve_health()
+        if not self.bot.dry_run:
+            self.bot.posting_worker.start()
+
+        logging.info("daemon started")
+        try:
+            while not self._stopping.is_set():
+                self._stopping.wait(min(self.tick(), self.max_sleep))
+        finally:
+            if self._server is not None:
+                self._server.shutdown()
+            if not self.bot.dry_run:
+                self.bot.posting_worker.stop(timeout=900)
+            self.bot.renderer.close()
+            logging.info("daemon stopped")
+
+    def stop(self) -> None:
+        """Stop the scheduler after the current slot."""
+        self._stopping.set()
+
+    def health(self) -> tuple[bool, dict]:
+        """Get health of the daemon.
+
+        Returns:
+            tuple[bool, dict]: whether the last slot run succeeded and state of the daemon
+
+        """
+        healthy = self.stats.last_error is None
+        body = {
+            "status": "ok" if healthy else "failing",
+            **asdict(self.stats),
+            "data_loaded": self.bot.data_loaded,
+            "last_price_date": (
+                f"{self.bot.prices.index[-1]:%Y-%m-%d}" if self.bot.data_loaded else None
+            ),
+            "plan": [post.period for post in self._plan if post not in self._done],
+        }
+        return healthy, body
+
+    def metrics(self) -> str:
+        """Get metrics in Prometheus text format.
+
+        Returns:
+            str: metrics
+
+        """
+        # ru_maxrss is in kilobytes on linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        values = {
+            "twitter_bot_up_seconds": time.time() - self.stats.started_at,
+            "twitter_bot_runs_total": self.stats.runs,
+            "twitter_bot_run_failures_total": self.stats.failures,
+            "twitter_bot_posts_queued_total": self.stats.posts_queued,
+            "twitter_bot_last_run_timestamp_seconds": self.stats.last_run_at,
+            "twitter_bot_last_run_duration_seconds": self.stats.last_run_seconds,
+            "twitter_bot_next_run_timestamp_seconds": self.stats.next_run_at,
+            "twitter_bot_peak_rss_bytes": peak_rss,
+        }
+        lines = [f"{name} {value}" for name, value in values.items() if value is not None]
+        if not self.bot.dry_run:
+            for status, count in self.bot.outbox.counts().items():
+                lines.append(f'twitter_bot_outbox_posts{{status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
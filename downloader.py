@@ -0,0 +1,150 @@
+"""Concurrent price downloader.
+
+Downloads price history of many tickers in parallel with a bounded pool of
+workers, retrying every ticker on its own, so one bad ticker does not stall
+or fail the whole batch.
+"""
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+
+@dataclass
+class DownloadReport:
+    """Result of a batch download.
+
+    Attributes:
+        prices (pd.DataFrame): close prices with index of dates and columns of symbols
+        succeeded (list[str]): symbols downloaded successfully
+        failed (dict[str, str]): symbols that failed every try with the last error
+        elapsed (float): wall time of the download in seconds
+        events (dict[str, pd.Timestamp]): date of the last split of symbols
+            with one in downloaded bars
+
+    """
+
+    prices: pd.DataFrame
+    succeeded: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+    events: dict[str, pd.Timestamp] = field(default_factory=dict)
+
+    def log(self) -> None:
+        """Log summary of the download."""
+        info = (
+            f"downloaded {len(self.succeeded)} tickers in {self.elapsed:.1f}s, "
+            f"{len(self.failed)} failed"
+        )
+        logging.info(info)
+        for symbol, error in self.failed.items():
+            warn = f"downloading {symbol} failed: {error}"
+            logging.warning(warn)
+
+
+def _download_one(
+    symbol: str,
+    start: pd.Timestamp,
+    timeout: float,
+    retries: int,
+    backoff: float,
+) -> tuple[pd.Series, pd.Timestamp | None]:
+    """Download close prices of one ticker, retrying with jittered exponential backoff.
+
+    Args:
+        symbol (str): Yahoo Finance symbol
+        start (pd.Timestamp): first date to download
+        timeout (float): timeout of a single request in seconds
+        retries (int): how many times to retry after the first failure
+        backoff (float): base of the backoff delay in seconds
+
+    Raises:
+        Exception: last error after all tries failed
+
+    Returns:
+        tuple[pd.Series, pd.Timestamp | None]: close prices with index of dates and date
+            of the last split, None if there was none
+
+    """
+    import yfinance as yf
+
+    attempt = 0
+    while True:
+        try:
+            history = yf.Ticker(symbol).history(
+                start=start,
+                timeout=timeout,
+                auto_adjust=False,
+                raise_errors=True,
+            )
+        except Exception:
+            if attempt >= retries:
+                raise
+            time.sleep(random.uniform(0, backoff * 2**attempt))  # noqa: S311
+            attempt += 1
+        else:
+            # close prices are adjusted for splits only, dividends do not change them
+            splits = history.reindex(columns=["Stock Splits"]).fillna(0)["Stock Splits"]
+            events = history.index[splits.to_numpy() != 0]
+            return history["Close"].rename(symbol), events.max() if len(events) else None
+
+
+def download_history(
+    starts: dict[pd.Timestamp, list[str]],
+    workers: int = 8,
+    timeout: float = 20,
+    retries: int = 3,
+    backoff: float = 1.0,
+) -> DownloadReport:
+    """Download close prices of many tickers in parallel.
+
+    Args:
+        starts (dict[pd.Timestamp, list[str]]): download start date with symbols to download from it
+        workers (int, optional): size of the worker pool. Defaults to 8.
+        timeout (float, optional): timeout of a single request in seconds. Defaults to 20.
+        retries (int, optional): retries of every ticker after a failure. Defaults to 3.
+        backoff (float, optional): base of the backoff delay in seconds. Defaults to 1.0.
+
+    Returns:
+        DownloadReport: downloaded prices with succeeded and failed tickers
+
+    """
+    began = time.perf_counter()
+    jobs = [(symbol, start) for start, symbols in starts.items() for symbol in symbols]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            symbol: executor.submit(_download_one, symbol, start, timeout, retries, backoff)
+            for symbol, start in jobs
+        }
+
+    series = []
+    report = DownloadReport(prices=pd.DataFrame())
+    for symbol, future in futures.items():
+        try:
+            close, event = future.result()
+        except Exception as e:  # noqa: BLE001
+            report.failed[symbol] = repr(e)
+        else:
+            series.append(close)
+            report.succeeded.append(symbol)
+            if event is not None:
+                report.events[symbol] = event
+
+    if series:
+        prices = pd.concat(series, axis=1)
+        if isinstance(prices.index, pd.DatetimeIndex) and prices.index.tz is not None:
+            prices.index = prices.index.tz_localize(None)
+        prices.index.name = "Date"
+        report.prices = prices
+    report.events = {
+        symbol: event.tz_localize(None) if event.tz is not None else event
+        for symbol, event in report.events.items()
+    }
+
+    report.elapsed = time.perf_counter() - began
+    return report
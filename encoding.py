@@ -0,0 +1,269 @@
+"""Encoding of rendered heatmaps for upload.
+
+Heatmaps are rendered as 8K lossless PNGs, which are slow to upload and close
+to media size limits. Every rendered image is decoded once and encoded to
+variants of given width and byte budget, e.g. the upload artifact,
+a thumbnail and an archive copy. Heatmaps are flat colors and text, so
+palette PNG is tried first and JPEG or WebP quality is searched only if
+it does not fit the budget.
+"""
+
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from PIL import Image
+
+from instrumentation import count
+
+FORMATS = ("auto", "png", "jpeg", "webp")
+EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+PALETTE_SIZES = (256, 128, 64, 32)
+MIN_QUALITY = 40
+MAX_QUALITY = 95
+
+
+@dataclass(frozen=True)
+class Variant:
+    """Output of the encoder.
+
+    Attributes:
+        name (str): suffix of the output file, e.g. 'upload'
+        width (int | None): width of the output, None keeps width of the source
+        budget (int | None): largest size of the output in bytes, None for best quality
+        fmt (str): one of 'auto', 'png', 'jpeg', 'webp', 'auto' tries palette PNG then JPEG,
+            'png' without budget is lossless
+
+    """
+
+    name: str
+    width: int | None = None
+    budget: int | None = None
+    fmt: str = "auto"
+
+
+# twitter shows images at most 4096 px wide and accepts up to 5 MB
+UPLOAD = Variant("upload", width=4096, budget=4_500_000)
+THUMBNAIL = Variant("thumb", width=1280, budget=500_000)
+ARCHIVE = Variant("archive", fmt="png")
+
+
+@dataclass
+class EncodeResult:
+    """Encoded image.
+
+    Attributes:
+        source (str): path of the rendered image
+        path (str): path of the encoded image
+        variant (str): name of the variant
+        fmt (str): format of the encoded image
+        setting (int): quality of JPEG or WebP, number of colors of PNG, 0 if lossless
+        size (int): size of the encoded image in bytes
+        ratio (float): size of the source divided by size of the encoded image
+        seconds (float): encode time
+        fits (bool): whether the encoded image fits the budget
+
+    """
+
+    source: str
+    path: str
+    variant: str
+    fmt: str
+    setting: int
+    size: int
+    ratio: float
+    seconds: float
+    fits: bool
+
+
+@dataclass
+class EncodeReport:
+    """Outcome of encoding a batch of images.
+
+    Attributes:
+        results (list[EncodeResult]): encoded images in order of sources and variants
+        elapsed (float): wall time of the batch in seconds
+
+    """
+
+    results: list[EncodeResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def paths(self, variant: str) -> list[str]:
+        """Get paths of one variant.
+
+        Args:
+            variant (str): name of the variant
+
+        Returns:
+            list[str]: paths of encoded images in order of sources
+
+        """
+        return [result.path for result in self.results if result.variant == variant]
+
+    def log(self) -> None:
+        """Log encode time, size and compression ratio of every image."""
+        for result in self.results:
+            info = (
+                f"encoded {result.path} ({result.fmt}, {result.setting}) "
+                f"in {result.seconds:.2f}s: {result.size / 1e6:.2f} MB, "
+                f"{result.ratio:.1f}x smaller"
+            )
+            if result.fits:
+                logging.info(info)
+            else:
+                logging.warning(info + ", over budget")
+
+        source = sum(Path(path).stat().st_size for path in {r.source for r in self.results})
+        encoded = sum(result.size for result in self.results)
+        info = (
+            f"encoded {len(self.results)} images in {self.elapsed:.2f}s, "
+            f"{source / 1e6:.1f} MB -> {encoded / 1e6:.1f} MB"
+        )
+        logging.info(info)
+
+
+def _save(image: Image.Image, fmt: str, setting: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "png" and setting == 0:
+        image.save(buffer, format="PNG")
+    elif fmt == "png":
+        palette = image.quantize(setting, method=Image.Quantize.FASTOCTREE)
+        palette.save(buffer, format="PNG")
+    elif fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=setting, optimize=True, subsampling=0)
+    else:
+        image.save(buffer, format="WEBP", quality=setting, method=4)
+    return buffer.getvalue()
+
+
+def _search_quality(image: Image.Image, fmt: str, budget: int) -> tuple[int, bytes]:
+    """Binary search of the highest quality that fits the budget, lowest quality if none does."""
+    low, high = MIN_QUALITY, MAX_QUALITY
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _save(image, fmt, quality)
+        if len(data) <= budget:
+            best = quality, data
+            low = quality + 1
+        else:
+            high = quality - 1
+    return best or (MIN_QUALITY, _save(image, fmt, MIN_QUALITY))
+
+
+def encode_variant(image: Image.Image, variant: Variant) -> tuple[str, int, bytes]:
+    """Encode an image with the best setting of a variant fitting its budget.
+
+    Args:
+        image (Image.Image): RGB image already resized to the width of the variant
+        variant (Variant): format and budget
+
+    Returns:
+        tuple[str, int, bytes]: format, quality or number of colors and encoded image
+
+    """
+    budget = variant.budget
+    if variant.fmt == "png" and budget is None:
+        return "png", 0, _save(image, "png", 0)
+
+    if variant.fmt in ("auto", "png"):
+        for colors in PALETTE_SIZES:
+            data = _save(image, "png", colors)
+            last = colors == PALETTE_SIZES[-1]
+            if budget is None or len(data) <= budget or (variant.fmt == "png" and last):
+                return "png", colors, data
+
+    fmt = "jpeg" if variant.fmt == "auto" else variant.fmt
+    if budget is None:
+        return fmt, MAX_QUALITY, _save(image, fmt, MAX_QUALITY)
+    return fmt, *_search_quality(image, fmt, budget)
+
+
+class ImageEncoder:
+    """Encodes rendered images to upload, thumbnail and archive variants.
+
+    Pillow encoders release the GIL, so images are encoded in a pool of threads.
+    Every thread decodes its own image and closes it after encoding its variants,
+    so no more decoded images than threads are held at once.
+
+    Attributes:
+        variants (tuple[Variant, ...]): outputs made of every image
+        workers (int): number of encoding threads
+
+    """
+
+    def __init__(self, variants: tuple[Variant, ...] = (UPLOAD,), workers: int = 4) -> None:
+        """Init method.
+
+        Args:
+            variants (tuple[Variant, ...], optional): outputs made of every image.
+                Defaults to the upload artifact only.
+            workers (int, optional): number of encoding threads. Defaults to 4.
+
+        Raises:
+            ValueError: unknown format of a variant
+
+        """
+        for variant in variants:
+            if variant.fmt not in FORMATS:
+                msg = f"format {variant.fmt} not available, use one of {FORMATS}"
+                raise ValueError(msg)
+
+        self.variants = variants
+        self.workers = workers
+
+    def _encode(self, source: str, image: Image.Image, variant: Variant) -> EncodeResult:
+        began = time.perf_counter()
+        if variant.width is not None and variant.width < image.width:
+            height = round(image.height * variant.width / image.width)
+            image = image.resize((variant.width, height), Image.Resampling.LANCZOS)
+
+        fmt, setting, data = encode_variant(image, variant)
+        path = Path(source).with_suffix(f".{variant.name}{EXTENSIONS[fmt]}")
+        path.write_bytes(data)
+
+        return EncodeResult(
+            source=source,
+            path=str(path),
+            variant=variant.name,
+            fmt=fmt,
+            setting=setting,
+            size=len(data),
+            ratio=Path(source).stat().st_size / len(data),
+            seconds=time.perf_counter() - began,
+            fits=variant.budget is None or len(data) <= variant.budget,
+        )
+
+    def _encode_source(self, source: str) -> list[EncodeResult]:
+        with Image.open(source) as file:
+            # rendered heatmaps are RGB already, converting would copy them
+            image = file if file.mode == "RGB" else file.convert("RGB")
+            try:
+                return [self._encode(source, image, variant) for variant in self.variants]
+            finally:
+                image.close()
+
+    def encode(self, sources: list[str]) -> EncodeReport:
+        """Encode every variant of rendered images.
+
+        Args:
+            sources (list[str]): paths of rendered images
+
+        Returns:
+            EncodeReport: encoded images in order of sources and variants
+
+        """
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = [
+                result
+                for source_results in executor.map(self._encode_source, sources)
+                for result in source_results
+            ]
+
+        count("encoded_bytes", sum(result.size for result in results))
+        return EncodeReport(results=results, elapsed=time.perf_counter() - began)
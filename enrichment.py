@@ -0,0 +1,206 @@
+"""Enrichment of index components.
+
+Fills missing tickers, sectors and industries of new index components.
+ISINs are resolved concurrently, asset profiles are fetched in one call and
+all results, also the missing ones, are memoized on disk.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from providers import MarketDataProvider
+
+
+class SymbolCache:
+    """Persistent ISIN -> (ticker, sector, industry) cache.
+
+    Every entry keeps the time it was resolved, so missing results
+    are queried again only after negative_ttl.
+
+    Attributes:
+        path (Path): location of the cache file
+        negative_ttl (timedelta): how long missing results are not queried again
+        entries (dict[str, dict]): cached entries keyed by ISIN
+
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "data/symbols.json",
+        negative_ttl: timedelta = timedelta(days=7),
+    ) -> None:
+        """Init method.
+
+        Args:
+            path (str | Path, optional): location of the cache file.
+                Defaults to "data/symbols.json".
+            negative_ttl (timedelta, optional): how long missing results are not queried again.
+                Defaults to 7 days.
+
+        """
+        self.path = Path(path)
+        self.negative_ttl = negative_ttl
+        self.entries: dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                warn = f"symbol cache at {self.path} is corrupted, starting from scratch"
+                logging.exception(warn)
+
+    def get(self, isin: str, field: str) -> tuple[bool, str | None]:
+        """Get cached value.
+
+        Args:
+            isin (str): ISIN of the company
+            field (str): one of 'ticker', 'sector', 'industry'
+
+        Returns:
+            tuple[bool, str | None]: whether the value is cached and the value, None if missing
+
+        """
+        entry = self.entries.get(isin, {})
+        if field not in entry:
+            return False, None
+
+        value = entry[field]
+        if value is None:
+            resolved_at = datetime.fromisoformat(entry[f"{field}_resolved_at"])
+            if datetime.now(UTC) - resolved_at >= self.negative_ttl:
+                return False, None
+        return True, value
+
+    def set(self, isin: str, field: str, value: str | None) -> None:
+        """Cache a value, None if it is missing.
+
+        Args:
+            isin (str): ISIN of the company
+            field (str): one of 'ticker', 'sector', 'industry'
+            value (str | None): value to cache
+
+        """
+        entry = self.entries.setdefault(isin, {})
+        entry[field] = value
+        entry[f"{field}_resolved_at"] = datetime.now(UTC).isoformat()
+
+    def save(self) -> None:
+        """Save the cache to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+
+
+class Enricher:
+    """Fills missing tickers, sectors and industries of index components.
+
+    Attributes:
+        provider (MarketDataProvider): source of symbols and asset profiles
+        cache (SymbolCache): memoized results
+        workers (int): size of the symbol search worker pool
+
+    """
+
+    def __init__(
+        self,
+        provider: MarketDataProvider,
+        cache: SymbolCache,
+        workers: int = 8,
+    ) -> None:
+        """Init method.
+
+        Args:
+            provider (MarketDataProvider): source of symbols and asset profiles
+            cache (SymbolCache): memoized results
+            workers (int, optional): size of the symbol search worker pool. Defaults to 8.
+
+        """
+        self.provider = provider
+        self.cache = cache
+        self.workers = workers
+
+    def _search(self, isin: str) -> str | None:
+        try:
+            return self.provider.search_symbol(isin)
+        except ValueError:
+            warn = f"ticker of {isin} not found"
+            logging.warning(warn)
+            return None
+
+    def _resolve_tickers(self, isins: list[str]) -> dict[str, str | None]:
+        tickers = {}
+        to_search = []
+        for isin in isins:
+            cached, ticker = self.cache.get(isin, "ticker")
+            if cached:
+                tickers[isin] = ticker
+            else:
+                to_search.append(isin)
+
+        if to_search:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                found = dict(zip(to_search, executor.map(self._search, to_search), strict=True))
+            for isin, ticker in found.items():
+                self.cache.set(isin, "ticker", ticker)
+            tickers.update(found)
+
+        return tickers
+
+    def _resolve_profiles(self, tickers: dict[str, str]) -> dict[str, dict]:
+        profiles = {}
+        to_fetch = {}
+        for isin, ticker in tickers.items():
+            sector_cached, sector = self.cache.get(isin, "sector")
+            industry_cached, industry = self.cache.get(isin, "industry")
+            if sector_cached and industry_cached:
+                profiles[isin] = {"sector": sector, "industry": industry}
+            else:
+                to_fetch[ticker] = isin
+
+        if to_fetch:
+            # one multi-symbol request for all missing profiles
+            fetched = self.provider.get_asset_profiles(list(to_fetch))
+            for ticker, isin in to_fetch.items():
+                profile = fetched.get(ticker) or {"sector": None, "industry": None}
+                for field in ("sector", "industry"):
+                    self.cache.set(isin, field, profile.get(field))
+                profiles[isin] = profile
+
+        return profiles
+
+    def enrich(self, components: pd.DataFrame) -> pd.DataFrame:
+        """Fill missing values of components.
+
+        Args:
+            components (pd.DataFrame): cols('company', 'ISIN', 'yf_ticker', 'sector', 'industry')
+
+        Returns:
+            pd.DataFrame: components with filled values, missing results stay NaN
+
+        """
+        components = components.copy()
+
+        missing_ticker = components.yf_ticker.isna()
+        if missing_ticker.any():
+            tickers = self._resolve_tickers(components.loc[missing_ticker, "ISIN"].to_list())
+            components.loc[missing_ticker, "yf_ticker"] = components.loc[
+                missing_ticker,
+                "ISIN",
+            ].map(tickers)
+
+        missing_profile = (components.sector.isna() | components.industry.isna()) & (
+            components.yf_ticker.notna()
+        )
+        if missing_profile.any():
+            rows = components.loc[missing_profile]
+            profiles = self._resolve_profiles(dict(zip(rows.ISIN, rows.yf_ticker, strict=True)))
+            for field in ("sector", "industry"):
+                components.loc[missing_profile, field] = rows.ISIN.map(
+                    lambda isin, field=field: profiles[isin][field],
+                )
+
+        self.cache.save()
+        return components
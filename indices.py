@@ -0,0 +1,57 @@
+"""Index definitions.
+
+Every index posted by the bot is described by its GPW ISIN, used to get its
+components from gpwbenchmark.pl, its Yahoo Finance symbol, used to get its
+level, and texts of its heatmaps and tweets. Sub-indices are subsets of WIG,
+so prices of their components are downloaded once for all indices.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    """Definition of an index.
+
+    Attributes:
+        name (str): short name, root of the treemap, e.g. 'WIG20'
+        isin (str): ISIN of the index on gpwbenchmark.pl
+        symbol (str): Yahoo Finance symbol of the index level
+        title (str): title of heatmaps
+        hashtag (str): hashtag of tweets
+
+    """
+
+    name: str
+    isin: str
+    symbol: str
+    title: str
+    hashtag: str
+
+
+WIG = IndexConfig("WIG", "PL9999999995", "WIG.WA", "INDEX WIG", "#WIG")
+WIG20 = IndexConfig("WIG20", "PL9999999987", "WIG20.WA", "INDEX WIG20", "#WIG20")
+MWIG40 = IndexConfig("mWIG40", "PL9999999912", "MWIG40.WA", "INDEX mWIG40", "#mWIG40")
+SWIG80 = IndexConfig("sWIG80", "PL9999999911", "SWIG80.WA", "INDEX sWIG80", "#sWIG80")
+
+INDICES = {index.name: index for index in (WIG, WIG20, MWIG40, SWIG80)}
+
+
+def get_indices(names: list[str]) -> dict[str, IndexConfig]:
+    """Get definitions of indices by name.
+
+    Args:
+        names (list[str]): names of indices, e.g. ['WIG', 'WIG20']
+
+    Raises:
+        ValueError: unknown index
+
+    Returns:
+        dict[str, IndexConfig]: definitions by name in the given order
+
+    """
+    unknown = [name for name in names if name not in INDICES]
+    if unknown:
+        msg = f"unknown indices {unknown}, use some of {list(INDICES)}"
+        raise ValueError(msg)
+    return {name: INDICES[name] for name in dict.fromkeys(names)}
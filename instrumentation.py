@@ -0,0 +1,353 @@
+"""Stage level instrumentation.
+
+Spans record wall time, CPU time, peak RSS and counters (downloaded rows,
+image bytes, uploaded bytes) of stages of a run. Finished spans are written
+to a JSON-lines run report and optionally to a Prometheus textfile, e.g. for
+the node exporter textfile collector. Every top-level stage can also be
+profiled with cProfile.
+
+Spans go to the module tracer, like log records go to the root logger:
+
+    with span("download") as s:
+        s.count("rows", len(prices))
+
+    @traced("auth")
+    def auth(): ...
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import logging
+import re
+import resource
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class Span:
+    """Measured stage.
+
+    Attributes:
+        name (str): name of the stage
+        parent (str | None): name of the enclosing stage
+        thread (str): name of the thread
+        started_at (float): unix time of the start
+        wall (float): wall time in seconds
+        cpu (float): CPU time of the process in seconds, including worker threads
+        peak_rss_mb (float): peak RSS of the process at the end, in MB
+        rss_growth_mb (float): growth of peak RSS during the stage, in MB
+        counters (dict[str, float]): e.g. rows, image_bytes, uploaded_bytes
+        error (str | None): exception raised by the stage
+
+    """
+
+    name: str
+    parent: str | None
+    thread: str
+    started_at: float
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_rss_mb: float = 0.0
+    rss_growth_mb: float = 0.0
+    counters: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+    def count(self, name: str, value: float) -> None:
+        """Add to a counter.
+
+        Args:
+            name (str): name of the counter
+            value (float): value to add
+
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+class Tracer:
+    """Collects spans of a run and writes them out.
+
+    Attributes:
+        report (Path | None): JSON-lines run report, appended on flush
+        prometheus (Path | None): Prometheus textfile, replaced on flush
+        profile_dir (Path | None): directory of cProfile dumps of outermost profiled stages
+        run_id (str): id of the current run
+        spans (list[Span]): finished spans of the current run
+
+    """
+
+    def __init__(
+        self,
+        report: str | Path | None = None,
+        prometheus: str | Path | None = None,
+        profile_dir: str | Path | None = None,
+    ) -> None:
+        """Init method.
+
+        Args:
+            report (str | Path | None, optional): JSON-lines run report. Defaults to None.
+            prometheus (str | Path | None, optional): Prometheus textfile. Defaults to None.
+            profile_dir (str | Path | None, optional): directory of cProfile dumps.
+                Defaults to None, not profiling.
+
+        """
+        self.configure(report, prometheus, profile_dir)
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiling = False
+
+    def configure(
+        self,
+        report: str | Path | None = None,
+        prometheus: str | Path | None = None,
+        profile_dir: str | Path | None = None,
+    ) -> None:
+        """Set outputs of the tracer.
+
+        Args:
+            report (str | Path | None, optional): JSON-lines run report. Defaults to None.
+            prometheus (str | Path | None, optional): Prometheus textfile. Defaults to None.
+            profile_dir (str | Path | None, optional): directory of cProfile dumps.
+                Defaults to None, not profiling.
+
+        """
+        self.report = Path(report) if report is not None else None
+        self.prometheus = Path(prometheus) if prometheus is not None else None
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+
+    def _stack(self) -> list[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self) -> Span | None:
+        """Get the innermost open span of the calling thread.
+
+        Returns:
+            Span | None: open span, None outside of spans
+
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        # one profiler at a time, nested and concurrent stages are in the outer profile
+        with self._lock:
+            if self.profile_dir is None or self._profiling:
+                return None
+            self._profiling = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # other profiler is active
+            self._profiling = False
+            return None
+        return profile
+
+    def _stop_profile(self, profile: cProfile.Profile, span: Span) -> None:
+        profile.disable()
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        name = re.sub(r"[^\w.-]", "_", span.name)
+        profile.dump_stats(self.profile_dir / f"{self.run_id}-{len(self.spans):03d}-{name}.prof")
+        self._profiling = False
+
+    @contextmanager
+    def span(self, name: str, *, profile: bool = True) -> Iterator[Span]:
+        """Measure a stage.
+
+        Args:
+            name (str): name of the stage
+            profile (bool, optional): dump cProfile of the stage if profiling is on
+                and no enclosing stage is profiled. Defaults to True.
+
+        Yields:
+            Iterator[Span]: open span, add counters to it
+
+        """
+        stack = self._stack()
+        span = Span(
+            name=name,
+            parent=stack[-1].name if stack else None,
+            thread=threading.current_thread().name,
+            started_at=time.time(),
+        )
+        stack.append(span)
+
+        rss = _peak_rss_mb()
+        profiler = self._start_profile() if profile else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.wall = time.perf_counter() - wall
+            span.cpu = time.process_time() - cpu
+            if profiler is not None:
+                self._stop_profile(profiler, span)
+            span.peak_rss_mb = _peak_rss_mb()
+            span.rss_growth_mb = span.peak_rss_mb - rss
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+            debug = f"{name}: {span.wall:.3f}s wall, {span.cpu:.3f}s cpu, {span.counters}"
+            logging.debug(debug)
+
+    def flush(self) -> list[Span]:
+        """Write spans of the run to the report and textfile and start a new run.
+
+        Returns:
+            list[Span]: spans of the finished run
+
+        """
+        with self._lock:
+            spans, self.spans = self.spans, []
+            run_id, self.run_id = self.run_id, uuid.uuid4().hex[:12]
+
+        if self.report is not None and spans:
+            self.report.parent.mkdir(parents=True, exist_ok=True)
+            with self.report.open("a", encoding="utf-8") as file:
+                for span in spans:
+                    file.write(json.dumps({"run_id": run_id, **asdict(span)}) + "\n")
+
+        if self.prometheus is not None:
+            self._write_prometheus(spans)
+
+        for line in summary(spans):
+            logging.info(line)
+
+        return spans
+
+    def _write_prometheus(self, spans: list[Span]) -> None:
+        metrics: dict[str, dict[str, float]] = {}
+        for span in spans:
+            values = {
+                "wall_seconds": span.wall,
+                "cpu_seconds": span.cpu,
+                "calls": 1,
+                "errors": span.error is not None,
+                **{re.sub(r"\W", "_", name): value for name, value in span.counters.items()},
+            }
+            for metric, value in values.items():
+                by_stage = metrics.setdefault(metric, {})
+                by_stage[span.name] = by_stage.get(span.name, 0) + value
+
+        lines = []
+        for metric, by_stage in metrics.items():
+            lines.append(f"# TYPE twitter_bot_stage_{metric} gauge")
+            lines.extend(
+                f'twitter_bot_stage_{metric}{{stage="{stage}"}} {value}'
+                for stage, value in by_stage.items()
+            )
+        lines.append("# TYPE twitter_bot_peak_rss_bytes gauge")
+        lines.append(f"twitter_bot_peak_rss_bytes {_peak_rss_mb() * 2**20:.0f}")
+        lines.append("# TYPE twitter_bot_last_run_timestamp_seconds gauge")
+        lines.append(f"twitter_bot_last_run_timestamp_seconds {time.time():.0f}")
+
+        # textfile collectors may read at any time, so the file is replaced atomically
+        self.prometheus.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prometheus.with_suffix(".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp_path.replace(self.prometheus)
+
+
+def summary(spans: list[Span]) -> list[str]:
+    """Describe spans aggregated by stage.
+
+    Args:
+        spans (list[Span]): finished spans
+
+    Returns:
+        list[str]: one line per stage in order of first finish
+
+    """
+    stages: dict[str, list[Span]] = {}
+    for span in spans:
+        stages.setdefault(span.name, []).append(span)
+
+    lines = []
+    for name, group in stages.items():
+        counters: dict[str, float] = {}
+        for span in group:
+            for counter, value in span.counters.items():
+                counters[counter] = counters.get(counter, 0) + value
+        line = (
+            f"{name} x{len(group)}: {sum(s.wall for s in group):.3f}s wall, "
+            f"{sum(s.cpu for s in group):.3f}s cpu, "
+            f"peak RSS {max(s.peak_rss_mb for s in group):.0f} MB"
+        )
+        lines.append(line + "".join(f", {k} {v:.0f}" for k, v in counters.items()))
+    return lines
+
+
+TRACER = Tracer()
+
+
+def span(name: str, *, profile: bool = True) -> AbstractContextManager[Span]:
+    """Measure a stage with the module tracer.
+
+    Args:
+        name (str): name of the stage
+        profile (bool, optional): dump cProfile of the stage if profiling is on. Defaults to True.
+
+    Returns:
+        AbstractContextManager[Span]: context manager yielding the open span
+
+    """
+    return TRACER.span(name, profile=profile)
+
+
+def count(name: str, value: float) -> None:
+    """Add to a counter of the innermost open span of the calling thread, if any.
+
+    Args:
+        name (str): name of the counter
+        value (float): value to add
+
+    """
+    current = TRACER.current()
+    if current is not None:
+        current.count(name, value)
+
+
+def traced(name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Measure every call of a function as a stage.
+
+    Args:
+        name (str): name of the stage
+
+    Returns:
+        Callable[[Callable[P, R]], Callable[P, R]]: decorator
+
+    """
+
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with TRACER.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,190 @@
+"""Treemap layout cache.
+
+Geometry of the heatmap depends only on the index -> sector -> ticker hierarchy
+and market caps, so it is the same for every period rendered in a run and
+barely changes from day to day. Layouts are keyed by a hash of the hierarchy
+and reused as long as market caps drifted less than a tolerance, so every
+heatmap only has to be recolored and relabeled.
+"""
+
+import hashlib
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+from treemap import TreemapLayout, compute_layout
+
+LAYOUT_FIELDS = ("root_rect", "sectors", "sector_rects", "tickers", "ticker_sector", "ticker_rects")
+
+
+def structure_key(tickers: np.ndarray, sectors: np.ndarray, width: int, height: int) -> str:
+    """Hash the hierarchy and size of a treemap.
+
+    Args:
+        tickers (np.ndarray): tickers of components
+        sectors (np.ndarray): sectors of components
+        width (int): width of the image
+        height (int): height of the image
+
+    Returns:
+        str: hex digest, the same for the same components in any order
+
+    """
+    pairs = sorted(zip(np.asarray(tickers, dtype=str), np.asarray(sectors, dtype=str), strict=True))
+    digest = hashlib.sha1(f"{width}x{height}".encode(), usedforsecurity=False)
+    for ticker, sector in pairs:
+        digest.update(f"\0{ticker}\0{sector}".encode())
+    return digest.hexdigest()[:16]
+
+
+def cap_drift(
+    layout: TreemapLayout,
+    laid_out_caps: np.ndarray,
+    tickers: np.ndarray,
+    mkt_cap: np.ndarray,
+) -> float:
+    """Measure how much market caps moved since the layout was computed.
+
+    Args:
+        layout (TreemapLayout): cached layout with the same tickers
+        laid_out_caps (np.ndarray): market caps of the layout, in order of layout.tickers
+        tickers (np.ndarray): tickers of components
+        mkt_cap (np.ndarray): current market caps
+
+    Returns:
+        float: total variation distance of market cap shares, 0 - same, 1 - disjoint
+
+    """
+    current = np.zeros(len(layout.tickers))
+    current[layout.positions(np.asarray(tickers, dtype=str))] = np.nan_to_num(
+        np.asarray(mkt_cap, dtype=np.float64),
+    ).clip(min=0)
+
+    old_share = laid_out_caps / max(laid_out_caps.sum(), 1e-12)
+    new_share = current / max(current.sum(), 1e-12)
+    return float(np.abs(new_share - old_share).sum() / 2)
+
+
+class LayoutCache:
+    """Memory and disk cache of treemap layouts.
+
+    Every hierarchy keeps one layout in <directory>/<key>.npz together with the
+    market caps it was computed for. The layout is computed again when
+    market cap shares drifted more than tolerance.
+
+    Attributes:
+        directory (Path | None): location of cached layouts, None keeps them only in memory
+        tolerance (float): largest accepted total variation distance of market cap shares
+        max_files (int): how many layouts are kept on disk
+        hits (int): layouts served from cache
+        misses (int): layouts computed
+
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = "data/layouts",
+        tolerance: float = 0.01,
+        max_files: int = 16,
+    ) -> None:
+        """Init method.
+
+        Args:
+            directory (str | Path | None, optional): location of cached layouts,
+                None keeps them only in memory. Defaults to "data/layouts".
+            tolerance (float, optional): largest accepted drift of market cap shares.
+                Defaults to 0.01.
+            max_files (int, optional): how many layouts are kept on disk. Defaults to 16.
+
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self.tolerance = tolerance
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self._memory: dict[str, tuple[TreemapLayout, np.ndarray]] = {}
+
+    def _load(self, key: str) -> tuple[TreemapLayout, np.ndarray] | None:
+        if key in self._memory:
+            return self._memory[key]
+        if self.directory is None or not (self.directory / f"{key}.npz").exists():
+            return None
+
+        try:
+            with np.load(self.directory / f"{key}.npz") as stored:
+                layout = TreemapLayout(**{field: stored[field] for field in LAYOUT_FIELDS})
+                entry = layout, stored["mkt_cap"]
+        except (OSError, ValueError, KeyError):
+            warn = f"cached layout {key} is corrupted, computing it again"
+            logging.exception(warn)
+            return None
+
+        self._memory[key] = entry
+        return entry
+
+    def _save(self, key: str, layout: TreemapLayout, mkt_cap: np.ndarray) -> None:
+        self._memory[key] = layout, mkt_cap
+        if self.directory is None:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{key}.tmp.npz"
+        np.savez(
+            tmp_path,
+            mkt_cap=mkt_cap,
+            **{field: getattr(layout, field) for field in LAYOUT_FIELDS},
+        )
+        tmp_path.replace(self.directory / f"{key}.npz")
+
+        # forget layouts of old hierarchies
+        files = sorted(self.directory.glob("*.npz"), key=lambda file: file.stat().st_mtime)
+        for file in files[: -self.max_files]:
+            file.unlink(missing_ok=True)
+
+    def get(
+        self,
+        tickers: np.ndarray,
+        sectors: np.ndarray,
+        mkt_cap: np.ndarray,
+        width: int = 7680,
+        height: int = 4320,
+    ) -> TreemapLayout:
+        """Get cached layout or compute and cache a new one.
+
+        Args:
+            tickers (np.ndarray): tickers of components
+            sectors (np.ndarray): sectors of components
+            mkt_cap (np.ndarray): market caps, sizes of tiles
+            width (int, optional): width of the image. Defaults to 7680.
+            height (int, optional): height of the image. Defaults to 4320.
+
+        Returns:
+            TreemapLayout: geometry of the treemap
+
+        """
+        key = structure_key(tickers, sectors, width, height)
+        cached = self._load(key)
+        if cached is not None:
+            layout, laid_out_caps = cached
+            drift = cap_drift(layout, laid_out_caps, tickers, mkt_cap)
+            if drift <= self.tolerance:
+                self.hits += 1
+                return layout
+
+            info = f"market caps drifted by {drift:.2%}, computing layout {key} again"
+            logging.info(info)
+
+        began = time.perf_counter()
+        layout = compute_layout(tickers, sectors, mkt_cap, width, height)
+        laid_out_caps = np.zeros(len(layout.tickers))
+        laid_out_caps[layout.positions(np.asarray(tickers, dtype=str))] = np.nan_to_num(
+            np.asarray(mkt_cap, dtype=np.float64),
+        ).clip(min=0)
+        self._save(key, layout, laid_out_caps)
+        self.misses += 1
+
+        info = f"computed layout {key} in {time.perf_counter() - began:.2f}s"
+        logging.info(info)
+        return layout
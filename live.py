@@ -0,0 +1,558 @@
+"""Intraday live heatmaps.
+
+Quotes of components are read from a feed during the session, from the market
+data provider in production or from a simulated random walk in tests. Only
+tickers with a new quote get their return and market cap updated against the
+previous close, and colour bins of the heatmap are tracked tick by tick, so
+the cost of a snapshot follows the number of ticks, not the size of the index.
+The heatmap is rendered at most once per interval and only when tiles of
+enough market cap changed their colour. Snapshots are posted at Warsaw times,
+e.g. after the open, at midday and before the closing auction.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from datetime import time as clock
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from instrumentation import TRACER, span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from main import TwitterBot
+    from providers import MarketDataProvider
+    from treemap import HeatmapSpec
+
+# Warsaw times of posted snapshots, the closing auction starts at 16:50
+DEFAULT_SNAPSHOTS = (clock(9, 15), clock(13, 0), clock(16, 45))
+# quotes are polled from the open to the end of the closing auction
+SESSION_OPEN = clock(9, 0)
+SESSION_END = clock(17, 5)
+
+# colour bound of intraday heatmaps, the one of 1D heatmaps
+LIVE_BOUND = 0.03
+# bins on each side of the colour scale, a tile changes colour when it changes bin
+COLOR_BINS = 10
+
+
+def color_bins(returns: np.ndarray, bound: float, bins: int = COLOR_BINS) -> np.ndarray:
+    """Get bins of the colour scale of returns.
+
+    Args:
+        returns (np.ndarray): returns
+        bound (float): return at the ends of the colour scale
+        bins (int, optional): bins on each side of the scale. Defaults to COLOR_BINS.
+
+    Returns:
+        np.ndarray: bins from -bins to bins, 0 is grey
+
+    """
+    position = np.nan_to_num(np.asarray(returns, dtype=np.float64)) / bound
+    return np.rint(position.clip(-1, 1) * bins).astype(np.int8)
+
+
+class QuoteFeed(ABC):
+    """Source of intraday quotes."""
+
+    @abstractmethod
+    def poll(self) -> dict[str, float]:
+        """Get quotes that changed since the last poll.
+
+        Returns:
+            dict[str, float]: last price by Yahoo Finance symbol
+
+        """
+
+
+class PollingFeed(QuoteFeed):
+    """Polls quotes of all symbols from the market data provider.
+
+    Attributes:
+        provider (MarketDataProvider): source of quotes
+        symbols (list[str]): Yahoo Finance symbols to poll
+
+    """
+
+    def __init__(self, provider: MarketDataProvider, symbols: list[str]) -> None:
+        """Init method.
+
+        Args:
+            provider (MarketDataProvider): source of quotes
+            symbols (list[str]): Yahoo Finance symbols to poll
+
+        """
+        self.provider = provider
+        self.symbols = symbols
+        self._last: dict[str, float] = {}
+
+    def poll(self) -> dict[str, float]:  # noqa: D102
+        quotes = self.provider.get_quotes(self.symbols)
+        changed = {
+            symbol: price for symbol, price in quotes.items() if self._last.get(symbol) != price
+        }
+        self._last.update(changed)
+        return changed
+
+
+class SimulatedFeed(QuoteFeed):
+    """Random walk of quotes starting at given prices, for running the live mode offline.
+
+    Attributes:
+        symbols (np.ndarray): Yahoo Finance symbols
+        prices (np.ndarray): current prices
+        share (float): share of symbols ticking on every poll
+        volatility (float): standard deviation of log returns of a tick
+
+    """
+
+    def __init__(
+        self,
+        prices: dict[str, float],
+        share: float = 0.05,
+        volatility: float = 0.002,
+        seed: int | None = None,
+    ) -> None:
+        """Init method.
+
+        Args:
+            prices (dict[str, float]): starting price by Yahoo Finance symbol
+            share (float, optional): share of symbols ticking on every poll. Defaults to 0.05.
+            volatility (float, optional): standard deviation of log returns of a tick.
+                Defaults to 0.002.
+            seed (int | None, optional): seed of the random walk. Defaults to None.
+
+        """
+        self.symbols = np.array(list(prices), dtype=object)
+        self.prices = np.array(list(prices.values()), dtype=np.float64)
+        self.share = share
+        self.volatility = volatility
+        self._rng = np.random.default_rng(seed)
+
+    def poll(self) -> dict[str, float]:  # noqa: D102
+        n_ticks = max(round(self.share * len(self.symbols)), 1)
+        ticked = self._rng.choice(len(self.symbols), n_ticks, replace=False)
+        self.prices[ticked] *= np.exp(self._rng.normal(0, self.volatility, n_ticks))
+        return dict(zip(self.symbols[ticked], self.prices[ticked].round(2).tolist(), strict=True))
+
+
+class LiveHeatmap:
+    """Returns of components of an index against the previous close, updated tick by tick.
+
+    Attributes:
+        index (str): name of the index
+        symbols (np.ndarray): Yahoo Finance symbols of components
+        tickers (np.ndarray): tickers of components
+        sectors (np.ndarray): sectors of components
+        companies (np.ndarray): names of components
+        shares (np.ndarray): numbers of shares
+        prev_close (np.ndarray): prices at the previous close
+        prices (np.ndarray): last prices
+        returns (np.ndarray): returns since the previous close
+        mkt_cap (np.ndarray): market caps at last prices
+        bins (np.ndarray): colour bins of returns
+        changed (float): share of market cap whose colour changed since the last render
+        ticks (int): quotes applied since the start
+
+    """
+
+    def __init__(
+        self,
+        index: str,
+        components: pd.DataFrame,
+        prev_close: np.ndarray,
+        bound: float = LIVE_BOUND,
+    ) -> None:
+        """Init method.
+
+        Args:
+            index (str): name of the index
+            components (pd.DataFrame): components with 'yf_ticker', 'ticker', 'sector',
+                'company' and 'shares_num' columns
+            prev_close (np.ndarray): prices at the previous close in order of components
+            bound (float, optional): return at the ends of the colour scale.
+                Defaults to LIVE_BOUND.
+
+        """
+        self.index = index
+        self.bound = bound
+        self.symbols = components.yf_ticker.to_numpy(dtype=object)
+        self.tickers = components.ticker.to_numpy(dtype=str)
+        self.sectors = components.sector.fillna("").to_numpy(dtype=str)
+        self.companies = components.company.to_numpy(dtype=object)
+        self.shares = components.shares_num.to_numpy(dtype=np.float64)
+        self.prev_close = np.asarray(prev_close, dtype=np.float64)
+
+        self.prices = self.prev_close.copy()
+        self.returns = np.zeros(len(self.prices))
+        self.mkt_cap = self.prices * self.shares
+        self.bins = np.zeros(len(self.prices), dtype=np.int8)
+        self.changed = 0.0
+        self.ticks = 0
+
+        # colours are weighted by market caps at the previous close, like sizes of tiles
+        prev_cap = np.nan_to_num(self.mkt_cap)
+        self._weights = prev_cap / max(prev_cap.sum(), 1e-12)
+        self._rendered_bins = self.bins.copy()
+        self._positions = {symbol: position for position, symbol in enumerate(self.symbols)}
+
+    def update(self, quotes: dict[str, float]) -> int:
+        """Apply new quotes.
+
+        Args:
+            quotes (dict[str, float]): last price by Yahoo Finance symbol, other symbols are
+                ignored
+
+        Returns:
+            int: number of applied quotes
+
+        """
+        positions = np.fromiter(
+            (self._positions.get(symbol, -1) for symbol in quotes),
+            dtype=np.intp,
+            count=len(quotes),
+        )
+        prices = np.fromiter(quotes.values(), dtype=np.float64, count=len(quotes))
+        valid = (positions >= 0) & (prices > 0)
+        positions, prices = positions[valid], prices[valid]
+
+        was_changed = self.bins[positions] != self._rendered_bins[positions]
+        self.prices[positions] = prices
+        self.returns[positions] = prices / self.prev_close[positions] - 1
+        self.mkt_cap[positions] = prices * self.shares[positions]
+        self.bins[positions] = color_bins(self.returns[positions], self.bound)
+        is_changed = self.bins[positions] != self._rendered_bins[positions]
+
+        weights = self._weights[positions]
+        self.changed += weights[is_changed & ~was_changed].sum()
+        self.changed -= weights[was_changed & ~is_changed].sum()
+        self.ticks += len(positions)
+        return len(positions)
+
+    @property
+    def index_return(self) -> float:
+        """Cap-weighted return of components since the previous close."""
+        prev_cap = np.nansum(self.prev_close * self.shares)
+        return float(np.nansum(self.mkt_cap) / prev_cap - 1) if prev_cap else 0.0
+
+    def spec(
+        self,
+        title: str,
+        subtitle: str,
+        footer: tuple[str, str, str],
+        layout: object = None,
+    ) -> HeatmapSpec:
+        """Get the heatmap of last prices and mark it rendered.
+
+        Args:
+            title (str): title of the image
+            subtitle (str): subtitle of the image
+            footer (tuple[str, str, str]): texts at the bottom left, center and right
+            layout (object, optional): geometry of tiles. Defaults to one computed by the renderer.
+
+        Returns:
+            HeatmapSpec: heatmap ready to render
+
+        """
+        from treemap import HeatmapSpec
+
+        self._rendered_bins = self.bins.copy()
+        self.changed = 0.0
+        return HeatmapSpec(
+            tickers=self.tickers,
+            sectors=self.sectors,
+            mkt_cap=self.mkt_cap.copy(),
+            returns=self.returns.copy(),
+            prices=self.prices.copy(),
+            bound=self.bound,
+            title=title,
+            subtitle=subtitle,
+            footer=footer,
+            root=self.index,
+            layout=layout,
+        )
+
+    def tweet_text(self, hashtag: str, now: datetime) -> str:
+        """Prepare text of a snapshot tweet.
+
+        Args:
+            hashtag (str): hashtag of the index
+            now (datetime): time of the snapshot
+
+        Returns:
+            str: text to directly put on the tweet
+
+        """
+        best = int(np.nanargmax(self.returns))
+        worst = int(np.nanargmin(self.returns))
+        return (
+            f"{self.index} Index intraday {now:%H:%M}: {self.index_return:+.2%}\n"
+            f"\n🟢 {self.tickers[best]} {self.companies[best]} {self.returns[best]:.2%}\n"
+            f"🔴 {self.tickers[worst]} {self.companies[worst]} {self.returns[worst]:.2%}\n"
+            f"\n{hashtag} #GPW #giełda #inwestycje #akcje"
+        )
+
+
+def live_heatmap(bot: TwitterBot, index: str, day: date) -> LiveHeatmap:
+    """Get the live heatmap of an index starting at the last close before a day.
+
+    Args:
+        bot (TwitterBot): bot with loaded data
+        index (str): name of the index
+        day (date): day of the session
+
+    Raises:
+        ValueError: no close before the day in loaded prices
+
+    Returns:
+        LiveHeatmap: heatmap with returns of zero
+
+    """
+    matrix = bot.matrix
+    # the bar of the day itself may be an intraday one
+    row = int(np.searchsorted(matrix.dates, np.datetime64(day, "ns"))) - 1
+    if row < 0:
+        msg = f"no close before {day} in loaded prices"
+        raise ValueError(msg)
+
+    components = bot.components[index]
+    columns = matrix.codes(components.ticker)
+    components = components[columns >= 0]
+    return LiveHeatmap(index, components, matrix.values[row, columns[columns >= 0]])
+
+
+class LiveSession:
+    """Keeps live heatmaps of indices updated during the session and posts snapshots.
+
+    Attributes:
+        bot (TwitterBot): bot with indices, outbox and encoder to use
+        feed (QuoteFeed): source of quotes
+        output (Path): directory of live heatmaps
+        render_interval (float): shortest time between renders of a heatmap in seconds
+        min_change (float): share of market cap that has to change colour to render again
+        snapshots (tuple[clock, ...]): Warsaw times of posted snapshots
+        heatmaps (dict[str, LiveHeatmap]): live heatmaps by index
+
+    """
+
+    def __init__(
+        self,
+        bot: TwitterBot,
+        feed: QuoteFeed | None = None,
+        output: str | Path = "live",
+        render_interval: float = 60.0,
+        min_change: float = 0.02,
+        snapshots: tuple[clock, ...] = DEFAULT_SNAPSHOTS,
+    ) -> None:
+        """Init method.
+
+        Loads data if it is not loaded yet.
+
+        Args:
+            bot (TwitterBot): bot with indices, outbox and encoder to use
+            feed (QuoteFeed | None, optional): source of quotes. Defaults to polling
+                quotes of components from the provider of the bot.
+            output (str | Path, optional): directory of live heatmaps. Defaults to "live".
+            render_interval (float, optional): shortest time between renders of a heatmap
+                in seconds. Defaults to 60.0.
+            min_change (float, optional): share of market cap that has to change colour
+                to render again. Defaults to 0.02.
+            snapshots (tuple[clock, ...], optional): Warsaw times of posted snapshots.
+                Defaults to DEFAULT_SNAPSHOTS.
+
+        """
+        from layout_cache import LayoutCache
+        from render import HeatmapRenderer
+
+        self.bot = bot
+        self.output = Path(output)
+        self.render_interval = render_interval
+        self.min_change = min_change
+        self.snapshots = snapshots
+
+        if not bot.data_loaded:
+            bot.load_data()
+        day = bot.now.date()
+        self.heatmaps = {
+            index: live_heatmap(bot, index, day)
+            for index in bot.indices
+            if index in bot.index_prices.columns
+        }
+        self.feed = feed or PollingFeed(bot.provider, list(self.closes()))
+
+        # tiles are laid out by market caps of the previous close for the whole session
+        layouts = LayoutCache(bot.data_dir / "layouts")
+        self._layouts = {
+            index: layouts.get(heatmap.tickers, heatmap.sectors, np.nan_to_num(heatmap.mkt_cap))
+            for index, heatmap in self.heatmaps.items()
+        }
+        self._renderer = HeatmapRenderer(workers=1, backend="native", layouts=layouts)
+        self._rendered_at = dict.fromkeys(self.heatmaps, -np.inf)
+        self._posted: set[clock] = {slot for slot in snapshots if slot <= bot.now.time()}
+        self._stopping = threading.Event()
+
+    def closes(self) -> dict[str, float]:
+        """Get previous closes of components of all live indices.
+
+        Returns:
+            dict[str, float]: price by Yahoo Finance symbol
+
+        """
+        return {
+            symbol: float(price)
+            for heatmap in self.heatmaps.values()
+            for symbol, price in zip(heatmap.symbols, heatmap.prev_close, strict=True)
+        }
+
+    def _texts(self, index: str, now: datetime) -> tuple[str, str, tuple[str, str, str]]:
+        title, _, (_, handle, source) = self.bot._heatmap_texts("1D", index)  # noqa: SLF001
+        heatmap = self.heatmaps[index]
+        return (
+            title,
+            f"intraday ⁕ {heatmap.index_return:+.2%} ⁕ {now:%Y/%m/%d %H:%M}",
+            (now.strftime(r"%Y/%m/%d %H:%M"), handle, source),
+        )
+
+    def render(self, index: str, path: Path, now: datetime) -> Path:
+        """Render the live heatmap of an index.
+
+        The image is replaced at once, so readers never see a partial one.
+
+        Args:
+            index (str): name of the index
+            path (Path): path of the image
+            now (datetime): time of the heatmap
+
+        Returns:
+            Path: path of the image
+
+        """
+        spec = self.heatmaps[index].spec(*self._texts(index, now), layout=self._layouts[index])
+        tmp_path = path.with_suffix(".tmp.png")
+        with span(f"live render {index}"):
+            self._renderer.render([(spec, str(tmp_path))])
+        tmp_path.replace(path)
+        self._rendered_at[index] = time.monotonic()
+        return path
+
+    def step(self, now: datetime) -> list[str]:
+        """Apply new quotes and render heatmaps that changed enough.
+
+        Args:
+            now (datetime): current Warsaw time
+
+        Returns:
+            list[str]: indices whose heatmaps were rendered
+
+        """
+        began = time.perf_counter()
+        quotes = self.feed.poll()
+        applied = {index: heatmap.update(quotes) for index, heatmap in self.heatmaps.items()}
+
+        rendered = []
+        for index, heatmap in self.heatmaps.items():
+            if time.monotonic() - self._rendered_at[index] < self.render_interval:
+                continue
+            if heatmap.changed < self.min_change:
+                continue
+
+            changed = heatmap.changed
+            self.render(index, self.output / f"{index.lower()}_live.png", now)
+            rendered.append(index)
+
+            info = (
+                f"live {index}: {applied[index]} ticks, {changed:.1%} of market cap changed "
+                f"colour, rendered {time.perf_counter() - began:.2f}s after the poll"
+            )
+            logging.info(info)
+        return rendered
+
+    def post_snapshot(self, index: str, now: datetime, slot: clock | None = None) -> None:
+        """Render the live heatmap of an index and put it to the outbox.
+
+        Args:
+            index (str): name of the index
+            now (datetime): time of the snapshot
+            slot (clock | None, optional): scheduled time of the snapshot, part of the key
+                of the post. Defaults to the time of the snapshot.
+
+        """
+        heatmap = self.heatmaps[index]
+        path = self.render(index, self.output / f"{index.lower()}_live_{now:%H%M}.png", now)
+        upload = self.bot.encode_for_upload([str(path)])[0]
+        text = heatmap.tweet_text(self.bot._index_config(index).hashtag, now)  # noqa: SLF001
+        slot = slot or now.time()
+        self.bot.queue_post(f"{now:%Y-%m-%d}/{index}/live {slot:%H:%M}", text, [upload])
+
+    def _due_snapshots(self, now: datetime) -> list[clock]:
+        return sorted(
+            slot for slot in self.snapshots if slot <= now.time() and slot not in self._posted
+        )
+
+    def run(
+        self,
+        poll_interval: float = 15.0,
+        start: clock = SESSION_OPEN,
+        until: clock = SESSION_END,
+    ) -> None:
+        """Poll quotes, render and post snapshots until the end of the session.
+
+        Args:
+            poll_interval (float, optional): seconds between polls. Defaults to 15.0.
+            start (clock, optional): Warsaw time to start polling at. Defaults to SESSION_OPEN.
+            until (clock, optional): Warsaw time to stop at. Defaults to SESSION_END.
+
+        """
+        self.output.mkdir(parents=True, exist_ok=True)
+        if not self.bot.dry_run:
+            self.bot.posting_worker.start()
+
+        info = f"live heatmaps of {list(self.heatmaps)} until {until:%H:%M}"
+        logging.info(info)
+        try:
+            while not self._stopping.is_set():
+                now = datetime.now(self.bot.tzinfo)
+                if now.time() >= until:
+                    break
+                if now.time() >= start:
+                    self._tick(now)
+                self._stopping.wait(poll_interval)
+        finally:
+            if not self.bot.dry_run:
+                self.bot.posting_worker.stop(timeout=900)
+            self._renderer.close()
+            TRACER.flush()
+            logging.info("live session stopped")
+
+    def _tick(self, now: datetime) -> None:
+        try:
+            self.step(now)
+            due = self._due_snapshots(now)
+            if not due:
+                return
+            # only the newest of slots missed e.g. by a slow poll is posted, all are done
+            slot = due[-1]
+            for index, heatmap in self.heatmaps.items():
+                if not heatmap.ticks:  # e.g. a holiday
+                    warn = f"no quotes of {index} since the previous close, not posting"
+                    logging.warning(warn)
+                    continue
+                self.post_snapshot(index, now, slot)
+            # a failed snapshot is retried on the next poll, the outbox skips queued keys
+            self._posted.update(due)
+            TRACER.flush()
+        except Exception:
+            # one failed poll must not stop the session, e.g. a timeout of the provider
+            logging.exception("live update failed")
+
+    def stop(self) -> None:
+        """Stop after the current poll."""
+        self._stopping.set()
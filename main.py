@@ -1,25 +1,52 @@
 """Script running my twitter bot.
 
 Script includes TwitterBot class that will run bot that posts pictures with WIG returns.
+Sub-indices (WIG20, mWIG40, sWIG80) can be posted too, sharing one price download.
 """
 
+# heavy modules (pandas, plotly, tweepy, yfinance, yahooquery) are imported
+# only when a post is scheduled, so a run with nothing to post exits quickly
+from __future__ import annotations
+
+import argparse
 import logging
 import os
+import resource
 import sys
-from datetime import datetime, timedelta
-from http.client import IncompleteRead
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from functools import cached_property
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import numpy as np
-import pandas as pd
-import plotly.express as px
 import pytz
-import yahooquery as yq
-import yfinance as yf
-from pandas import Index
-from tweepy import API, Client, OAuth1UserHandler
 
-import keys
+from indices import get_indices
+from instrumentation import TRACER, count, span, traced
+from planner import plan_posts
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from pandas import Index
+    from plotly.graph_objects import Figure
+    from tweepy import API, Client
+
+    from analytics import RollingAnalytics
+    from encoding import ImageEncoder
+    from indices import IndexConfig
+    from outbox import Outbox, PostingWorker
+    from planner import PlannedPost
+    from price_matrix import PriceMatrix
+    from price_store import PriceStore
+    from providers import MarketDataProvider
+    from render import HeatmapRenderer
+    from render_cache import RenderCache
+    from returns import ReturnsEngine
+    from treemap import HeatmapSpec
+
+STARTED = time.perf_counter()
 
 os.chdir(Path(__file__).parent)
 
@@ -34,56 +61,399 @@ logging.basicConfig(
 )
 
 
+PERIODS = ("1D", "1W", "MTD", "QTD", "YTD", "1Y")
+
+# Warsaw time of the end of the session, time of heatmaps of past days
+SESSION_CLOSE = clock(17, 5)
+
+# colour bounds for different periods
+COLOR_BOUNDS = {
+    "1D": 0.03,
+    "1W": 0.1,
+    "MTD": 0.2,
+    "QTD": 0.3,
+    "YTD": 0.5,
+    "1Y": 0.5,
+}
+
+# colour modes of heatmaps: column colouring tiles, values at the red and green ends
+# of the scale and subtitle, returns are coloured within bounds of periods
+COLOR_MODES = {
+    "returns": ("returns", None, ""),
+    "volatility": ("volatility", (0.6, 0.0), "52W volatility"),
+    "from_high": ("from_high", (-0.5, 0.0), "from 52W high"),
+}
+
+# weighted length of a tweet, characters past U+10FF, e.g. emoji, count twice
+TWEET_LIMIT = 280
+
+# labels of Yahoo Finance industries shown on heatmaps, mapped once per industry
+PRETTY_INDUSTRY = {
+    "Financial Data & Stock Exchanges": "Financial Data<br>& Stock Exchanges",
+    "Utilities - Regulated Gas": "Regulated Gas",
+    "Utilities - Independent Power Producers": "Independent<br>Power Producers",
+    "Utilities - Renewable": "Renewable",
+    "Utilities - Regulated Electric": "Regulated Electric",
+    "Real Estate - Diversified": "Diversified",
+    "Real Estate Services": "Services",
+    "Real Estate - Development": "Development",
+    "Farm & Heavy Construction Machinery": "Farm & Heavy<br>Construction Machinery",
+    "Staffing & Employment Services": "Staffing & Employment<br>Services",
+    "Tools & Accessories": "Tools & Accessories",
+    "Building Products & Equipment": "Building Products & Equipment",
+    "Integrated Freight & Logistics": "Integrated Freight & Logistics",
+    "Specialty Industrial Machinery": "Specialty Industrial<br>Machinery",
+    "Electrical Equipment & Parts": "Electrical Equipment & Parts",
+    "Metal Fabrication": "Metal Fabrication",
+    "Aerospace & Defense": "Aerospace & Defense",
+    "Paper & Paper Products": "Paper & Paper Products",
+    "Specialty Chemicals": "Specialty Chemicals",
+    "Specialty Business Services": "Specialty Business<br>Services",
+    "Drug Manufacturers - Specialty & Generic": "Drug Manufacturers<br>Specialty & Generic",
+    "Medical Care Facilities": "Medical Care<br>Facilities",
+    "Medical Instruments & Supplies": "Medical Instruments<br>& Supplies",
+    "Pharmaceutical Retailers": "Pharmaceutical<br>Retailers",
+    "Electronic Components": "Electronic Components",
+    "Scientific & Technical Instruments": "Scientific & Technical<br>Instruments",
+    "Electronics & Computer Distribution": "Electronics & Computer<br>Distribution",
+    "Furnishings, Fixtures & Appliances": "Furnishings,<br>Fixtures & Appliances",
+    "Travel Services": "Travel Services",
+    "Information Technology Services": "Information Technology<br>Services",
+    "Software - Infrastructure": "Infrastructure",
+    "Medical Devices": "Medical Devices",
+    "Banks - Regional": "Banks - Regional",
+    "Oil & Gas Integrated": "Integrated",
+    "Insurance - Property & Casualty": "Property & Casualty",
+    "Internet Retail": "Internet Retail",
+    "Apparel Manufacturing": "Apparel Manufacturing",
+    "Copper": "Copper",
+    "Grocery Stores": "Grocery Stores",
+    "Electronic Gaming & Multimedia": "Electronic<br>Gaming & Multimedia",
+    "Engineering & Construction": "Engineering & Construction",
+    "Aluminum": "Aluminum",
+    "Credit Services": "Credit Services",
+    "Banks - Diversified": "Banks - Diversified",
+    "Apparel Retail": "Apparel Retail",
+    "Leisure": "Leisure",
+    "Telecom Services": "Telecom Services",
+    "Auto Parts": "Auto Parts",
+    "Capital Markets": "Capital Markets",
+    "Software - Application": "Application",
+    "Discount Stores": "Discount Stores",
+    "Entertainment": "Entertainment",
+    "Coking Coal": "Coking Coal",
+    "Medical Distribution": "Medical Distribution",
+    "Restaurants": "Restaurants",
+    "Agricultural Inputs": "Agricultural Inputs",
+    "Diagnostics & Research": "Diagnostics & Research",
+    "Waste Management": "Waste Management",
+    "Biotechnology": "Biotechnology",
+    "Oil & Gas Refining & Marketing": "Refining & Marketing",
+    "Railroads": "Railroads",
+    "Airlines": "Airlines",
+    "Residential Construction": "Residential<br>Construction",
+    "Publishing": "Publishing",
+    "Steel": "Steel",
+    "Thermal Coal": "Thermal Coal",
+    "Confectioners": "Confectioners",
+    "Packaged Foods": "Packaged Foods",
+    "Specialty Retail": "Specialty Retail",
+    "Chemicals": "Chemicals",
+    "Beverages - Wineries & Distilleries": "Wineries & Distilleries",
+    "Asset Management": "Asset Management",
+    "Infrastructure Operations": "Infrastructure<br>Operations",
+    "Conglomerates": "Conglomerates",
+    "Farm Products": "Farm Products",
+    "Security & Protection Services": "Security & Protection<br>Services",
+    "Solar": "Solar",
+    "Computer Hardware": "Computer Hardware",
+    "Broadcasting": "Broadcasting",
+    "Rental & Leasing Services": "Rental & Leasing<br>Services",
+    "Industrial Distribution": "Industrial<br>Distribution",
+    "Advertising Agencies": "Advertising<br>Agencies",
+    "Household & Personal Products": "Household & Personal<br>Products",
+    "Building Materials": "Building Materials",
+    "Food Distribution": "Food Distribution",
+    "Trucking": "Trucking",
+    "Beverages - Non-Alcoholic": "Non-Alcoholic",
+    "Footwear & Accessories": "Footwear & Accessories",
+    "Consulting Services": "Consulting Services",
+    "Communication Equipment": "Communication<br>Equipment",
+    "Internet Content & Information": "Internet<br>Content & Information",
+    "Lumber & Wood Production": "Lumber & Wood<br>Production",
+    "Insurance - Diversified": "Diversified",
+}
+
+
+def tweet_length(text: str) -> int:
+    """Get length of a tweet the way Twitter counts it.
+
+    Args:
+        text (str): text of the tweet
+
+    Returns:
+        int: weighted length
+
+    """
+    return sum(1 if ord(char) <= 0x10FF else 2 for char in text)
+
+
+def log_resources(label: str) -> None:
+    """Log wall time since start of the script and peak RSS of the process.
+
+    Args:
+        label (str): what was done
+
+    """
+    # ru_maxrss is in kilobytes on linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    info = f"{label}: {time.perf_counter() - STARTED:.3f}s, peak RSS {peak_rss:.1f} MB"
+    logging.info(info)
+
+
+def _union_tickers(components: dict[str, pd.DataFrame]) -> list[str]:
+    """Get Yahoo Finance symbols of components of all indices, each once."""
+    return list(dict.fromkeys(t for table in components.values() for t in table.yf_ticker))
+
+
 class TwitterBot:
     """Class that runs the twitter bot.
 
+    Authentication, data download and the plotting stack are set up lazily,
+    only when something is going to be posted.
+
     Attributes:
-        client (Client): tweepy client
-        api (API): tweepy api
-        wig_components (pd.DataFrame): components of WIG index
-        tickers (list): tickers of WIG components
-        prices (pd.DataFrame): prices of WIG components
-        wig (pd.Series): prices of WIG index
-        curr_prices (pd.Series): current prices of WIG components
-        ts (pd.DataFrame): time series of date data
+        now (datetime): time the bot was started, end of the session of the as-of day
+            of past heatmaps
+        data_loaded (bool): whether load_data was called
+        indices (dict[str, IndexConfig]): posted indices by name, the first one is the default
+        components (dict[str, pd.DataFrame]): components of every index
+        tickers (list): Yahoo Finance symbols of components of all indices
+        matrix (PriceMatrix): prices of components of all indices, filled
+        prices (pd.DataFrame): frame sharing values of matrix
+        index_prices (pd.DataFrame): prices of indices with columns of their names
+        curr_prices (pd.Series): current prices of components
+        calendar (TradingCalendar): index of trading dates in downloaded data
+        returns_engines (dict[str, ReturnsEngine]): returns of all periods of every index,
+            calculated on first use
+        rolling (RollingAnalytics | None): rolling analytics of tickers, moved to the as-of
+            date on first use
         tzinfo (pytz.timezone): timezone
         today (pd.Timestamp): today's date
+        provider (MarketDataProvider): source of market data
+        data_dir (Path): directory of local data
+        dry_run (bool): do not authenticate nor post anything
+        render_workers (int): processes rendering heatmaps
+        renderer_backend (str): 'plotly' (Kaleido) or 'native' (Pillow)
+        color_mode (str): column colouring heatmaps, one of COLOR_MODES
 
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        provider: MarketDataProvider | None = None,
+        data_dir: str | Path = "data",
+        *,
+        dry_run: bool = False,
+        render_workers: int = 1,
+        renderer_backend: str = "plotly",
+        indices: list[str] | None = None,
+        color_mode: str = "returns",
+    ) -> None:
         """Init method.
 
-        Autheticates with tweepy, downloads WIG components, prices and WIG index.
+        Does no I/O, tweepy auth happens when the posting worker makes a post
+        and data is downloaded by load_data.
+
+        Args:
+            provider (MarketDataProvider | None, optional): source of market data.
+                Defaults to YahooGPWProvider.
+            data_dir (str | Path, optional): directory of local data. Defaults to "data".
+            dry_run (bool, optional): do not authenticate nor post anything. Defaults to False.
+            render_workers (int, optional): processes rendering heatmaps. Defaults to 1.
+            renderer_backend (str, optional): 'plotly' (Kaleido) or 'native' (Pillow).
+                Defaults to "plotly".
+            indices (list[str] | None, optional): names of posted indices, see indices.INDICES.
+                Defaults to WIG only.
+            color_mode (str, optional): column colouring heatmaps, one of COLOR_MODES.
+                Defaults to "returns".
+
         """
+        self.indices = get_indices(indices or ["WIG"])
+        self.data_dir = Path(data_dir)
+        self._provider = provider
+        self.dry_run = dry_run
+        self.render_workers = render_workers
+        self.renderer_backend = renderer_backend
+        self.color_mode = color_mode
+
+        self.tzinfo = pytz.timezone("Europe/Warsaw")
+        self.now = datetime.now(tz=self.tzinfo)
+
+        self.data_loaded = False
+
+        # returns of all periods are calculated on first use
+        self.returns_engines: dict[str, ReturnsEngine] = {}
+        self.rolling: RollingAnalytics | None = None
+
+        logging.info("init complete")
+
+    @cached_property
+    def provider(self) -> MarketDataProvider:
+        """Source of market data, YahooGPWProvider unless other was given."""
+        if self._provider is not None:
+            return self._provider
+
+        from providers import YahooGPWProvider
+
+        return YahooGPWProvider(cache_dir=self.data_dir)
+
+    @cached_property
+    def _twitter(self) -> tuple[Client, API]:
         client, api = self.auth()
-        self.client: Client = client
-        self.api: API = api
         logging.info("auth complete")
+        return client, api
 
-        self.tzinfo = pytz.timezone("Europe/Warsaw")
-        self.today = pd.Timestamp(datetime.now(tz=self.tzinfo).today())
+    @cached_property
+    def renderer(self) -> HeatmapRenderer:
+        """Renderer of heatmaps, kept warm for the whole run."""
+        from render import HeatmapRenderer
 
-        wig_components = self._get_wig_components()
-        self.wig_components: pd.DataFrame = wig_components
-        self.tickers: list = wig_components.yf_ticker.to_list()
-        logging.info("downloaded wig components")
+        layouts = None
+        if self.renderer_backend == "native":
+            from layout_cache import LayoutCache
 
-        self.prices, self.wig = self._get_data()
-        self.curr_prices = self.prices.iloc[-1]
+            layouts = LayoutCache(self.data_dir / "layouts")
+
+        return HeatmapRenderer(
+            workers=self.render_workers,
+            backend=self.renderer_backend,
+            layouts=layouts,
+        )
+
+    @cached_property
+    def price_store(self) -> PriceStore:
+        """Local store of prices, kept in memory between refreshes."""
+        from price_store import PriceStore
+
+        return PriceStore(self.data_dir / "prices.pkl")
+
+    @cached_property
+    def encoder(self) -> ImageEncoder:
+        """Encoder of upload artifacts, assign an ImageEncoder to change its variants."""
+        from encoding import ImageEncoder
+
+        return ImageEncoder()
+
+    @property
+    def outbox_path(self) -> Path:
+        """Location of the outbox database."""
+        return self.data_dir / "outbox.sqlite3"
+
+    @cached_property
+    def outbox(self) -> Outbox:
+        """Durable outbox of rendered posts."""
+        from outbox import Outbox
+
+        return Outbox(self.outbox_path)
+
+    @cached_property
+    def posting_worker(self) -> PostingWorker:
+        """Worker draining the outbox, authenticates only when something is due."""
+        from outbox import PostingWorker
+
+        return PostingWorker(self.outbox, lambda: self._twitter)
+
+    @cached_property
+    def render_cache(self) -> RenderCache:
+        """Cache of rendered heatmaps, reused by re-runs and retries."""
+        from render_cache import RenderCache
+
+        return RenderCache(self.data_dir / "renders")
+
+    def load_data(self, start: datetime | None = None) -> None:
+        """Download components of all indices, prices of their union and index levels.
+
+        Args:
+            start (datetime | None, optional): first date of prices. Defaults to 400 days
+                before now.
+
+        """
+        import pandas as pd
+
+        self.today = pd.Timestamp(self.now.date())
+
+        components = self._get_components()
+        self.tickers: list = _union_tickers(components)
+        logging.info("downloaded index components")
+
+        prices, index_prices = self._get_data(start)
         logging.info("downloaded data")
 
-        ts = pd.DataFrame(self.prices.index)
-        ts["year"] = ts.Date.dt.year
-        ts["quarter"] = ts.Date.dt.quarter
-        ts["month"] = ts.Date.dt.month
-        ts["week"] = ts.Date.dt.isocalendar().week
-        ts["day"] = ts.Date.dt.day
-        ts["weekday"] = ts.Date.dt.weekday
-        self.ts: pd.DataFrame = ts
+        self.set_data(components, prices, index_prices)
 
-        logging.info("init complete")
+    def set_data(
+        self,
+        components: dict[str, pd.DataFrame],
+        prices: PriceMatrix | pd.DataFrame,
+        index_prices: pd.DataFrame,
+        today: pd.Timestamp | None = None,
+    ) -> None:
+        """Use given data instead of downloading it, e.g. in benchmarks.
+
+        Args:
+            components (dict[str, pd.DataFrame]): components of every index, cols('company',
+                'ISIN', 'yf_ticker', 'sector', 'industry', 'shares_num', 'ticker')
+            prices (PriceMatrix | pd.DataFrame): filled prices, a frame has index of dates
+                and columns of tickers
+            index_prices (pd.DataFrame): prices of indices with columns of their names
+            today (pd.Timestamp | None, optional): as-of date. Defaults to the current one.
+
+        """
+        from calendar_index import TradingCalendar
+        from price_matrix import PriceMatrix
+
+        if today is not None:
+            self.today = today
+
+        if not isinstance(prices, PriceMatrix):
+            prices = PriceMatrix.from_frame(prices)
+
+        self.components = components
+        self.tickers = _union_tickers(components)
+        self.matrix, self.index_prices = prices, index_prices
+        self.prices = prices.to_frame()
+        self.curr_prices = self.prices.iloc[-1]
+
+        self.calendar = TradingCalendar(self.prices.index)
+        self.returns_engines = {}
+        self.data_loaded = True
 
+    def refresh(self) -> None:
+        """Move the clock to now and update data incrementally.
+
+        Components come from the provider cache until it expires, prices are
+        downloaded only since the last stored bars and the renderer stays warm.
+        """
+        self.now = datetime.now(tz=self.tzinfo)
+        self.load_data()
+
+    def set_asof(self, day: date) -> None:
+        """Anchor periods, trading day checks and heatmap texts to a past day.
+
+        Loaded prices are kept, only returns are calculated again.
+
+        Args:
+            day (date): as-of date of heatmaps
+
+        """
+        import pandas as pd
+
+        self.now = self.tzinfo.localize(datetime.combine(day, SESSION_CLOSE))
+        self.today = pd.Timestamp(day)
+        self.returns_engines = {}
+
+    @traced("auth")
     def auth(self) -> tuple[Client, API]:
         """Auth method.
 
@@ -93,6 +463,9 @@ class TwitterBot:
             tuple[Client, API]: stuff needed make tweets
 
         """
+        import keys
+        from tweepy import API, Client, OAuth1UserHandler
+
         logging.info("authenicating...")
         bearer_token = keys.BEARER_TOKEN
         api_key = keys.API_KEY
@@ -111,126 +484,131 @@ class TwitterBot:
 
         return client, api
 
-    def make_tweet(self, text: str, pictures: list[str]) -> None:
-        """Make a tweet.
+    def queue_post(self, key: str, text: str, pictures: list[str]) -> None:
+        """Add a post to the outbox and start the posting worker if it is not running.
 
         Args:
+            key (str): idempotency key, a key is posted at most once
             text (str): text to put in the tweet
-            pictures (list[str]): list of paths to pictures to tweet
+            pictures (list[str]): list of paths to pictures to tweet, moved to the outbox
 
         """
-        if pictures:
-            lst = []
-            for picture in pictures:
-                media = self.api.media_upload(filename=picture)
-                lst.append(media.media_id_string)
-
-            self.client.create_tweet(text=text, media_ids=lst)
-
-            for picture in pictures:
-                Path(picture).unlink()
-
-        else:
-            self.client.create_tweet(text=text)
+        if self.dry_run:
+            info = f"dry run, not posting {pictures}\n{text}"
+            logging.info(info)
+            return
+
+        self.outbox.add(key, text, pictures)
+        # a no-op if the worker is running, e.g. in daemon and live modes
+        self.posting_worker.start()
+        self.posting_worker.notify()
+
+    @traced("get_data")
+    def _get_data(
+        self,
+        start_date: datetime | None = None,
+    ) -> tuple[PriceMatrix, pd.DataFrame]:
+        """Get data from the market data provider.
+
+        Reads prices from the local price store and downloads only the bars
+        missing since the last stored date of every ticker, in parallel.
+        Tickers that fail to download fall back to their stored prices.
+        Components shared by indices are downloaded once.
 
-    def _get_data(self) -> tuple[pd.DataFrame, pd.Series]:
-        """Get data from YahooFinance.
-
-        Get pd.DataFrame of prices of selected tickers and transform it.
+        Args:
+            start_date (datetime | None, optional): first date of prices.
+                Defaults to 400 days before now.
 
         Returns:
-            pd.DataFrame: prices with index of dates and columns of stock prices
+            tuple[PriceMatrix, pd.DataFrame]: filled prices of components and prices of
+                indices with index of dates
 
         """
-        tickers = yf.Tickers([*self.tickers, "WIG.WA"])
+        import numpy as np
+
+        from price_matrix import PriceMatrix
+
+        index_symbols = {index.symbol: name for name, index in self.indices.items()}
+        symbols = [*self.tickers, *index_symbols]
 
         # request more than one year
         # to ensure there will be at least one datapoint from the previous year
-        start_date = datetime.now(tz=self.tzinfo).today() - timedelta(days=400)
-
-        prices: pd.DataFrame = tickers.history(
-            start=start_date,
-            timeout=20,
-            progress=False,
-            threads=False,
-            auto_adjust=False,
-        ).Close
-        prices.columns = [tick.removesuffix(".WA") for tick in prices.columns]
-        prices = prices.ffill()
+        if start_date is None:
+            start_date = datetime.now(tz=self.tzinfo).today() - timedelta(days=400)
+
+        store = self.price_store
+        report = self.provider.get_history(store.missing_starts(symbols, start_date))
+        report.log()
+        count("downloaded_bars", int(report.prices.count().sum()))
+        # history adjusted for a split since it was stored is downloaded again in full,
+        # until then, e.g. if that fails, adjusted tickers keep their stored prices
+        adjusted = store.adjusted(report.prices, report.events)
+        readjusted = [symbol for group in adjusted.values() for symbol in group]
+        # failed tickers keep their stored prices, ffill carries the last known price
+        store.merge(
+            report.prices.drop(columns=readjusted),
+            [symbol for symbol in report.succeeded if symbol not in readjusted],
+            start_date,
+        )
+        if adjusted:
+            info = f"history of {readjusted} was adjusted since it was stored, downloading it"
+            logging.info(info)
+            refetched = self.provider.get_history(adjusted)
+            refetched.log()
+            count("downloaded_bars", int(refetched.prices.count().sum()))
+            store.replace(refetched.prices, refetched.succeeded, adjusted)
+        store.save()
+
+        prices = store.window(symbols, start_date)
+        available = [symbol for symbol in index_symbols if symbol in prices.columns]
+        if prices.empty or not available:
+            logging.error("no prices available, neither downloaded nor stored")
+            sys.exit(1)
+        for symbol in [symbol for symbol in index_symbols if symbol not in available]:
+            warn = f"no prices of {index_symbols[symbol]} index, not posting its heatmaps"
+            logging.warning(warn)
 
         # after using ffill to fill values when there was no price change
         # during the trading session
         # bfill fills values before the first occurance
         # this provide an anchor value to calculate longer period
-        prices = prices.bfill()
+        index_prices = prices[available].ffill().bfill().rename(columns=index_symbols)
 
-        wig = prices.WIG
-        prices = prices.drop(columns=["WIG"])
+        # components are filled in place, in one array without intermediate frames
+        stocks = prices.columns.difference(available, sort=False)
+        matrix = PriceMatrix(
+            prices.index.to_numpy(),
+            [stock.removesuffix(".WA") for stock in stocks],
+            np.ascontiguousarray(prices[stocks].to_numpy(dtype=np.float64)),
+        ).fill()
 
-        return prices, wig
+        return matrix, index_prices
 
-    @staticmethod
-    def get_symbol(
-        query: str,
-        preferred_exchange: str = "WSE",
-        max_tries: int = 5,
-        tries: int = 0,
-    ) -> str:
-        """Get ticker.
-
-        Searches Yahoo Finance for a ticker by other identifier.
+    @traced("get_components")
+    def _get_components(self) -> dict[str, pd.DataFrame]:
+        """Get components of all indices.
 
-        Args:
-            query (str): some identifier
-            preferred_exchange (str, optional): what exchange to prioritize. Defaults to "WSE".
-            max_tries (int, optional): how many times to try to get the ticker. Defaults to 5.
-            tries (int, optional): current try. Defaults to 0.
+        Sub-indices are subsets of WIG, so companies are resolved to tickers,
+        sectors and industries once, for the union of all components.
 
         Returns:
-            _type_: _description_
+            dict[str, pd.DataFrame]: components of every index
 
         """
-        try:
-            data = yq.search(query)
-        except ValueError as e:  # Will catch JSONDecodeError
-            if tries >= max_tries:
-                msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
-                raise ValueError(msg) from e
-            return TwitterBot.get_symbol(query, tries=tries + 1)
-        else:
-            quotes = data["quotes"]
-            if len(quotes) == 0:
-                if tries >= max_tries:
-                    msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
-                    raise ValueError(msg)
-                return TwitterBot.get_symbol(query, tries=tries + 1)
-
-            symbol = quotes[0]["symbol"]
-            for quote in quotes:
-                if quote["exchange"] == preferred_exchange:
-                    symbol: str = quote["symbol"]
-                    break
-            return symbol
-
-    def _get_wig_components(self, retry: int = 20) -> pd.DataFrame:
+        import pandas as pd
+
+        from enrichment import Enricher, SymbolCache
+
         # get data from source
-        tries = 0
-        while tries < retry:
+        tables = {}
+        for name, index in self.indices.items():
             try:
-                updated_components = pd.read_html(
-                    "https://gpwbenchmark.pl/ajaxindex.php?action=GPWIndexes&start=ajaxPortfolio&format=html&lang=EN&isin=PL9999999995&cmng_id=1011",
-                )[0]
-            except IncompleteRead:
-                tries += 1
-            else:  # if downloading data worked
-                break
-        else:  # downloading data failed every time
-            err = f"downloading wig components failed {retry} times"
-            logging.error(err)
-            sys.exit(1)
-
-        updated_components = updated_components.iloc[:, :3]
-        updated_components.columns = ["company", "ISIN", "shares_num"]
+                tables[name] = self.provider.get_index_components(index.isin)
+            except ConnectionError:
+                err = f"downloading {name} components failed"
+                logging.exception(err)
+                sys.exit(1)
+        updated_components = pd.concat(tables.values()).drop_duplicates("ISIN")
 
         saved_components = pd.read_csv("wig_comps.csv")
 
@@ -241,237 +619,104 @@ class TwitterBot:
             on=["company", "ISIN"],
         )
 
-        pretty_industry = {
-            "Financial Data & Stock Exchanges": "Financial Data<br>& Stock Exchanges",
-            "Utilities - Regulated Gas": "Regulated Gas",
-            "Utilities - Independent Power Producers": "Independent<br>Power Producers",
-            "Utilities - Renewable": "Renewable",
-            "Utilities - Regulated Electric": "Regulated Electric",
-            "Real Estate - Diversified": "Diversified",
-            "Real Estate Services": "Services",
-            "Real Estate - Development": "Development",
-            "Farm & Heavy Construction Machinery": "Farm & Heavy<br>Construction Machinery",
-            "Staffing & Employment Services": "Staffing & Employment<br>Services",
-            "Tools & Accessories": "Tools & Accessories",
-            "Building Products & Equipment": "Building Products & Equipment",
-            "Integrated Freight & Logistics": "Integrated Freight & Logistics",
-            "Specialty Industrial Machinery": "Specialty Industrial<br>Machinery",
-            "Electrical Equipment & Parts": "Electrical Equipment & Parts",
-            "Metal Fabrication": "Metal Fabrication",
-            "Aerospace & Defense": "Aerospace & Defense",
-            "Paper & Paper Products": "Paper & Paper Products",
-            "Specialty Chemicals": "Specialty Chemicals",
-            "Specialty Business Services": "Specialty Business<br>Services",
-            "Drug Manufacturers - Specialty & Generic": "Drug Manufacturers<br>Specialty & Generic",
-            "Medical Care Facilities": "Medical Care<br>Facilities",
-            "Medical Instruments & Supplies": "Medical Instruments<br>& Supplies",
-            "Pharmaceutical Retailers": "Pharmaceutical<br>Retailers",
-            "Electronic Components": "Electronic Components",
-            "Scientific & Technical Instruments": "Scientific & Technical<br>Instruments",
-            "Electronics & Computer Distribution": "Electronics & Computer<br>Distribution",
-            "Furnishings, Fixtures & Appliances": "Furnishings,<br>Fixtures & Appliances",
-            "Travel Services": "Travel Services",
-            "Information Technology Services": "Information Technology<br>Services",
-            "Software - Infrastructure": "Infrastructure",
-            "Medical Devices": "Medical Devices",
-            "Banks - Regional": "Banks - Regional",
-            "Oil & Gas Integrated": "Integrated",
-            "Insurance - Property & Casualty": "Property & Casualty",
-            "Internet Retail": "Internet Retail",
-            "Apparel Manufacturing": "Apparel Manufacturing",
-            "Copper": "Copper",
-            "Grocery Stores": "Grocery Stores",
-            "Electronic Gaming & Multimedia": "Electronic<br>Gaming & Multimedia",
-            "Engineering & Construction": "Engineering & Construction",
-            "Aluminum": "Aluminum",
-            "Credit Services": "Credit Services",
-            "Banks - Diversified": "Banks - Diversified",
-            "Apparel Retail": "Apparel Retail",
-            "Leisure": "Leisure",
-            "Telecom Services": "Telecom Services",
-            "Auto Parts": "Auto Parts",
-            "Capital Markets": "Capital Markets",
-            "Software - Application": "Application",
-            "Discount Stores": "Discount Stores",
-            "Entertainment": "Entertainment",
-            "Coking Coal": "Coking Coal",
-            "Medical Distribution": "Medical Distribution",
-            "Restaurants": "Restaurants",
-            "Agricultural Inputs": "Agricultural Inputs",
-            "Diagnostics & Research": "Diagnostics & Research",
-            "Waste Management": "Waste Management",
-            "Biotechnology": "Biotechnology",
-            "Oil & Gas Refining & Marketing": "Refining & Marketing",
-            "Railroads": "Railroads",
-            "Airlines": "Airlines",
-            "Residential Construction": "Residential<br>Construction",
-            "Publishing": "Publishing",
-            "Steel": "Steel",
-            "Thermal Coal": "Thermal Coal",
-            "Confectioners": "Confectioners",
-            "Packaged Foods": "Packaged Foods",
-            "Specialty Retail": "Specialty Retail",
-            "Chemicals": "Chemicals",
-            "Beverages - Wineries & Distilleries": "Wineries & Distilleries",
-            "Asset Management": "Asset Management",
-            "Infrastructure Operations": "Infrastructure<br>Operations",
-            "Conglomerates": "Conglomerates",
-            "Farm Products": "Farm Products",
-            "Security & Protection Services": "Security & Protection<br>Services",
-            "Solar": "Solar",
-            "Computer Hardware": "Computer Hardware",
-            "Broadcasting": "Broadcasting",
-            "Rental & Leasing Services": "Rental & Leasing<br>Services",
-            "Industrial Distribution": "Industrial<br>Distribution",
-            "Advertising Agencies": "Advertising<br>Agencies",
-            "Household & Personal Products": "Household & Personal<br>Products",
-            "Building Materials": "Building Materials",
-            "Food Distribution": "Food Distribution",
-            "Trucking": "Trucking",
-            "Beverages - Non-Alcoholic": "Non-Alcoholic",
-            "Footwear & Accessories": "Footwear & Accessories",
-            "Consulting Services": "Consulting Services",
-            "Communication Equipment": "Communication<br>Equipment",
-            "Internet Content & Information": "Internet<br>Content & Information",
-            "Lumber & Wood Production": "Lumber & Wood<br>Production",
-            "Insurance - Diversified": "Diversified",
-        }
         # check for empty data
         empty_data = full_components[full_components.isna().any(axis=1)]
-        if empty_data.empty:
-            full_components["ticker"] = full_components["yf_ticker"].str.removesuffix(".WA")
-            full_components.industry = full_components.industry.replace(pretty_industry)
-            return full_components
-        # get new ticker from Yahoo Finance
-        for indx, (
-            company,
-            isin,
-            yf_ticker,
-            sector,
-            industry,
-            _,
-        ) in empty_data.iterrows():
-            warn = f"Company {company} had missing data."
-            logging.warning(warn)
-
-            if pd.isna(yf_ticker):
-                ticker = self.get_symbol(isin)
-                # add missing ticker
-                full_components.loc[indx, "yf_ticker"] = ticker  # type: ignore
-            else:
-                ticker = yf_ticker
-
-            if pd.isna(sector) or pd.isna(industry):
-                # add missing sector and industry values
-                asset_profile = yq.Ticker(ticker).asset_profile[ticker]
-
-                # check for correct data returned
-                # new companies may have no sector/industry data
-                if not isinstance(asset_profile, dict):
-                    full_components.loc[indx, "sector"] = None  # type: ignore
-                    full_components.loc[indx, "industry"] = None  # type: ignore
-                else:
-                    full_components.loc[indx, "sector"] = asset_profile["sector"]  # type: ignore
-                    full_components.loc[indx, "industry"] = asset_profile["industry"]  # type: ignore
+        if not empty_data.empty:
+            for company in empty_data.company:
+                warn = f"Company {company} had missing data."
+                logging.warning(warn)
+
+            # get new tickers, sectors and industries from Yahoo Finance
+            enricher = Enricher(self.provider, SymbolCache(self.data_dir / "symbols.json"))
+            full_components = enricher.enrich(full_components)
+
+            # save new csv with all components, rows of components of indices not downloaded
+            # in this run, e.g. of mWIG40 in a WIG20 run, are kept
+            refreshed = full_components.drop(columns="shares_num")
+            kept = saved_components[~saved_components.ISIN.isin(refreshed.ISIN)]
+            pd.concat([refreshed, kept]).reindex(columns=saved_components.columns).to_csv(
+                "wig_comps.csv",
+                index=False,
+            )
 
-        # save new csv with full WIG
-        full_components.drop(columns="shares_num").to_csv("wig_comps.csv", index=False)
+            # companies without ticker cannot be priced
+            unresolved = full_components.yf_ticker.isna()
+            if unresolved.any():
+                skipped = full_components.company[unresolved].to_list()
+                warn = f"Companies without ticker skipped: {skipped}"
+                logging.warning(warn)
+                full_components = full_components[~unresolved].reset_index(drop=True)
 
-        full_components.industry = full_components.industry.replace(pretty_industry)
         full_components["ticker"] = full_components["yf_ticker"].str.removesuffix(".WA")
-        return full_components
 
-    def get_periods_indicies(self, period: str = "1D") -> Index:
+        # numbers of shares differ between indices, the rest is shared
+        symbols = full_components.drop(columns="shares_num")
+        return {
+            name: table[["ISIN", "shares_num"]]
+            .merge(symbols, on="ISIN")
+            .reindex(columns=full_components.columns)
+            for name, table in tables.items()
+        }
+
+    def get_periods_indicies(self, period: str = "1D", asof: object = None) -> Index:
         """Get a start date and last date of some period to calculate returns.
 
         possible periods: YTD, QTD, MTD, 1W, 1D, 1Y
 
         Args:
             period (str, optional): what period the changes will be calculated. Defaults to "1D".
+            asof (object, optional): last date of the period. Defaults to today.
 
         Raises:
-            NotImplementedError
+            NotImplementedError: period is not available, raised by TradingCalendar.period_rows
+            ValueError: there are no sessions before the as-of date
 
         Returns:
             Index: index to use with df.iloc
 
         """
-        if period == "YTD":
-            return (
-                self.ts.loc[self.ts[self.ts.year == self.today.year - 1].index.max() :]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "MTD":
-            return (
-                self.ts.iloc[
-                    self.ts[
-                        (self.ts.year == self.today.year) & (self.ts.month == self.today.month)
-                    ].index.min()
-                    - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "QTD":
-            return (
-                self.ts.iloc[
-                    self.ts[
-                        (self.ts.year == self.today.year) & (self.ts.quarter == self.today.quarter)
-                    ].index.min()
-                    - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "1W":  # remember to do this on weekends!
-            return (
-                self.ts.iloc[
-                    self.ts[
-                        (self.ts.year == self.today.year) & (self.ts.week == self.today.week)
-                    ].index.min()
-                    - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "1D":
-            return self.ts.iloc[[-2, -1]].index
-        if period == "1Y":
-            return self.ts.iloc[self.ts.index.max() - 252 :].iloc[[0, -1]].index
-        msg = f"period {period} not available"
-        raise NotImplementedError(msg)
+        from pandas import Index
+
+        asof = self.today if asof is None else asof
+        return Index(self.calendar.period_rows(period, asof))
 
-    def is_trading_day(self) -> bool:
-        """Check if today was a trading day by looking at dates in downloaded data.
+    def is_trading_day(self, day: object = None) -> bool:
+        """Check if a day was a trading day by looking at dates in downloaded data.
+
+        Args:
+            day (object, optional): day to check. Defaults to today, the as-of day.
 
         Returns:
             bool
 
         """
-        return pd.Timestamp(datetime.now(tz=self.tzinfo).date()) in self.ts.Date.to_list()
-
-    def _prepare_tweet_text(self, data: pd.DataFrame, wig_return: float, period: str) -> str:
+        day = self.today if day is None else day
+        return self.calendar.is_trading_date(day)
+
+    def _prepare_tweet_text(
+        self,
+        data: pd.DataFrame,
+        wig_return: float,
+        period: str,
+        index: str | None = None,
+    ) -> str:
         """Prepare text for the tweet.
 
         Method for calculating data that will be on the tweet.
 
         Args:
-            data (pd.DataFrame): data to calculate sectors returns
-            wig_return (float): value of WIG index return
+            data (pd.DataFrame): components with returns sorted descending
+            wig_return (float): value of the index return
             period (str): period to go to the tweet title
+            index (str | None, optional): name of the index. Defaults to the first one.
 
         Returns:
             str: text to directly put on the tweet
 
         """
-        data["contribution"] = data.mkt_cap * data.returns
-
-        sectors_return = (
-            data.groupby("sector")["contribution"].sum() / data.groupby("sector")["mkt_cap"].sum()
-        ).sort_values(ascending=False)
-
-        tweet_text = f"WIG Index {period} performance\n"  #: {wig_return:.2%}"
+        config = self._index_config(index)
+        sectors = self._returns_engine(config.name).groups("sector").ranking(period)
+        tweet_text = f"{config.name} Index {period} performance\n"  #: {wig_return:.2%}"
 
         # add this when yahoo finance provides wig index data
         # if wig_return > 0.02:
@@ -497,61 +742,169 @@ class TwitterBot:
         max_lines = 3
         for medal, (i, (sector, change)) in zip(
             ("🥇", "🥈", "🥉"),
-            enumerate(sectors_return.items(), start=1),
+            enumerate(zip(sectors.label, sectors.returns), start=1),
         ):
             if i <= max_lines:
                 tweet_text += f"{medal}\t{sector} -> {change:.2%}\n"
             else:
                 break
 
-        tweet_text += "\n#WIG #GPW #giełda #inwestycje #akcje"
+        hashtags = f"\n{config.hashtag} #GPW #giełda #inwestycje #akcje"
+        # new 52-week highs and lows are daily news, listed if they fit in the tweet
+        extremes = self._extremes_text(data) if period == "1D" else ""
+        if extremes and tweet_length(tweet_text + extremes + hashtags) <= TWEET_LIMIT:
+            tweet_text += extremes
+        tweet_text += hashtags
 
         return tweet_text
 
-    def _prepare_data_for_heatmap_and_tweet(self, period: str) -> tuple[pd.DataFrame, float]:
-        # calculate returns
-        indicies = self.get_periods_indicies(period)
-        data: pd.DataFrame = self.prices.iloc[indicies].pct_change().T.iloc[:, [-1]]
-        try:
-            data.columns = ["returns"]
-        except ValueError:
-            logging.exception(data)
-            logging.exception(self.prices)
-            sys.exit(1)
+    @staticmethod
+    def _extremes_text(data: pd.DataFrame, max_tickers: int = 3) -> str:
+        """Get lines of tickers closing at a new 52-week high or low.
 
-        # calculate wig returns
-        wig_return: float = self.wig.iloc[indicies].pct_change().values[0]
+        Args:
+            data (pd.DataFrame): components with returns sorted descending and rolling
+                analytics
+            max_tickers (int, optional): tickers listed in a line, the rest is counted.
+                Defaults to 3.
 
-        data = data.merge(
-            self.wig_components.set_index("ticker"),
-            right_index=True,
-            left_index=True,
-            validate="one_to_one",
-        )
-        # data.columns
-        # columns 'company', 'ISIN', 'yf_ticker', 'sector', 'industry', 'shares_num', 'returns'
-
-        data = data.drop(columns=["ISIN", "yf_ticker"])
-        data["curr_prices"] = self.curr_prices
-
-        data["mkt_cap"] = data["curr_prices"] * data["shares_num"]
-        data["WIG"] = "WIG"
-        data = (
-            data.reset_index()
-            .rename({"index": "ticker"}, axis=1)
-            .sort_values("returns", ascending=False)
+        Returns:
+            str: lines of the tweet, empty if there are no new highs nor lows
+
+        """
+        if "from_high" not in data.columns:
+            return ""
+
+        text = ""
+        highs = data.ticker[(data.from_high >= 0) & (data.returns > 0)].to_list()
+        lows = data.ticker[(data.from_low <= 0) & (data.returns < 0)].to_list()[::-1]
+        for sign, label, tickers in (("📈", "52W highs", highs), ("📉", "52W lows", lows)):
+            if tickers:
+                more = f" +{len(tickers) - max_tickers}" if len(tickers) > max_tickers else ""
+                text += f"{sign} {label}: {', '.join(tickers[:max_tickers])}{more}\n"
+        return text
+
+    def _index_config(self, index: str | None = None) -> IndexConfig:
+        """Get definition of a posted index.
+
+        Args:
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            IndexConfig: definition of the index
+
+        """
+        return self.indices[index] if index is not None else next(iter(self.indices.values()))
+
+    def _build_returns_engine(self, index: str | None = None) -> ReturnsEngine:
+        """Calculate returns of all available periods at once.
+
+        Returns of components are calculated for the union of all indices once,
+        every other index is a view over them.
+
+        Args:
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            ReturnsEngine: returns of the index and its components
+
+        """
+        from returns import ReturnsEngine
+
+        name = self._index_config(index).name
+        if self.returns_engines:
+            shared = next(iter(self.returns_engines.values()))
+            return shared.view(self.index_prices[name], self.components[name], name)
+
+        rows = {}
+        for period in PERIODS:
+            try:
+                start, end = self.get_periods_indicies(period)
+            except ValueError:  # no data to resolve the period
+                warn = f"period {period} could not be resolved"
+                logging.warning(warn)
+            else:
+                rows[period] = (int(start), int(end))
+
+        return ReturnsEngine(
+            self.matrix,
+            self.index_prices[name],
+            self.components[name],
+            rows,
+            index_name=name,
+            labels={"industry": PRETTY_INDUSTRY},
+            analytics=self._analytics(),
         )
 
-        # check for nans in dataframe
-        if data.isna().any().any():
+    @traced("analytics")
+    def _analytics(self) -> dict[str, np.ndarray]:
+        """Get rolling analytics of all priced tickers at the as-of date.
+
+        The saved state is moved only over bars since its date and saved again
+        when it reaches the last loaded bar.
+
+        Returns:
+            dict[str, np.ndarray]: column of analytics.ANALYTICS with a value of every
+                column of the price matrix
+
+        """
+        from analytics import RollingAnalytics
+
+        path = self.data_dir / "analytics.npz"
+        if self.rolling is None:
+            self.rolling = RollingAnalytics.load(path)
+
+        row = self.calendar.position(self.today)
+        bars = self.rolling.update(self.matrix, row)
+        count("analytics_bars", bars)
+        if bars and row == len(self.matrix) - 1:
+            self.rolling.save(path)
+
+        return self.rolling.columns(self.matrix.tickers)
+
+    def _returns_engine(self, index: str | None = None) -> ReturnsEngine:
+        """Get returns of an index, calculated on first use.
+
+        Args:
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            ReturnsEngine: returns of the index and its components
+
+        """
+        name = self._index_config(index).name
+        if name not in self.returns_engines:
+            self.returns_engines[name] = self._build_returns_engine(name)
+        return self.returns_engines[name]
+
+    @traced("prepare_data")
+    def _prepare_data_for_heatmap_and_tweet(
+        self,
+        period: str,
+        index: str | None = None,
+    ) -> tuple[pd.DataFrame, float]:
+        from analytics import ANALYTICS
+
+        data, wig_return = self._returns_engine(index).get(period)
+
+        # check for nans in dataframe, rolling analytics of short histories are missing
+        missing = data.drop(columns=list(ANALYTICS), errors="ignore").isna().any(axis=1)
+        if missing.any():
             logging.error("THERE ARE NULL VALUES IN DATAFRAME WITH PRICES")
-            logging.error(data[data.isna().any(axis=1)])
+            logging.error(data[missing])
 
         return data, wig_return
 
     ### performance heatmaps
 
-    def chart_heatmap(self, data: pd.DataFrame, path: str, period: str) -> None:
+    @traced("chart_heatmap")
+    def chart_heatmap(
+        self,
+        data: pd.DataFrame,
+        path: str,
+        period: str,
+        index: str | None = None,
+    ) -> None:
         """Save wig heatmap.
 
         Creates actual wig heatmap and saves it.
@@ -563,10 +916,27 @@ class TwitterBot:
             )
             path (str): filename with extension
             period (str): used only for title
+            index (str | None, optional): name of the index. Defaults to the first one.
 
         """
-        font = "Times New Roman"
+        self.renderer.render([(self.build_heatmap(data, period, index), path)])
+
+    def _heatmap_texts(
+        self,
+        period: str,
+        index: str | None = None,
+    ) -> tuple[str, str, tuple[str, str, str]]:
+        """Get texts of the heatmap.
 
+        Args:
+            period (str): period of the heatmap
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            tuple[str, str, tuple[str, str, str]]: title, subtitle and bottom left, center
+                and right annotations
+
+        """
         if period == "1W":
             additional_info = f" ⁕ {self.today.week}W{self.today.year}"
         elif period == "MTD":
@@ -575,23 +945,119 @@ class TwitterBot:
             additional_info = f" ⁕ {self.today.quarter}Q{self.today.year}"
         else:  # 1D, YTD, 1Y
             additional_info = ""
+        _, _, color_info = COLOR_MODES[self.color_mode]
+        if color_info:
+            additional_info += f" ⁕ {color_info}"
+
+        now = self.now
+        return (
+            self._index_config(index).title,
+            f"{period} performance{additional_info} ⁕ {now:%Y/%m/%d}",
+            (now.strftime(r"%Y/%m/%d %H:%M"), "@SliwinskiAlan", "source: YahooFinance!"),
+        )
 
-        # colour bounds for different periods
-        bounds = {
-            "1D": 0.03,
-            "1W": 0.1,
-            "MTD": 0.2,
-            "QTD": 0.3,
-            "YTD": 0.5,
-            "1Y": 0.5,
-        }
+    def _color_scale(self, period: str) -> tuple[str, tuple[float, float]]:
+        """Get the column colouring heatmaps and its values at the ends of the scale.
+
+        Args:
+            period (str): period of the heatmap
+
+        Returns:
+            tuple[str, tuple[float, float]]: column and its values at the red and green ends
+
+        """
+        column, color_range, _ = COLOR_MODES[self.color_mode]
+        return column, color_range or (-COLOR_BOUNDS[period], COLOR_BOUNDS[period])
+
+    def build_heatmap_spec(
+        self,
+        data: pd.DataFrame,
+        period: str,
+        index: str | None = None,
+    ) -> HeatmapSpec:
+        """Create wig heatmap for the native renderer.
+
+        Args:
+            data (pd.DataFrame): cols(
+                'ticker', 'company', 'sector', 'industry',
+                'shares_num', 'returns', 'curr_prices', 'mkt_cap'
+            )
+            period (str): used for title and colour bounds
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            HeatmapSpec: treemap ready to render
+
+        """
+        from treemap import HeatmapSpec
+
+        title, subtitle, footer = self._heatmap_texts(period, index)
+        column, color_range = self._color_scale(period)
+        return HeatmapSpec(
+            tickers=data.ticker.to_numpy(dtype=str),
+            sectors=data.sector.fillna("").to_numpy(dtype=str),
+            mkt_cap=data.mkt_cap.to_numpy(dtype=float),
+            returns=data.returns.to_numpy(dtype=float),
+            prices=data.curr_prices.to_numpy(dtype=float),
+            bound=COLOR_BOUNDS[period],
+            title=title,
+            subtitle=subtitle,
+            footer=footer,
+            root=self._index_config(index).name,
+            colors=data[column].to_numpy(dtype=float) if column != "returns" else None,
+            color_range=color_range if column != "returns" else None,
+        )
+
+    def build_heatmap(self, data: pd.DataFrame, period: str, index: str | None = None) -> object:
+        """Create wig heatmap for the selected renderer backend.
+
+        Args:
+            data (pd.DataFrame): data of the heatmap
+            period (str): period of the heatmap
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            object: plotly figure serialized to json or HeatmapSpec
+
+        """
+        if self.renderer_backend == "native":
+            return self.build_heatmap_spec(data, period, index)
+        return self.build_heatmap_figure(data, period, index).to_json()
+
+    def build_heatmap_figure(
+        self,
+        data: pd.DataFrame,
+        period: str,
+        index: str | None = None,
+    ) -> Figure:
+        """Create wig heatmap figure.
+
+        Args:
+            data (pd.DataFrame): cols(
+                'ticker', 'company', 'sector', 'industry',
+                'shares_num', 'returns', 'curr_prices', 'mkt_cap'
+            )
+            period (str): used only for title
+            index (str | None, optional): name of the index. Defaults to the first one.
+
+        Returns:
+            Figure: treemap ready to render
+
+        """
+        import plotly.express as px
+
+        font = "Times New Roman"
+        column, (low, high) = self._color_scale(period)
+        scale = ["#CC0000", "#292929", "#00CC00"]
+        texts = self._heatmap_texts(period, index)
+        title, subtitle, (footer_left, footer_center, footer_right) = texts
 
         fig = px.treemap(
             data,
-            path=["WIG", "sector", "ticker"],
+            path=[self._index_config(index).name, "sector", "ticker"],
             values="mkt_cap",
-            color="returns",
-            color_continuous_scale=["#CC0000", "#292929", "#00CC00"],
+            color=column,
+            color_continuous_scale=scale if low < high else scale[::-1],
             custom_data=data[["returns", "company", "ticker", "curr_prices", "sector"]],
         )
 
@@ -609,9 +1075,9 @@ class TwitterBot:
 
         fig.update_coloraxes(
             showscale=True,
-            cmin=-bounds[period],
-            cmax=bounds[period],
-            cmid=0,
+            cmin=min(low, high),
+            cmax=max(low, high),
+            cmid=(low + high) / 2,
             colorbar={
                 "title_text": "",
                 "thickness": 175,
@@ -623,8 +1089,11 @@ class TwitterBot:
                     "family": font,
                 },
                 "ticklabelposition": "inside",
-                "tickvals": [-bounds[period] * 0.95, bounds[period] * 0.95],
-                "ticktext": [f"{-bounds[period]:.0%}", f"{bounds[period]:.0%}"],
+                "tickvals": [
+                    min(low, high) + abs(high - low) * 0.025,
+                    max(low, high) - abs(high - low) * 0.025,
+                ],
+                "ticktext": [f"{min(low, high):.0%}", f"{max(low, high):.0%}"],
             },
         )
 
@@ -633,7 +1102,7 @@ class TwitterBot:
             width=7680,
             height=4320,
             title={
-                "text": f"INDEX WIG<br><sup>{period} performance{additional_info} ⁕ {datetime.now(self.tzinfo):%Y/%m/%d}</sup>",  # noqa: E501
+                "text": f"{title}<br><sup>{subtitle}</sup>",
                 "font": {"color": "white", "size": 170, "family": font},
                 "yanchor": "middle",
                 "xanchor": "center",
@@ -646,7 +1115,7 @@ class TwitterBot:
         )
 
         fig.add_annotation(
-            text=("source: YahooFinance!"),
+            text=footer_right,
             x=0.90,
             y=-0.023,
             font={"family": font, "size": 80, "color": "white"},
@@ -655,7 +1124,7 @@ class TwitterBot:
         )
 
         fig.add_annotation(
-            text=(datetime.now(self.tzinfo).strftime(r"%Y/%m/%d %H:%M")),
+            text=footer_left,
             x=0.1,
             y=-0.025,
             font={"family": font, "size": 80, "color": "white"},
@@ -664,7 +1133,7 @@ class TwitterBot:
         )
 
         fig.add_annotation(
-            text=("@SliwinskiAlan"),
+            text=footer_center,
             x=0.5,
             y=-0.025,
             font={"family": font, "size": 80, "color": "white"},
@@ -672,91 +1141,330 @@ class TwitterBot:
             align="left",
         )
 
-        fig.write_image(path)
+        return fig
 
-    def heatmap_and_tweet_text(self, period: str) -> tuple[str, str]:
-        """Calculate necessary data and prepares heatmap and text for the tweet.
+    def heatmaps_and_tweet_texts(self, heatmaps: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """Calculate necessary data and prepare heatmaps and texts for tweets of many periods.
+
+        All heatmaps, of all indices, are rendered as one batch, heatmaps rendered before
+        with the same data, period, styling and as-of date are taken from the render cache.
+
+        Args:
+            heatmaps (list[tuple[str, str]]): name of the index and period of every heatmap
 
         Returns:
-            tuple[str, str]: path to picture and tweet text
+            list[tuple[str, str]]: path to picture and tweet text of every heatmap
 
         """
-        data, wig_return = self._prepare_data_for_heatmap_and_tweet(period=period)
+        from render_cache import heatmap_key
+
+        jobs = []
+        to_cache = {}
+        posts = []
+        for index, period in heatmaps:
+            with span(f"heatmap {index} {period}"):
+                path = f"{index.lower()}_heatmap_{period}.png"
+                data, wig_return = self._prepare_data_for_heatmap_and_tweet(period, index)
+                key = heatmap_key(
+                    data,
+                    index=index,
+                    period=period,
+                    wig_return=wig_return,
+                    asof=self.today.date(),
+                    backend=self.renderer_backend,
+                    bound=COLOR_BOUNDS[period],
+                    color=self.color_mode,
+                    texts=self._heatmap_texts(period, index)[:2],
+                )
+
+                tweet_text = self.render_cache.get(key, path)
+                if tweet_text is None and key in to_cache:  # same heatmap twice in one batch
+                    path, tweet_text = to_cache[key]
+                elif tweet_text is None:
+                    jobs.append((self.build_heatmap(data, period, index), path))
+
+                    # text for the tweet
+                    tweet_text = self._prepare_tweet_text(data, wig_return, period, index)
+                    to_cache[key] = (path, tweet_text)
+                posts.append((path, tweet_text))
+
+        if jobs:
+            with span("render"):
+                self.renderer.render(jobs)
+        for key, (path, tweet_text) in to_cache.items():
+            self.render_cache.put(key, path, tweet_text)
+
+        return posts
+
+    def encode_for_upload(self, paths: list[str]) -> list[str]:
+        """Encode rendered heatmaps to images to upload.
 
-        path = f"wig_heatmap_{period}.png"
-        self.chart_heatmap(data, path, period)
+        Args:
+            paths (list[str]): paths of rendered heatmaps
 
-        # text for the tweet
-        tweet_text = self._prepare_tweet_text(data, wig_return, period=period)
+        Returns:
+            list[str]: paths of images to upload, rendered ones if no 'upload' variant is set
 
-        return (path, tweet_text)
+        """
+        report = self.encoder.encode(paths)
+        report.log()
+        return report.paths("upload") or paths
 
     def run(self) -> None:
         """Run twitter bot.
 
-        Make calculations, heatmaps and post them to twitter.
+        Plan posts due today, then make calculations, heatmaps and put them to the outbox.
+        Data is downloaded only if something is due. Posting worker starts with the first
+        queued post, or at once if posts left by earlier runs are pending, so their retries
+        are made meanwhile.
         """
         logging.info("running main function")
 
-        # post daily heatmap
-        if self.is_trading_day():
-            logging.info("posting daily heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("1D")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("today was not a trading day")
-
-        saturday_in_week = 5
-        # on saturday post 1w performance
-        if self.today.weekday() == saturday_in_week:
-            logging.info("posting weekly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("1W")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("not posting weekly heatmap")
-
-        # on last day of the month post 1m performance
-        if self.today.is_month_end:
-            logging.info("posting monthly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("MTD")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("not posting monthly heatmap")
-
-        # on last day of the quarter post 1q performance
-        if self.today.is_quarter_end:
-            logging.info("posting quarterly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("QTD")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("not posting quarterly heatmap")
-
-        # on last day of the year post 1y performance
-        if self.today.is_year_end:
-            logging.info("posting yearly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("YTD")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("not posting yearly heatmap")
-
-        # choose randomly a day to post ytd performance
-        # 24 out of 360, so on average every 15 days
-        rng = np.random.default_rng()
-        if rng.random() < 24 / 360:
-            logging.info("posting ytd heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("YTD")
-            self.make_tweet(tweet_string, [path])
-            logging.info("tweeted successfully")
-        else:
-            logging.info("not posting ytd heatmap")
+        try:
+            with span("run", profile=False):
+                plan = plan_posts(self.now.date())
+                if not self.dry_run and self._has_pending_posts():
+                    self.posting_worker.start()
+                if not plan:
+                    logging.info("nothing to post today")
+                    log_resources("nothing to post")
+                    return
+                self.post_due(plan)
+        finally:
+            # make due posts before exit, pending retries stay in the outbox for the next run
+            if "posting_worker" in self.__dict__:
+                self.posting_worker.stop(timeout=900)
+            TRACER.flush()
+
+    def _has_pending_posts(self) -> bool:
+        # the outbox is not created by runs with nothing to post
+        return self.outbox_path.exists() and self.outbox.counts()["pending"] > 0
+
+    def _post_key(self, index: str, period: str) -> str:
+        # keys of WIG posts were made before other indices were posted
+        if index == "WIG":
+            return f"{self.now:%Y-%m-%d}/{period}"
+        return f"{self.now:%Y-%m-%d}/{index}/{period}"
+
+    def post_due(self, plan: list[PlannedPost]) -> int:
+        """Make heatmaps of planned posts of every index and put them to the outbox.
+
+        Loads data if it is not loaded yet. Posts already in the outbox are skipped.
+
+        Args:
+            plan (list[PlannedPost]): posts due now
+
+        Returns:
+            int: number of queued posts
+
+        """
+        due = [(index, post) for index in self.indices for post in plan]
+        if not self.dry_run:
+            due = [
+                (index, post)
+                for index, post in due
+                if not self.outbox.has(self._post_key(index, post.period))
+            ]
+            if not due:
+                logging.info("all posts due today are already in the outbox")
+                return 0
+
+        info = f"posts due today: {[f'{index} {post.period}' for index, post in due]}"
+        logging.info(info)
+
+        if not self.data_loaded:
+            self.load_data()
+
+        # indices without prices are not posted
+        due = [(index, post) for index, post in due if index in self.index_prices.columns]
+
+        # yahoo may not have the session yet or the calendar may miss a closure
+        if any(post.period == "1D" for _, post in due) and not self.is_trading_day():
+            logging.warning("no session today in downloaded data, not posting daily heatmap")
+            due = [(index, post) for index, post in due if post.period != "1D"]
+
+        # render heatmaps of all due indices and periods as one batch
+        heatmaps = self.heatmaps_and_tweet_texts([(index, post.period) for index, post in due])
+        with span("encode"):
+            uploads = self.encode_for_upload([path for path, _ in heatmaps])
+
+        for (index, post), (path, tweet_string), upload in zip(due, heatmaps, uploads, strict=True):
+            info = f"queueing {post.reason} {index} heatmap"
+            logging.info(info)
+            self.queue_post(self._post_key(index, post.period), tweet_string, [upload])
+            if not self.dry_run:
+                Path(path).unlink(missing_ok=True)
+
+        log_resources("run complete")
+        return len(due)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments.
+
+    Args:
+        argv (list[str] | None, optional): arguments. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: parsed arguments
+
+    """
+    parser = argparse.ArgumentParser(description="Post heatmaps of GPW indices to twitter.")
+    parser.add_argument("--dry-run", action="store_true", help="do not authenticate nor post")
+    parser.add_argument("--backend", default="plotly", help="renderer, 'plotly' or 'native'")
+    parser.add_argument(
+        "--color",
+        choices=list(COLOR_MODES),
+        default="returns",
+        help="colour of heatmap tiles, returns of the period, 52-week volatility "
+        "or distance from the 52-week high",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        help="rendering processes, defaults to 1 and to all cores in backfill and timelapse",
+    )
+    parser.add_argument(
+        "--index",
+        action="append",
+        default=[],
+        help="name of a posted index, e.g. WIG20, repeatable, defaults to WIG",
+    )
+    parser.add_argument("--daemon", action="store_true", help="keep running and post at slots")
+    parser.add_argument(
+        "--slot",
+        action="append",
+        default=[],
+        help="Warsaw time of a reason in daemon mode, e.g. daily=17:45, repeatable",
+    )
+    parser.add_argument("--port", type=int, default=8765, help="port of the health endpoint")
+    parser.add_argument(
+        "--report",
+        default="data/run_report.jsonl",
+        help="JSON-lines report of stage timings",
+    )
+    parser.add_argument("--prometheus", help="Prometheus textfile of stage timings")
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        type=date.fromisoformat,
+        metavar=("START", "END"),
+        help="render heatmaps of sessions between two dates to --output, posts nothing",
+    )
+    parser.add_argument(
+        "--periods",
+        nargs="+",
+        default=["1D"],
+        choices=PERIODS,
+        help="periods of backfilled heatmaps",
+    )
+    parser.add_argument(
+        "--timelapse",
+        nargs=2,
+        type=date.fromisoformat,
+        metavar=("START", "END"),
+        help="encode heatmaps of sessions between two dates as a video in --output",
+    )
+    parser.add_argument(
+        "--format",
+        default="mp4",
+        choices=["mp4", "gif", "webp"],
+        help="format of timelapses, needs ffmpeg",
+    )
+    parser.add_argument("--fps", type=float, default=4.0, help="frames per second of timelapses")
+    parser.add_argument(
+        "--output",
+        default="archive",
+        help="directory of backfilled heatmaps, timelapses and live heatmaps",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="update heatmaps from intraday quotes and post snapshots until the close",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="in live mode, use a random walk of quotes instead of the provider, at any time",
+    )
+    parser.add_argument("--poll", type=float, default=15.0, help="seconds between quote polls")
+    parser.add_argument(
+        "--render-every",
+        type=float,
+        default=60.0,
+        help="shortest time between renders of a live heatmap in seconds",
+    )
+    parser.add_argument(
+        "--min-change",
+        type=float,
+        default=0.02,
+        help="share of market cap that has to change colour to render a live heatmap again",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="append",
+        type=clock.fromisoformat,
+        default=[],
+        help="Warsaw time of a posted live snapshot, e.g. 13:00, repeatable, "
+        "defaults to 09:15, 13:00 and 16:45",
+    )
+    parser.add_argument("--profile", metavar="DIR", help="dump cProfile of every stage to DIR")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
     logging.info("starting...")
-    bot = TwitterBot()
-    bot.run()
+    args = parse_args()
+    TRACER.configure(report=args.report, prometheus=args.prometheus, profile_dir=args.profile)
+    offline = args.backfill is not None or args.timelapse is not None
+    bot = TwitterBot(
+        dry_run=args.dry_run or offline,
+        render_workers=args.render_workers or (os.cpu_count() if offline else 1),
+        renderer_backend=args.backend,
+        indices=args.index or None,
+        color_mode=args.color,
+    )
+    if args.backfill:
+        from backfill import backfill
+
+        backfill(bot, *args.backfill, periods=args.periods, output=args.output)
+    elif args.timelapse:
+        from timelapse import load_history, timelapse, timelapse_renderer
+
+        # prices and components are loaded once and frames of all indices share one pool
+        load_history(bot, args.timelapse[0])
+        renderer = timelapse_renderer(bot)
+        try:
+            for index in bot.indices:
+                timelapse(
+                    bot,
+                    *args.timelapse,
+                    args.output,
+                    index,
+                    fmt=args.format,
+                    fps=args.fps,
+                    renderer=renderer,
+                )
+        finally:
+            renderer.close()
+    elif args.live:
+        from live import DEFAULT_SNAPSHOTS, LiveSession, SimulatedFeed
+
+        session = LiveSession(
+            bot,
+            output=args.output,
+            render_interval=args.render_every,
+            min_change=args.min_change,
+            snapshots=tuple(args.snapshot) or DEFAULT_SNAPSHOTS,
+        )
+        if args.simulate:
+            session.feed = SimulatedFeed(session.closes())
+            session.run(args.poll, start=clock.min, until=clock.max)
+        else:
+            session.run(args.poll)
+    elif args.daemon:
+        from daemon import BotDaemon, parse_slot
+
+        BotDaemon(bot, slots=dict(map(parse_slot, args.slot)), port=args.port).run_forever()
+    else:
+        bot.run()
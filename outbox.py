@@ -0,0 +1,533 @@
+"""Durable outbox of posts.
+
+Rendered posts are recorded in a local SQLite database with their media
+moved to a spool directory, so posting is decoupled from computing and
+rendering. PostingWorker drains the outbox in a background thread, uploads
+media concurrently, paces requests with a token bucket and retries failed
+posts later, a failure costs a retry instead of a re-run.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from instrumentation import count, span
+
+if TYPE_CHECKING:
+    from tweepy import API, Client
+    from tweepy.errors import Forbidden, TooManyRequests
+
+# twitter accepts uploaded media in tweets for 24 hours
+MEDIA_ID_TTL = 12 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    text TEXT NOT NULL,
+    media TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    media_ids TEXT NOT NULL DEFAULT '{}',
+    tweet_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class Post:
+    """Post waiting in the outbox.
+
+    Attributes:
+        id (int): id of the post in the outbox
+        key (str): idempotency key, a key is posted at most once
+        text (str): text of the tweet
+        media (list[str]): paths of spooled media
+        attempts (int): number of failed attempts
+        media_ids (dict[str, list]): path -> (media id, upload time) of uploaded media
+
+    """
+
+    id: int
+    key: str
+    text: str
+    media: list[str]
+    attempts: int
+    media_ids: dict[str, list]
+
+
+class Outbox:
+    """SQLite outbox with a spool directory of media.
+
+    Attributes:
+        path (Path): location of the database
+        spool (Path): directory of media of pending posts
+
+    """
+
+    def __init__(self, path: str | Path = "data/outbox.sqlite3") -> None:
+        """Init method.
+
+        Args:
+            path (str | Path, optional): location of the database.
+                Defaults to "data/outbox.sqlite3".
+
+        """
+        self.path = Path(path)
+        self.spool = self.path.with_suffix(".spool")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one connection per operation, so the outbox can be used from many threads
+        with closing(sqlite3.connect(self.path, timeout=30)) as db, db:
+            yield db
+
+    def has(self, key: str) -> bool:
+        """Check if a post is in the outbox, whatever its status.
+
+        Args:
+            key (str): idempotency key
+
+        Returns:
+            bool: whether the key is in the outbox
+
+        """
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM posts WHERE key = ?", (key,)).fetchone() is not None
+
+    def counts(self) -> dict[str, int]:
+        """Count posts by status.
+
+        Returns:
+            dict[str, int]: number of 'pending', 'posted' and 'failed' posts
+
+        """
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM posts GROUP BY status").fetchall()
+        return {"pending": 0, "posted": 0, "failed": 0, **dict(rows)}
+
+    def add(self, key: str, text: str, media: list[str]) -> bool:
+        """Record a post and move its media to the spool.
+
+        Args:
+            key (str): idempotency key, e.g. period and date of the heatmap
+            text (str): text of the tweet
+            media (list[str]): paths of media to attach
+
+        Returns:
+            bool: whether the post was added, False if the key is already in the outbox
+
+        """
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM posts WHERE key = ?", (key,)).fetchone():
+                info = f"post {key} already in the outbox"
+                logging.info(info)
+                return False
+
+            now = time.time()
+            post_id = db.execute(
+                "INSERT INTO posts (key, text, media, next_attempt_at, created_at) "
+                "VALUES (?, ?, '[]', ?, ?)",
+                (key, text, now, now),
+            ).lastrowid
+
+            directory = self.spool / str(post_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            spooled = []
+            for path in media:
+                target = directory / Path(path).name
+                shutil.move(path, target)
+                spooled.append(str(target))
+            db.execute("UPDATE posts SET media = ? WHERE id = ?", (json.dumps(spooled), post_id))
+
+        info = f"post {key} added to the outbox"
+        logging.info(info)
+        return True
+
+    def due(self, now: float | None = None) -> list[Post]:
+        """Get pending posts due for an attempt.
+
+        Args:
+            now (float | None, optional): unix time. Defaults to now.
+
+        Returns:
+            list[Post]: posts in order they were added
+
+        """
+        now = time.time() if now is None else now
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, key, text, media, attempts, media_ids FROM posts "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id",
+                (now,),
+            ).fetchall()
+        return [
+            Post(post_id, key, text, json.loads(media), attempts, json.loads(media_ids))
+            for post_id, key, text, media, attempts, media_ids in rows
+        ]
+
+    def next_attempt(self) -> float | None:
+        """Get the earliest time of an attempt of a pending post.
+
+        Returns:
+            float | None: unix time, None if nothing is pending
+
+        """
+        with self._connect() as db:
+            (next_attempt_at,) = db.execute(
+                "SELECT MIN(next_attempt_at) FROM posts WHERE status = 'pending'",
+            ).fetchone()
+        return next_attempt_at
+
+    def record_media(self, post_id: int, media_ids: dict[str, list]) -> None:
+        """Remember uploaded media, so retries do not upload them again.
+
+        Args:
+            post_id (int): id of the post
+            media_ids (dict[str, list]): path -> (media id, upload time)
+
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE posts SET media_ids = ? WHERE id = ?",
+                (json.dumps(media_ids), post_id),
+            )
+
+    def mark_posted(self, post_id: int, tweet_id: str | None) -> None:
+        """Mark a post as posted and remove its spooled media.
+
+        Args:
+            post_id (int): id of the post
+            tweet_id (str | None): id of the tweet, None if unknown
+
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE posts SET status = 'posted', tweet_id = ? WHERE id = ?",
+                (tweet_id, post_id),
+            )
+        shutil.rmtree(self.spool / str(post_id), ignore_errors=True)
+
+    def mark_retry(self, post_id: int, error: str, delay: float) -> None:
+        """Schedule another attempt of a post.
+
+        Args:
+            post_id (int): id of the post
+            error (str): reason of the failure
+            delay (float): seconds to the next attempt
+
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE posts SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? "
+                "WHERE id = ?",
+                (error, time.time() + delay, post_id),
+            )
+
+    def mark_failed(self, post_id: int, error: str) -> None:
+        """Give up a post, its media stay in the spool.
+
+        Args:
+            post_id (int): id of the post
+            error (str): reason of the failure
+
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE posts SET status = 'failed', attempts = attempts + 1, last_error = ? "
+                "WHERE id = ?",
+                (error, post_id),
+            )
+
+
+class TokenBucket:
+    """Thread-safe token bucket pacing requests.
+
+    Attributes:
+        rate (float): tokens added per second
+        capacity (float): largest number of tokens
+
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Init method.
+
+        Args:
+            rate (float): tokens added per second
+            capacity (float): largest number of tokens
+
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Take a token, wait until one is available."""
+        while True:
+            with self._lock:
+                self._refill()
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause_until(self, reset: float) -> None:
+        """Hold all requests until given time, e.g. x-rate-limit-reset.
+
+        Args:
+            reset (float): unix time when requests are allowed again
+
+        """
+        with self._lock:
+            resume = time.monotonic() + reset - time.time()
+            self._paused_until = max(self._paused_until, resume)
+
+
+def _retry_after(error: TooManyRequests) -> float:
+    """Seconds to x-rate-limit-reset of a 429 response, a minute if it is missing."""
+    reset = error.response.headers.get("x-rate-limit-reset")
+    if reset is None:
+        return 60.0
+    return max(float(reset) - time.time(), 1.0)
+
+
+def _is_duplicate(error: Forbidden) -> bool:
+    return any("duplicate" in message.lower() for message in error.api_messages)
+
+
+class PostingWorker:
+    """Drains the outbox: uploads media, creates tweets and schedules retries.
+
+    Tweepy keeps a requests session per API and Client, so connections are pooled.
+
+    Attributes:
+        outbox (Outbox): posts to make
+        bucket (TokenBucket): pacing of requests
+        workers (int): number of concurrent media uploads
+        max_attempts (int): attempts before a post is given up
+        backoff (float): base of the exponential retry delay in seconds
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        outbox: Outbox,
+        twitter: Callable[[], tuple[Client, API]],
+        bucket: TokenBucket | None = None,
+        workers: int = 4,
+        max_attempts: int = 8,
+        backoff: float = 30.0,
+    ) -> None:
+        """Init method.
+
+        Args:
+            outbox (Outbox): posts to make
+            twitter (Callable[[], tuple[Client, API]]): returns authenticated client and api,
+                called on first post
+            bucket (TokenBucket | None, optional): pacing of requests.
+                Defaults to one request per 10 seconds with bursts of 10.
+            workers (int, optional): number of concurrent media uploads. Defaults to 4.
+            max_attempts (int, optional): attempts before a post is given up. Defaults to 8.
+            backoff (float, optional): base of the exponential retry delay in seconds.
+                Defaults to 30.0.
+
+        """
+        self.outbox = outbox
+        self._twitter = twitter
+        self.bucket = bucket or TokenBucket(rate=0.1, capacity=10)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._thread: threading.Thread | None = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def _upload(self, api: API, path: str) -> list:
+        self.bucket.acquire()
+        media = api.media_upload(filename=path)
+        return [media.media_id_string, time.time()]
+
+    def _upload_media(self, api: API, posts: list[Post]) -> dict[int, dict]:
+        """Upload media of all posts concurrently, skipping media uploaded by earlier attempts."""
+        now = time.time()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for post in posts:
+                for path in post.media:
+                    uploaded = post.media_ids.get(path)
+                    if uploaded is None or now - uploaded[1] > MEDIA_ID_TTL:
+                        futures[post.id, path] = executor.submit(self._upload, api, path)
+
+        uploads: dict[int, dict] = {}
+        for (post_id, path), future in futures.items():
+            try:
+                uploads.setdefault(post_id, {})[path] = future.result()
+                count("uploaded_bytes", Path(path).stat().st_size)
+            except Exception as e:  # noqa: BLE001
+                uploads.setdefault(post_id, {})[path] = e
+        return uploads
+
+    def _fail(self, post: Post, error: Exception) -> None:
+        from tweepy.errors import HTTPException, TooManyRequests, TwitterServerError
+
+        msg = f"{type(error).__name__}: {error}"
+        if isinstance(error, TooManyRequests):
+            delay = _retry_after(error)
+            self.bucket.pause_until(time.time() + delay)
+        elif isinstance(error, HTTPException) and not isinstance(error, TwitterServerError):
+            self.outbox.mark_failed(post.id, msg)
+            err = f"post {post.key} rejected, giving up: {msg}"
+            logging.error(err)
+            return
+        else:  # 5xx and connection errors
+            delay = random.uniform(0, self.backoff * 2**post.attempts)  # noqa: S311
+
+        if post.attempts + 1 >= self.max_attempts:
+            self.outbox.mark_failed(post.id, msg)
+            err = f"post {post.key} failed {self.max_attempts} times, giving up: {msg}"
+            logging.error(err)
+            return
+
+        self.outbox.mark_retry(post.id, msg, delay)
+        warn = f"post {post.key} failed, retrying in {delay:.0f}s: {msg}"
+        logging.warning(warn)
+
+    def drain(self) -> int:
+        """Make all due posts.
+
+        Returns:
+            int: number of posts made
+
+        """
+        posts = self.outbox.due()
+        if not posts:
+            return 0
+
+        with span("drain_outbox") as stage:
+            posted = self._post(posts)
+            stage.count("posts", posted)
+        return posted
+
+    def _post(self, posts: list[Post]) -> int:
+        from tweepy.errors import Forbidden
+
+        client, api = self._twitter()
+        uploads = self._upload_media(api, posts)
+
+        posted = 0
+        for post in posts:
+            media_ids = {**post.media_ids}
+            errors = []
+            for path, uploaded in uploads.get(post.id, {}).items():
+                if isinstance(uploaded, Exception):
+                    errors.append(uploaded)
+                else:
+                    media_ids[path] = uploaded
+            self.outbox.record_media(post.id, media_ids)
+            if errors:
+                self._fail(post, errors[0])
+                continue
+
+            try:
+                self.bucket.acquire()
+                response = client.create_tweet(
+                    text=post.text,
+                    media_ids=[media_ids[path][0] for path in post.media] or None,
+                )
+            except Forbidden as e:
+                if not _is_duplicate(e):
+                    self._fail(post, e)
+                    continue
+                # tweet was created by an attempt which crashed before marking it posted
+                self.outbox.mark_posted(post.id, None)
+            except Exception as e:  # noqa: BLE001
+                self._fail(post, e)
+                continue
+            else:
+                self.outbox.mark_posted(post.id, response.data["id"])
+
+            posted += 1
+            info = f"posted {post.key}"
+            logging.info(info)
+
+        return posted
+
+    def _loop(self, poll: float) -> None:
+        while True:
+            try:
+                self.drain()
+            except Exception:
+                logging.exception("draining outbox failed")
+
+            # posts added while draining are made before stopping
+            if self._stopping.is_set() and not self.outbox.due():
+                return
+
+            next_attempt = self.outbox.next_attempt()
+            wait = poll if next_attempt is None else min(poll, max(next_attempt - time.time(), 0))
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def start(self, poll: float = 60.0) -> None:
+        """Start draining the outbox in a background thread.
+
+        Args:
+            poll (float, optional): largest pause between drains in seconds. Defaults to 60.0.
+
+        """
+        if self._thread is not None:
+            return
+
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, args=(poll,), daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Wake up the worker, e.g. after adding a post."""
+        self._wakeup.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Make due posts and stop the background thread.
+
+        Args:
+            timeout (float | None, optional): how long to wait for the thread. Defaults to None.
+
+        """
+        if self._thread is None:
+            return
+
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
@@ -0,0 +1,150 @@
+"""Posting schedule.
+
+Decides which heatmaps are due on a given day using a built-in calendar of
+Warsaw Stock Exchange sessions, so no data has to be downloaded to know that
+there is nothing to post. Uses only the standard library to keep startup fast.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+SATURDAY = 5
+
+# chance of posting YTD heatmap on a random day
+# 24 out of 360, so on average every 15 days
+RANDOM_YTD_PROBABILITY = 24 / 360
+
+# one-off closures announced by the exchange, sessions are never shortened
+EXTRA_CLOSED_DAYS: frozenset[date] = frozenset(
+    {
+        date(2018, 11, 12),  # 100th anniversary of independence
+    },
+)
+
+
+def easter_sunday(year: int) -> date:
+    """Get date of Easter Sunday.
+
+    Anonymous Gregorian algorithm.
+
+    Args:
+        year (int): year
+
+    Returns:
+        date: Easter Sunday
+
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def gpw_holidays(year: int) -> set[date]:
+    """Get weekdays when Warsaw Stock Exchange has no session.
+
+    Args:
+        year (int): year
+
+    Returns:
+        set[date]: days without a session
+
+    """
+    easter = easter_sunday(year)
+    holidays = {
+        date(year, 1, 1),  # New Year
+        date(year, 1, 6),  # Epiphany
+        easter - timedelta(days=2),  # Good Friday
+        easter + timedelta(days=1),  # Easter Monday
+        date(year, 5, 1),  # Labour Day
+        date(year, 5, 3),  # Constitution Day
+        easter + timedelta(days=60),  # Corpus Christi
+        date(year, 8, 15),  # Assumption
+        date(year, 11, 1),  # All Saints
+        date(year, 11, 11),  # Independence Day
+        date(year, 12, 24),  # Christmas Eve
+        date(year, 12, 25),  # Christmas
+        date(year, 12, 26),  # Boxing Day
+        date(year, 12, 31),  # New Year's Eve
+    }
+    holidays |= {day for day in EXTRA_CLOSED_DAYS if day.year == year}
+    return holidays
+
+
+def is_trading_day(day: date) -> bool:
+    """Check if there is a session on Warsaw Stock Exchange.
+
+    Args:
+        day (date): day to check
+
+    Returns:
+        bool
+
+    """
+    return day.weekday() < SATURDAY and day not in gpw_holidays(day.year)
+
+
+@dataclass(frozen=True)
+class PlannedPost:
+    """Heatmap due to be posted.
+
+    Attributes:
+        period (str): period of the heatmap
+        reason (str): why it is posted, e.g. 'daily', 'monthly', 'random ytd'
+
+    """
+
+    period: str
+    reason: str
+
+
+def plan_posts(
+    today: date,
+    rng: random.Random | None = None,
+    ytd_probability: float = RANDOM_YTD_PROBABILITY,
+) -> list[PlannedPost]:
+    """Get heatmaps due to be posted.
+
+    Every period is posted at most once, e.g. on the last day of the year
+    YTD heatmap is not posted again by the random draw.
+
+    Args:
+        today (date): day of posting
+        rng (random.Random | None, optional): source of the random YTD draw. Defaults to None.
+        ytd_probability (float, optional): chance of a random YTD post.
+            Defaults to RANDOM_YTD_PROBABILITY.
+
+    Returns:
+        list[PlannedPost]: posts in order of posting
+
+    """
+    rng = rng if rng is not None else random.Random()  # noqa: S311
+    tomorrow = today + timedelta(days=1)
+
+    candidates = [
+        ("1D", "daily", is_trading_day(today)),
+        # on saturday post 1w performance
+        ("1W", "weekly", today.weekday() == SATURDAY),
+        # on last day of the month post 1m performance
+        ("MTD", "monthly", tomorrow.month != today.month),
+        # on last day of the quarter post 1q performance
+        ("QTD", "quarterly", tomorrow.month != today.month and today.month % 3 == 0),
+        # on last day of the year post 1y performance
+        ("YTD", "yearly", tomorrow.year != today.year),
+        ("YTD", "random ytd", rng.random() < ytd_probability),
+    ]
+
+    posts: dict[str, PlannedPost] = {}
+    for period, reason, due in candidates:
+        if due and period not in posts:
+            posts[period] = PlannedPost(period, reason)
+
+    return list(posts.values())
@@ -0,0 +1,183 @@
+"""Price matrix.
+
+Prices of all tickers as one dense 2-D array of dates x tickers with a date
+vector and a ticker vector, the core data of returns calculations. Columns
+are addressed by integer codes, labels such as sectors are integer-coded too,
+so returns, market caps and ordering are NumPy gathers without copies of
+frames. The matrix can be saved to a directory of .npy files and mapped back
+into memory, so long histories are paged in only where they are read.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def encode(labels: pd.Series | np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Encode labels as integer codes.
+
+    Args:
+        labels (pd.Series | np.ndarray): labels, missing ones are NaN or None
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: code of every label, -1 if missing, and
+            categories in order of first appearance
+
+    """
+    codes, categories = pd.factorize(labels)
+    return codes.astype(np.int32), np.asarray(categories, dtype=object)
+
+
+def decode(codes: np.ndarray, categories: np.ndarray) -> np.ndarray:
+    """Get labels of integer codes.
+
+    Args:
+        codes (np.ndarray): codes returned by encode
+        categories (np.ndarray): categories returned by encode
+
+    Returns:
+        np.ndarray: labels, NaN where the code is -1
+
+    """
+    # code -1 picks the appended NaN
+    return np.append(categories, np.nan)[codes]
+
+
+class PriceMatrix:
+    """Prices with rows of dates and columns of tickers.
+
+    Attributes:
+        dates (np.ndarray): dates of rows, datetime64[ns]
+        tickers (np.ndarray): tickers of columns
+        values (np.ndarray): prices, float64 or float32, C-ordered so rows are contiguous
+
+    """
+
+    def __init__(self, dates: np.ndarray, tickers: np.ndarray, values: np.ndarray) -> None:
+        """Init method.
+
+        Args:
+            dates (np.ndarray): dates of rows
+            tickers (np.ndarray): tickers of columns
+            values (np.ndarray): prices with shape (dates, tickers)
+
+        Raises:
+            ValueError: shape of values does not match dates and tickers
+
+        """
+        if values.shape != (len(dates), len(tickers)):
+            msg = f"values of shape {values.shape} do not match {len(dates)}x{len(tickers)}"
+            raise ValueError(msg)
+
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.values = values
+        self._codes = {ticker: code for code, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frame(cls, prices: pd.DataFrame, dtype: type = np.float64) -> PriceMatrix:
+        """Make a matrix of a frame.
+
+        Args:
+            prices (pd.DataFrame): prices with index of dates and columns of tickers
+            dtype (type, optional): float32 halves memory of long histories.
+                Defaults to np.float64.
+
+        Returns:
+            PriceMatrix: prices of the frame
+
+        """
+        values = np.ascontiguousarray(prices.to_numpy(dtype=dtype))
+        return cls(prices.index.to_numpy(), prices.columns.to_numpy(), values)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def fill(self) -> PriceMatrix:
+        """Fill missing prices in place.
+
+        A missing price is the last known one, missing prices before the first
+        known one are the first known one, like ffill followed by bfill.
+        Read-only values, e.g. of a matrix mapped by load, are copied first.
+
+        Returns:
+            PriceMatrix: self
+
+        """
+        if not self.values.flags.writeable:
+            self.values = np.array(self.values)
+        values = self.values
+        for row in range(1, len(values)):
+            np.copyto(values[row], values[row - 1], where=np.isnan(values[row]))
+
+        # after forward filling only leading prices can be missing
+        first = np.argmax(~np.isnan(values), axis=0)
+        for column in np.flatnonzero(first):
+            values[: first[column], column] = values[first[column], column]
+        return self
+
+    def codes(self, tickers: pd.Series | np.ndarray | list[str]) -> np.ndarray:
+        """Get columns of tickers.
+
+        Args:
+            tickers (pd.Series | np.ndarray | list[str]): tickers
+
+        Returns:
+            np.ndarray: column of every ticker, -1 if it has no prices
+
+        """
+        return np.fromiter(
+            (self._codes.get(ticker, -1) for ticker in tickers),
+            dtype=np.intp,
+            count=len(tickers),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the matrix as a frame sharing its values.
+
+        Returns:
+            pd.DataFrame: prices with index of dates and columns of tickers
+
+        """
+        return pd.DataFrame(
+            self.values,
+            index=pd.DatetimeIndex(self.dates, name="Date"),
+            columns=pd.Index(self.tickers),
+            copy=False,
+        )
+
+    def save(self, path: str | Path) -> None:
+        """Save the matrix to a directory.
+
+        Args:
+            path (str | Path): directory of the matrix
+
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        arrays = {"values": self.values, "tickers": self.tickers.astype(str), "dates": self.dates}
+        # files are replaced only after all of them are written
+        for name, array in arrays.items():
+            np.save(path / f"{name}.tmp.npy", array)
+        for name in arrays:
+            (path / f"{name}.tmp.npy").replace(path / f"{name}.npy")
+
+    @classmethod
+    def load(cls, path: str | Path, *, mmap: bool = True) -> PriceMatrix:
+        """Load a saved matrix.
+
+        Args:
+            path (str | Path): directory of the matrix
+            mmap (bool, optional): map values read-only instead of reading them.
+                Defaults to True.
+
+        Returns:
+            PriceMatrix: saved prices
+
+        """
+        path = Path(path)
+        values = np.load(path / "values.npy", mmap_mode="r" if mmap else None)
+        return cls(np.load(path / "dates.npy"), np.load(path / "tickers.npy"), values)
@@ -0,0 +1,254 @@
+"""Local price store.
+
+Keeps downloaded close prices on disk, so every run only has to fetch the bars
+that are missing since the last stored date of each ticker. Close prices are
+adjusted for splits after the fact, so history of a ticker whose downloaded
+bars do not match the stored ones is downloaded again.
+"""
+
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def _normalized(prices: pd.DataFrame) -> pd.DataFrame:
+    prices = prices.copy()
+    if isinstance(prices.index, pd.DatetimeIndex) and prices.index.tz is not None:
+        prices.index = prices.index.tz_localize(None)
+    prices.index = prices.index.normalize()
+    prices.index.name = "Date"
+    return prices
+
+
+class PriceStore:
+    """Persistent store of close prices keyed by date and Yahoo Finance symbol.
+
+    Prices are kept as a wide frame (index of dates, one column per symbol)
+    pickled on disk. Stored values are raw, i.e. not forward or backward filled.
+    Next to the prices the store keeps the date from which every symbol was
+    downloaded and its last downloaded bar, so older history is downloaded
+    only when it is asked for and bars missing of a suspended or late symbol
+    are asked for again in the next run.
+
+    Attributes:
+        path (Path): location of the pickled frame
+        prices (pd.DataFrame): stored prices
+        fetched (dict[str, pd.Timestamp]): date of the last downloaded bar of every symbol
+        fetched_from (dict[str, pd.Timestamp]): first downloaded date of every symbol
+
+    """
+
+    def __init__(self, path: str | Path = "data/prices.pkl") -> None:
+        """Init method.
+
+        Loads stored prices if the file exists.
+
+        Args:
+            path (str | Path, optional): location of the store. Defaults to "data/prices.pkl".
+
+        """
+        self.path = Path(path)
+        self.prices, self.fetched, self.fetched_from = self._load()
+
+    def _load(
+        self,
+    ) -> tuple[pd.DataFrame, dict[str, pd.Timestamp], dict[str, pd.Timestamp]]:
+        empty = pd.DataFrame(index=pd.DatetimeIndex([], name="Date"))
+        if not self.path.exists():
+            return empty, {}, {}
+
+        try:
+            stored: dict = pd.read_pickle(self.path)
+        except Exception:
+            err = f"price store at {self.path} is corrupted, starting from scratch"
+            logging.exception(err)
+            return empty, {}, {}
+
+        # stores saved before first dates were kept were downloaded from their first row
+        first_date = stored["prices"].index.min()
+        fetched_from = stored.get(
+            "fetched_from",
+            {symbol: first_date for symbol in stored["fetched"]},
+        )
+        return stored["prices"], stored["fetched"], fetched_from
+
+    def last_dates(self, symbols: list[str]) -> dict[str, pd.Timestamp | None]:
+        """Get the last downloaded date of every symbol.
+
+        Args:
+            symbols (list[str]): Yahoo Finance symbols
+
+        Returns:
+            dict[str, pd.Timestamp | None]: last downloaded date, None if symbol is not stored
+
+        """
+        return {symbol: self.fetched.get(symbol) for symbol in symbols}
+
+    def missing_starts(
+        self,
+        symbols: list[str],
+        start: datetime,
+    ) -> dict[pd.Timestamp, list[str]]:
+        """Group symbols by the date from which their prices have to be downloaded.
+
+        The last stored bar is downloaded again, as it could have been
+        saved before the end of the session, and so is the bar before it,
+        which is final, so adjusted history can be told by it, see adjusted.
+        Symbols stored from a later date than start are downloaded again from start.
+
+        Args:
+            symbols (list[str]): Yahoo Finance symbols
+            start (datetime): first date needed for symbols with no stored data
+
+        Returns:
+            dict[pd.Timestamp, list[str]]: download start date with symbols to download from it
+
+        """
+        start = pd.Timestamp(start).normalize()
+        groups: dict[pd.Timestamp, list[str]] = {}
+        for symbol, last_date in self.last_dates(symbols).items():
+            first_date = self.fetched_from.get(symbol)
+            if last_date is None or first_date is None or start < first_date:
+                fetch_start = start
+            else:
+                fetch_start = max(start, self._previous_date(symbol, last_date))
+            groups.setdefault(fetch_start, []).append(symbol)
+        return groups
+
+    def _previous_date(self, symbol: str, last_date: pd.Timestamp) -> pd.Timestamp:
+        if symbol not in self.prices.columns:
+            return last_date
+        stored = self.prices[symbol]
+        dates = stored.index[(stored.index < last_date) & stored.notna().to_numpy()]
+        return dates.max() if len(dates) else last_date
+
+    def adjusted(
+        self,
+        new_prices: pd.DataFrame,
+        events: dict[str, pd.Timestamp] | None = None,
+        rtol: float = 1e-3,
+    ) -> dict[pd.Timestamp, list[str]]:
+        """Find symbols whose stored history was adjusted after it was stored.
+
+        Stored bars are compared with downloaded ones before the last stored bar,
+        which could be saved before the end of its session. A split after the
+        last stored bar marks the history as adjusted too, dividends do not
+        change close prices.
+
+        Args:
+            new_prices (pd.DataFrame): prices with index of dates and columns of symbols
+            events (dict[str, pd.Timestamp] | None, optional): date of the last split
+                of symbols. Defaults to none.
+            rtol (float, optional): relative tolerance of equal prices. Defaults to 1e-3.
+
+        Returns:
+            dict[pd.Timestamp, list[str]]: first downloaded date with symbols to download
+                again from it
+
+        """
+        new_prices = _normalized(new_prices)
+        events = events or {}
+        groups: dict[pd.Timestamp, list[str]] = {}
+        for symbol in new_prices.columns:
+            last_date = self.fetched.get(symbol)
+            if last_date is None or symbol not in self.prices.columns:
+                continue
+
+            dates = new_prices.index[new_prices.index < last_date]
+            stored = self.prices[symbol].reindex(dates).to_numpy(dtype=np.float64)
+            new = new_prices.loc[dates, symbol].to_numpy(dtype=np.float64)
+            both = ~np.isnan(stored) & ~np.isnan(new)
+            changed = not np.allclose(stored[both], new[both], rtol=rtol)
+            event = events.get(symbol)
+            if changed or (event is not None and event.normalize() > last_date):
+                groups.setdefault(self.fetched_from[symbol], []).append(symbol)
+
+        return groups
+
+    def merge(
+        self,
+        new_prices: pd.DataFrame,
+        symbols: list[str],
+        start: datetime | None = None,
+    ) -> None:
+        """Merge newly downloaded prices into the store.
+
+        New values take precedence over the stored ones.
+
+        Args:
+            new_prices (pd.DataFrame): prices with index of dates and columns of symbols
+            symbols (list[str]): symbols that were requested in the download
+            start (datetime | None, optional): start given to missing_starts, symbols are
+                stored from it. Defaults to the first downloaded date.
+
+        """
+        new_prices = new_prices.dropna(how="all")
+        if new_prices.empty:
+            return
+
+        new_prices = _normalized(new_prices)
+        self.prices = new_prices.combine_first(self.prices).sort_index()
+        self.prices.index.name = "Date"
+
+        start = new_prices.index.min() if start is None else pd.Timestamp(start).normalize()
+        for symbol in symbols:
+            last_bar = new_prices[symbol].last_valid_index() if symbol in new_prices else None
+            if last_bar is not None:
+                self.fetched[symbol] = max(self.fetched.get(symbol, last_bar), last_bar)
+            self.fetched_from[symbol] = min(self.fetched_from.get(symbol, start), start)
+
+    def replace(
+        self,
+        new_prices: pd.DataFrame,
+        symbols: list[str],
+        starts: dict[pd.Timestamp, list[str]],
+    ) -> None:
+        """Replace stored history of symbols downloaded again, e.g. adjusted for a split.
+
+        Args:
+            new_prices (pd.DataFrame): prices with index of dates and columns of symbols
+            symbols (list[str]): symbols downloaded successfully, others keep stored prices
+            starts (dict[pd.Timestamp, list[str]]): start dates of the download, as returned
+                by adjusted
+
+        """
+        succeeded = set(symbols)
+        for start, group in starts.items():
+            replaced = [
+                symbol
+                for symbol in group
+                if symbol in succeeded
+                and symbol in new_prices.columns
+                and new_prices[symbol].notna().any()
+            ]
+            self.prices = self.prices.drop(columns=replaced, errors="ignore")
+            for symbol in replaced:
+                self.fetched.pop(symbol, None)
+                self.fetched_from.pop(symbol, None)
+            self.merge(new_prices.reindex(columns=replaced), replaced, start)
+
+    def window(self, symbols: list[str], start: datetime) -> pd.DataFrame:
+        """Get stored prices of symbols starting from some date.
+
+        Args:
+            symbols (list[str]): Yahoo Finance symbols
+            start (datetime): first date to include
+
+        Returns:
+            pd.DataFrame: prices with index of dates and columns of symbols
+
+        """
+        columns = [symbol for symbol in symbols if symbol in self.prices.columns]
+        prices = self.prices.loc[self.prices.index >= pd.Timestamp(start).normalize(), columns]
+        return prices.dropna(how="all")
+
+    def save(self) -> None:
+        """Save the store to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        stored = {"prices": self.prices, "fetched": self.fetched, "fetched_from": self.fetched_from}
+        pd.to_pickle(stored, tmp_path)
+        tmp_path.replace(self.path)
@@ -0,0 +1,398 @@
+"""Market data providers.
+
+Provider is the only place that knows where data comes from. It serves price
+history, intraday quotes, index components with numbers of shares and
+symbol/sector lookups.
+YahooGPWProvider uses YahooFinance and gpwbenchmark.pl, ReplayProvider serves
+recorded fixtures from local files, so the bot can run fully offline.
+"""
+
+import json
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime, timedelta
+from http import HTTPStatus
+from http.client import IncompleteRead
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from constituents import CachedComponents, ConstituentsCache
+from downloader import DownloadReport, download_history
+from instrumentation import count
+
+GPW_PORTFOLIO_URL = "https://gpwbenchmark.pl/ajaxindex.php?action=GPWIndexes&start=ajaxPortfolio&format=html&lang=EN&isin={isin}&cmng_id=1011"  # noqa: E501
+
+
+class MarketDataProvider(ABC):
+    """Interface of a market data source."""
+
+    @abstractmethod
+    def get_history(self, starts: dict[pd.Timestamp, list[str]]) -> DownloadReport:
+        """Get close prices.
+
+        Args:
+            starts (dict[pd.Timestamp, list[str]]): start date with symbols to get from it
+
+        Returns:
+            DownloadReport: prices with index of dates and columns of symbols
+
+        """
+
+    @abstractmethod
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:
+        """Get last prices of the current session.
+
+        Args:
+            symbols (list[str]): Yahoo Finance symbols
+
+        Returns:
+            dict[str, float]: last price of every symbol with a quote
+
+        """
+
+    @abstractmethod
+    def get_index_components(self, isin: str) -> pd.DataFrame:
+        """Get components of an index.
+
+        Args:
+            isin (str): ISIN of the index
+
+        Returns:
+            pd.DataFrame: cols('company', 'ISIN', 'shares_num')
+
+        """
+
+    @abstractmethod
+    def search_symbol(self, query: str) -> str:
+        """Get ticker by other identifier.
+
+        Args:
+            query (str): some identifier, e.g. ISIN
+
+        Returns:
+            str: Yahoo Finance symbol
+
+        """
+
+    @abstractmethod
+    def get_asset_profiles(self, symbols: list[str]) -> dict[str, dict | None]:
+        """Get sector and industry of symbols.
+
+        Args:
+            symbols (list[str]): Yahoo Finance symbols
+
+        Returns:
+            dict[str, dict | None]: {'sector': ..., 'industry': ...} or None if there is no data
+
+        """
+
+
+class YahooGPWProvider(MarketDataProvider):
+    """Prices and profiles from YahooFinance, index components from gpwbenchmark.pl.
+
+    Index components are cached on disk and revalidated with conditional requests
+    once they are older than components_ttl.
+
+    Attributes:
+        download_workers (int): size of the price download worker pool
+        retry (int): how many times to try to download index components
+        components_cache (ConstituentsCache): cache of index components
+        components_ttl (timedelta): how long cached components are used without revalidation
+
+    """
+
+    def __init__(
+        self,
+        download_workers: int = 8,
+        retry: int = 5,
+        cache_dir: str | Path = "data",
+        components_ttl: timedelta = timedelta(hours=6),
+    ) -> None:
+        """Init method.
+
+        Args:
+            download_workers (int, optional): parallel price downloads. Defaults to 8.
+            retry (int, optional): tries of downloading index components. Defaults to 5.
+            cache_dir (str | Path, optional): directory of the components cache. Defaults to "data".
+            components_ttl (timedelta, optional): time to live of cached components.
+                Defaults to 6 hours.
+
+        """
+        self.download_workers = download_workers
+        self.retry = retry
+        self.components_cache = ConstituentsCache(cache_dir)
+        self.components_ttl = components_ttl
+
+    def get_history(self, starts: dict[pd.Timestamp, list[str]]) -> DownloadReport:  # noqa: D102
+        return download_history(starts, workers=self.download_workers)
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:  # noqa: D102
+        import yahooquery as yq
+
+        # one request for all symbols
+        prices = yq.Ticker(symbols).price
+
+        quotes = {}
+        for symbol in symbols:
+            price = prices.get(symbol)
+            # symbols without a quote come back as error messages
+            if isinstance(price, dict) and isinstance(price.get("regularMarketPrice"), int | float):
+                quotes[symbol] = float(price["regularMarketPrice"])
+        count("quotes", len(quotes))
+        return quotes
+
+    def get_index_components(self, isin: str) -> pd.DataFrame:  # noqa: D102
+        cached = self.components_cache.load(isin)
+        if cached is not None and cached.is_fresh(self.components_ttl):
+            return cached.table
+
+        headers = cached.validators() if cached is not None else {}
+        for attempt in range(self.retry):
+            try:
+                response = requests.get(
+                    GPW_PORTFOLIO_URL.format(isin=isin),
+                    headers=headers,
+                    timeout=20,
+                )
+                if response.status_code == HTTPStatus.NOT_MODIFIED and cached is not None:
+                    cached.fetched_at = datetime.now(UTC)
+                    self.components_cache.save(isin, cached)
+                    return cached.table
+
+                response.raise_for_status()
+                count("downloaded_bytes", len(response.content))
+                components = pd.read_html(StringIO(response.text))[0]
+            except (requests.RequestException, IncompleteRead, ValueError) as e:
+                warn = f"downloading components of {isin} failed, try {attempt + 1}: {e!r}"
+                logging.warning(warn)
+                if attempt + 1 < self.retry:
+                    time.sleep(random.uniform(0, 2**attempt))  # noqa: S311
+            else:  # if downloading data worked
+                break
+        else:  # downloading data failed every time
+            if cached is not None:
+                warn = f"using components of {isin} cached at {cached.fetched_at:%Y-%m-%d %H:%M}"
+                logging.warning(warn)
+                return cached.table
+            err = f"downloading index components failed {self.retry} times"
+            raise ConnectionError(err)
+
+        components = components.iloc[:, :3]
+        components.columns = ["company", "ISIN", "shares_num"]
+
+        self.components_cache.save(
+            isin,
+            CachedComponents(
+                table=components,
+                fetched_at=datetime.now(UTC),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            ),
+        )
+        return components
+
+    def search_symbol(
+        self,
+        query: str,
+        preferred_exchange: str = "WSE",
+        max_tries: int = 5,
+    ) -> str:
+        """Get ticker.
+
+        Searches Yahoo Finance for a ticker by other identifier.
+
+        Args:
+            query (str): some identifier
+            preferred_exchange (str, optional): what exchange to prioritize. Defaults to "WSE".
+            max_tries (int, optional): how many times to try to get the ticker. Defaults to 5.
+
+        Raises:
+            ValueError: Yahoo Finance has not returned any ticker
+
+        Returns:
+            str: Yahoo Finance symbol
+
+        """
+        import yahooquery as yq
+
+        msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
+        for _ in range(max_tries + 1):
+            try:
+                data = yq.search(query)
+            except ValueError:  # Will catch JSONDecodeError
+                continue
+
+            quotes = data["quotes"]
+            if len(quotes) == 0:
+                continue
+
+            symbol: str = quotes[0]["symbol"]
+            for quote in quotes:
+                if quote["exchange"] == preferred_exchange:
+                    symbol = quote["symbol"]
+                    break
+            return symbol
+
+        raise ValueError(msg)
+
+    def get_asset_profiles(self, symbols: list[str]) -> dict[str, dict | None]:  # noqa: D102
+        import yahooquery as yq
+
+        # one request for all symbols
+        asset_profiles = yq.Ticker(symbols).asset_profile
+
+        profiles = {}
+        for symbol in symbols:
+            asset_profile = asset_profiles.get(symbol)
+
+            # check for correct data returned
+            # new companies may have no sector/industry data
+            if not isinstance(asset_profile, dict):
+                profiles[symbol] = None
+            else:
+                profiles[symbol] = {
+                    "sector": asset_profile.get("sector"),
+                    "industry": asset_profile.get("industry"),
+                }
+        return profiles
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recorded fixtures from local files.
+
+    Fixtures directory layout:
+        prices.csv: 'Date' column and one column of close prices per symbol
+        quotes.json: {symbol: last price}
+        components_<isin>.csv: cols('company', 'ISIN', 'shares_num')
+        symbols.json: {query: symbol}
+        profiles.json: {symbol: {'sector': ..., 'industry': ...} or null}
+
+    Attributes:
+        path (Path): fixtures directory
+        latency (float): simulated latency of every call in seconds
+
+    """
+
+    def __init__(self, path: str | Path, latency: float = 0.0) -> None:
+        """Init method.
+
+        Args:
+            path (str | Path): fixtures directory
+            latency (float, optional): simulated latency of every call in seconds. Defaults to 0.0.
+
+        """
+        self.path = Path(path)
+        self.latency = latency
+
+    def _read_json(self, name: str) -> dict:
+        file = self.path / name
+        if not file.exists():
+            return {}
+        return json.loads(file.read_text(encoding="utf-8"))
+
+    def get_history(self, starts: dict[pd.Timestamp, list[str]]) -> DownloadReport:  # noqa: D102
+        time.sleep(self.latency)
+        began = time.perf_counter()
+
+        prices = pd.read_csv(self.path / "prices.csv", index_col="Date", parse_dates=True)
+        report = DownloadReport(prices=pd.DataFrame())
+        series = []
+        for start, symbols in starts.items():
+            for symbol in symbols:
+                if symbol not in prices.columns:
+                    report.failed[symbol] = "symbol not recorded"
+                    continue
+                series.append(prices.loc[prices.index >= start, symbol])
+                report.succeeded.append(symbol)
+
+        if series:
+            report.prices = pd.concat(series, axis=1)
+        report.elapsed = time.perf_counter() - began
+        return report
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:  # noqa: D102
+        time.sleep(self.latency)
+        quotes = self._read_json("quotes.json")
+        return {symbol: quotes[symbol] for symbol in symbols if symbol in quotes}
+
+    def get_index_components(self, isin: str) -> pd.DataFrame:  # noqa: D102
+        time.sleep(self.latency)
+        return pd.read_csv(self.path / f"components_{isin}.csv")
+
+    def search_symbol(self, query: str) -> str:  # noqa: D102
+        time.sleep(self.latency)
+        symbols = self._read_json("symbols.json")
+        if query not in symbols:
+            msg = f"symbol for {query = } not recorded"
+            raise ValueError(msg)
+        return symbols[query]
+
+    def get_asset_profiles(self, symbols: list[str]) -> dict[str, dict | None]:  # noqa: D102
+        time.sleep(self.latency)
+        profiles = self._read_json("profiles.json")
+        return {symbol: profiles.get(symbol) for symbol in symbols}
+
+
+class RecordingProvider(MarketDataProvider):
+    """Passes calls to another provider and records its responses as fixtures for ReplayProvider.
+
+    Attributes:
+        provider (MarketDataProvider): provider to record
+        path (Path): fixtures directory
+
+    """
+
+    def __init__(self, provider: MarketDataProvider, path: str | Path) -> None:
+        """Init method.
+
+        Args:
+            provider (MarketDataProvider): provider to record
+            path (str | Path): fixtures directory
+
+        """
+        self.provider = provider
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _update_json(self, name: str, values: dict) -> None:
+        file = self.path / name
+        recorded = json.loads(file.read_text(encoding="utf-8")) if file.exists() else {}
+        recorded.update(values)
+        file.write_text(json.dumps(recorded, indent=2), encoding="utf-8")
+
+    def get_history(self, starts: dict[pd.Timestamp, list[str]]) -> DownloadReport:  # noqa: D102
+        report = self.provider.get_history(starts)
+
+        file = self.path / "prices.csv"
+        prices = report.prices
+        if file.exists():
+            recorded = pd.read_csv(file, index_col="Date", parse_dates=True)
+            prices = prices.combine_first(recorded)
+        prices.to_csv(file, index_label="Date")
+
+        return report
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:  # noqa: D102
+        quotes = self.provider.get_quotes(symbols)
+        self._update_json("quotes.json", quotes)
+        return quotes
+
+    def get_index_components(self, isin: str) -> pd.DataFrame:  # noqa: D102
+        components = self.provider.get_index_components(isin)
+        components.to_csv(self.path / f"components_{isin}.csv", index=False)
+        return components
+
+    def search_symbol(self, query: str) -> str:  # noqa: D102
+        symbol = self.provider.search_symbol(query)
+        self._update_json("symbols.json", {query: symbol})
+        return symbol
+
+    def get_asset_profiles(self, symbols: list[str]) -> dict[str, dict | None]:  # noqa: D102
+        profiles = self.provider.get_asset_profiles(symbols)
+        self._update_json("profiles.json", profiles)
+        return profiles
@@ -0,0 +1,253 @@
+"""Heatmap rendering.
+
+Keeps warm renderers alive for the whole run and renders batches of figures
+in parallel across worker processes. Two backends are available: 'plotly'
+renders plotly figures with Kaleido, 'native' draws the treemap with Pillow.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from instrumentation import count
+
+if TYPE_CHECKING:
+    from layout_cache import LayoutCache
+    from treemap import HeatmapSpec
+
+
+@dataclass
+class RenderResult:
+    """Rendered image.
+
+    Attributes:
+        path (str): path of the image
+        seconds (float): render time in seconds
+        size (int): size of the image in bytes
+
+    """
+
+    path: str
+    seconds: float
+    size: int
+
+
+def warm_up() -> None:
+    """Start Kaleido and render a tiny figure, so later renders skip the startup."""
+    import plotly.graph_objects as go
+
+    import kaleido
+
+    # kaleido>=1.0 can keep a persistent browser, older versions keep their subprocess anyway
+    if hasattr(kaleido, "start_sync_server"):
+        kaleido.start_sync_server(silence_warnings=True)
+
+    go.Figure().to_image(format="png", width=16, height=16)
+
+
+def render_figure(backend: str, figure: object, path: str) -> RenderResult:
+    """Render a figure to an image.
+
+    Args:
+        backend (str): 'plotly' or 'native'
+        figure (object): plotly figure serialized with fig.to_json() or treemap.HeatmapSpec
+        path (str): filename with extension
+
+    Returns:
+        RenderResult: path, render time and size of the image
+
+    """
+    began = time.perf_counter()
+    if backend == "plotly":
+        import plotly.io as pio
+
+        pio.from_json(figure).write_image(path)
+    else:
+        from treemap import render_heatmap
+
+        render_heatmap(figure, path)
+    return RenderResult(path, time.perf_counter() - began, Path(path).stat().st_size)
+
+
+def render_frame(spec: HeatmapSpec) -> bytes:
+    """Draw a native heatmap as a raw frame.
+
+    Args:
+        spec (HeatmapSpec): heatmap with its layout
+
+    Returns:
+        bytes: RGB pixels of spec.width x spec.height, row by row
+
+    """
+    from treemap import draw_heatmap
+
+    return draw_heatmap(spec).tobytes()
+
+
+BACKENDS = ("plotly", "native")
+
+
+class HeatmapRenderer:
+    """Renders batches of figures with warm renderers.
+
+    With one worker figures are rendered in the calling process, with more
+    they are rendered in a pool of processes started once and warmed up.
+    Native heatmaps of one batch share their layout, it is solved once in
+    the calling process and workers only paint the tiles.
+
+    Attributes:
+        workers (int): number of rendering processes
+        backend (str): 'plotly' or 'native'
+        layouts (LayoutCache | None): cache of native treemap layouts
+
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        backend: str = "plotly",
+        layouts: LayoutCache | None = None,
+    ) -> None:
+        """Init method.
+
+        Args:
+            workers (int, optional): number of rendering processes. Defaults to 1.
+            backend (str, optional): 'plotly' or 'native'. Defaults to "plotly".
+            layouts (LayoutCache | None, optional): cache of native treemap layouts.
+                Defaults to an in-memory cache.
+
+        Raises:
+            ValueError: unknown backend
+
+        """
+        if backend not in BACKENDS:
+            msg = f"backend {backend} not available, use one of {BACKENDS}"
+            raise ValueError(msg)
+
+        self.workers = workers
+        self.backend = backend
+        self._layouts = layouts
+        self._executor: ProcessPoolExecutor | None = None
+        self._started = False
+
+    def _start(self) -> None:
+        if self._started:
+            return
+
+        began = time.perf_counter()
+        initializer = warm_up if self.backend == "plotly" else None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=initializer)
+        elif initializer is not None:
+            initializer()
+        self._started = True
+
+        info = (
+            f"{self.backend} renderer started with {self.workers} workers "
+            f"in {time.perf_counter() - began:.2f}s"
+        )
+        logging.info(info)
+
+    @property
+    def layouts(self) -> LayoutCache:
+        """Cache of native treemap layouts, in memory unless other was given."""
+        if self._layouts is None:
+            from layout_cache import LayoutCache
+
+            self._layouts = LayoutCache(directory=None)
+        return self._layouts
+
+    def _with_layouts(self, jobs: list[tuple[object, str]]) -> list[tuple[object, str]]:
+        with_layouts = []
+        for spec, path in jobs:
+            if spec.layout is None:
+                layout = self.layouts.get(
+                    spec.tickers,
+                    spec.sectors,
+                    spec.mkt_cap,
+                    spec.width,
+                    spec.height,
+                )
+                spec = replace(spec, layout=layout)  # noqa: PLW2901
+            with_layouts.append((spec, path))
+        return with_layouts
+
+    def render(self, jobs: list[tuple[object, str]]) -> list[RenderResult]:
+        """Render a batch of figures.
+
+        Args:
+            jobs (list[tuple[object, str]]): figures and their paths, plotly figures
+                serialized with fig.to_json(), native ones as treemap.HeatmapSpec
+
+        Returns:
+            list[RenderResult]: results in order of jobs
+
+        """
+        self._start()
+        began = time.perf_counter()
+        if self.backend == "native":
+            jobs = self._with_layouts(jobs)
+
+        if self._executor is not None:
+            futures = [
+                self._executor.submit(render_figure, self.backend, figure, path)
+                for figure, path in jobs
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = [render_figure(self.backend, figure, path) for figure, path in jobs]
+
+        count("images", len(results))
+        count("image_bytes", sum(result.size for result in results))
+        for result in results:
+            info = f"rendered {result.path} in {result.seconds:.2f}s ({result.size / 1e6:.1f} MB)"
+            logging.info(info)
+        info = f"rendered {len(results)} figures in {time.perf_counter() - began:.2f}s"
+        if self._layouts is not None:
+            info += f", layouts reused {self._layouts.hits}, computed {self._layouts.misses}"
+        logging.info(info)
+
+        return results
+
+    def frames(self, specs: Iterable[HeatmapSpec], window: int | None = None) -> Iterator[bytes]:
+        """Draw native heatmaps as raw frames, e.g. to stream them to a video encoder.
+
+        At most window frames are drawn or waiting at once, so memory does not grow
+        with the number of frames. Specs are consumed lazily.
+
+        Args:
+            specs (Iterable[HeatmapSpec]): heatmaps with their layouts
+            window (int | None, optional): frames in flight. Defaults to 2 per worker.
+
+        Yields:
+            Iterator[bytes]: RGB pixels of every heatmap in order of specs
+
+        """
+        self._start()
+        if self._executor is None:
+            for spec in specs:
+                yield render_frame(spec)
+            return
+
+        window = window or 2 * self.workers
+        pending: deque[Future[bytes]] = deque()
+        for spec in specs:
+            pending.append(self._executor.submit(render_frame, spec))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        """Stop rendering processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._started = False
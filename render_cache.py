@@ -0,0 +1,125 @@
+"""Content addressed cache of rendered heatmaps.
+
+Rendered images are stored under a digest of everything they are made of,
+so re-runs, retries and duplicated posts reuse the image instead of
+rendering it again. The cache is capped in size and evicts least recently
+used images first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+
+def heatmap_key(data: pd.DataFrame, **params: object) -> str:
+    """Digest of a heatmap.
+
+    Args:
+        data (pd.DataFrame): data of the heatmap
+        **params (object): everything else the image depends on, e.g. period and styling
+
+    Returns:
+        str: hex digest
+
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([list(map(str, data.columns)), params], default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+class RenderCache:
+    """On-disk LRU cache of rendered images and their tweet texts.
+
+    Every entry is <key>.png with <key>.json holding the tweet text,
+    modification time of the image marks when it was last used.
+
+    Attributes:
+        directory (Path): location of cached images
+        max_bytes (int): size cap of cached images
+
+    """
+
+    def __init__(
+        self,
+        directory: str | Path = "data/renders",
+        max_bytes: int = 512 * 2**20,
+    ) -> None:
+        """Init method.
+
+        Args:
+            directory (str | Path, optional): location of cached images.
+                Defaults to "data/renders".
+            max_bytes (int, optional): size cap of cached images. Defaults to 512 MiB.
+
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def get(self, key: str, path: str) -> str | None:
+        """Copy cached image to path.
+
+        Args:
+            key (str): digest of the heatmap
+            path (str): where to put the image
+
+        Returns:
+            str | None: tweet text of the image, None if it is not cached
+
+        """
+        image = self.directory / f"{key}.png"
+        meta = self.directory / f"{key}.json"
+        if not image.exists() or not meta.exists():
+            return None
+
+        try:
+            text = json.loads(meta.read_text(encoding="utf-8"))["text"]
+        except (ValueError, KeyError):
+            warn = f"cached render {key} is corrupted, rendering it again"
+            logging.exception(warn)
+            return None
+
+        shutil.copyfile(image, path)
+        os.utime(image)  # mark as recently used
+
+        info = f"reused cached render {key} as {path}"
+        logging.info(info)
+        return text
+
+    def put(self, key: str, path: str, text: str) -> None:
+        """Cache rendered image.
+
+        Args:
+            key (str): digest of the heatmap
+            path (str): rendered image
+            text (str): tweet text of the image
+
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f"{key}.tmp"
+        shutil.copyfile(path, tmp_path)
+        tmp_path.replace(self.directory / f"{key}.png")
+        (self.directory / f"{key}.json").write_text(
+            json.dumps({"text": text}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used images above the size cap."""
+        images = sorted(self.directory.glob("*.png"), key=lambda image: image.stat().st_mtime)
+        total = sum(image.stat().st_size for image in images)
+        for image in images:
+            if total <= self.max_bytes:
+                break
+            total -= image.stat().st_size
+            image.unlink(missing_ok=True)
+            image.with_suffix(".json").unlink(missing_ok=True)
+
+            info = f"evicted cached render {image.stem}"
+            logging.info(info)
@@ -0,0 +1,320 @@
+"""Returns engine.
+
+Calculates returns of all components and of the index for every period at once,
+so preparing data for another period is only a column lookup. Sub-indices are
+views sharing returns of the tickers, only their components are joined again.
+Components are kept as arrays with sectors and industries as integer codes, the
+frame of a period is made only when it is asked for. Sectors and industries are
+aggregated for all periods at once with bincount over their codes. Rolling
+analytics of tickers, e.g. 52-week highs, are added to frames as more columns.
+"""
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from price_matrix import decode, encode
+
+if TYPE_CHECKING:
+    from price_matrix import PriceMatrix
+
+# components metadata kept as integer codes
+CODED = ("sector", "industry")
+
+
+@dataclass
+class GroupReturns:
+    """Returns of groups of components, e.g. sectors, for every period.
+
+    Attributes:
+        periods (list[str]): periods of rows
+        labels (np.ndarray): label of every group
+        counts (np.ndarray): number of components with a return with rows of periods
+            and columns of groups
+        mkt_cap (np.ndarray): market cap of components with a return, same shape as counts
+        returns (np.ndarray): cap-weighted returns, same shape as counts
+        contributions (np.ndarray): contributions to the cap-weighted return of all groups
+        best (np.ndarray): tickers with the highest return, same shape as returns
+        worst (np.ndarray): tickers with the lowest return, same shape as returns
+
+    """
+
+    periods: list[str]
+    labels: np.ndarray
+    counts: np.ndarray
+    mkt_cap: np.ndarray
+    returns: np.ndarray
+    contributions: np.ndarray
+    best: np.ndarray
+    worst: np.ndarray
+
+    def ranking(self, period: str) -> pd.DataFrame:
+        """Get groups sorted by their return in a period.
+
+        Args:
+            period (str): one of calculated periods
+
+        Raises:
+            NotImplementedError: period was not calculated
+
+        Returns:
+            pd.DataFrame: cols('label', 'returns', 'contribution', 'count', 'mkt_cap',
+                'best', 'worst'), sorted descending by returns
+
+        """
+        if period not in self.periods:
+            msg = f"period {period} not available"
+            raise NotImplementedError(msg)
+
+        row = self.periods.index(period)
+        order = np.argsort(-self.returns[row], kind="stable")
+        return pd.DataFrame(
+            {
+                "label": self.labels[order],
+                "returns": self.returns[row, order],
+                "contribution": self.contributions[row, order],
+                "count": self.counts[row, order],
+                "mkt_cap": self.mkt_cap[row, order],
+                "best": self.best[row, order],
+                "worst": self.worst[row, order],
+            },
+        )
+
+
+class ReturnsEngine:
+    """Returns of index components for many periods.
+
+    Attributes:
+        periods (list[str]): periods with calculated returns
+        returns (np.ndarray): returns with rows of periods and columns of the price matrix
+        index_returns (pd.Series): returns of the index with index of periods
+        columns (np.ndarray): columns of components in the price matrix
+        curr_prices (np.ndarray): prices of components at the as-of date
+        mkt_cap (np.ndarray): market caps of components at the as-of date
+        metadata (dict[str, np.ndarray]): other columns of components, codes of coded ones
+        categories (dict[str, np.ndarray]): categories of coded columns
+        analytics (dict[str, np.ndarray]): rolling analytics of columns of the price matrix
+
+    """
+
+    def __init__(
+        self,
+        prices: PriceMatrix,
+        index: pd.Series | np.ndarray,
+        components: pd.DataFrame,
+        rows: dict[str, tuple[int, int]],
+        index_name: str = "WIG",
+        labels: dict[str, dict[str, str]] | None = None,
+        analytics: dict[str, np.ndarray] | None = None,
+    ) -> None:
+        """Init method.
+
+        Calculates returns of every period with a single gather of start and end rows.
+
+        Args:
+            prices (PriceMatrix): prices of all tickers
+            index (pd.Series | np.ndarray): prices of the index, on the same dates as prices
+            components (pd.DataFrame): components with 'ticker' and 'shares_num' columns
+            rows (dict[str, tuple[int, int]]): period with positions of its start and end rows
+            index_name (str, optional): name of the treemap root. Defaults to "WIG".
+            labels (dict[str, dict[str, str]] | None, optional): display labels of values
+                of coded columns, e.g. of industries. Defaults to none.
+            analytics (dict[str, np.ndarray] | None, optional): rolling analytics with
+                a value of every column of the price matrix, see analytics.ANALYTICS.
+                Defaults to none.
+
+        """
+        self.periods = list(rows)
+        self._starts = np.array([rows[period][0] for period in self.periods], dtype=np.intp)
+        self._ends = np.array([rows[period][1] for period in self.periods], dtype=np.intp)
+
+        self._prices = prices
+        self.returns = prices.values[self._ends] / prices.values[self._starts] - 1
+        # all periods end at the bar of the as-of date, past dates are priced at it
+        self._asof_row = int(self._ends.max()) if len(self._ends) else -1
+        self._labels = labels or {}
+        self.analytics = analytics or {}
+
+        self._set_index(index, components, index_name)
+
+    def _set_index(
+        self,
+        index: pd.Series | np.ndarray,
+        components: pd.DataFrame,
+        index_name: str,
+    ) -> None:
+        index_values = np.asarray(index, dtype=np.float64)
+        self.index_returns = pd.Series(
+            index_values[self._ends] / index_values[self._starts] - 1,
+            index=self.periods,
+        )
+
+        # only tickers with prices are kept
+        columns = self._prices.codes(components.ticker)
+        priced = columns >= 0
+        self.columns = columns[priced]
+        self.curr_prices = self._prices.values[self._asof_row, self.columns].astype(np.float64)
+        shares_num = components.shares_num.to_numpy(dtype=np.float64)[priced]
+        self.mkt_cap = self.curr_prices * shares_num
+        self.index_name = index_name
+
+        self.metadata: dict[str, np.ndarray] = {}
+        self.categories: dict[str, np.ndarray] = {}
+        for column in components.columns.drop(["ticker", "ISIN", "yf_ticker"]):
+            values = components[column].to_numpy()[priced]
+            if column in CODED:
+                self.metadata[column], categories = encode(values)
+                # labels are mapped once per category, not once per component
+                labels = self._labels.get(column, {})
+                self.categories[column] = np.array(
+                    [labels.get(category, category) for category in categories],
+                    dtype=object,
+                )
+            else:
+                self.metadata[column] = values
+        self._groups: dict[str, GroupReturns] = {}
+
+    def view(
+        self,
+        index: pd.Series | np.ndarray,
+        components: pd.DataFrame,
+        index_name: str,
+    ) -> ReturnsEngine:
+        """Get returns of another index whose components are among the priced tickers.
+
+        Returns of tickers are shared, only the index returns and components are new.
+
+        Args:
+            index (pd.Series | np.ndarray): prices of the index, on the same dates as prices
+            components (pd.DataFrame): components with 'ticker' and 'shares_num' columns
+            index_name (str): name of the treemap root
+
+        Returns:
+            ReturnsEngine: returns of the index and its components
+
+        """
+        engine = copy.copy(self)
+        engine._set_index(index, components, index_name)  # noqa: SLF001
+        return engine
+
+    def groups(self, column: str = "sector") -> GroupReturns:
+        """Aggregate components by a coded column for all periods at once.
+
+        Returns of groups are weighted by market caps at the as-of date,
+        components without a label or a return are left out of them, also out
+        of market caps and counts of groups in the period.
+
+        Args:
+            column (str, optional): 'sector' or 'industry'. Defaults to "sector".
+
+        Returns:
+            GroupReturns: returns, contributions, counts and best and worst tickers of groups
+
+        """
+        if column in self._groups:
+            return self._groups[column]
+
+        labelled = self.metadata[column] >= 0
+        codes = self.metadata[column][labelled]
+        n_groups = len(self.categories[column])
+        n_periods = len(self.periods)
+        returns = self.returns[:, self.columns[labelled]]
+        mkt_cap = self.mkt_cap[labelled]
+        tickers = self._prices.tickers[self.columns[labelled]]
+
+        # one bincount over all periods, groups of every period are offset by the number of groups
+        flat_codes = (np.arange(n_periods)[:, None] * n_groups + codes).ravel()
+
+        def bincount(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(
+                flat_codes,
+                weights=weights.ravel(),
+                minlength=n_periods * n_groups,
+            ).reshape(n_periods, n_groups)
+
+        returned = ~np.isnan(returns)
+        counts = bincount(returned).astype(np.int64)
+        group_cap = bincount(np.where(returned, mkt_cap, 0.0))
+        group_weighted = bincount(np.where(returned, returns * mkt_cap, 0.0))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            group_returns = group_weighted / group_cap
+            contributions = group_weighted / group_cap.sum(axis=1, keepdims=True)
+
+        # components sorted by group and return, the first and last of every group
+        first = np.searchsorted(np.sort(codes), np.arange(n_groups))
+        last = first + np.bincount(codes, minlength=n_groups) - 1
+        best = np.empty((n_periods, n_groups), dtype=object)
+        worst = np.empty((n_periods, n_groups), dtype=object)
+        for row in range(n_periods):
+            highest = np.lexsort((np.nan_to_num(returns[row], nan=-np.inf), codes))
+            lowest = np.lexsort((np.nan_to_num(returns[row], nan=np.inf), codes))
+            best[row] = tickers[highest[last]]
+            worst[row] = tickers[lowest[first]]
+
+        self._groups[column] = GroupReturns(
+            periods=self.periods,
+            labels=self.categories[column],
+            counts=counts,
+            mkt_cap=group_cap,
+            returns=group_returns,
+            contributions=contributions,
+            best=best,
+            worst=worst,
+        )
+        return self._groups[column]
+
+    def period_returns(self, period: str) -> np.ndarray:
+        """Get returns of components for a period.
+
+        Args:
+            period (str): one of calculated periods
+
+        Raises:
+            NotImplementedError: period was not calculated
+
+        Returns:
+            np.ndarray: returns in order of components
+
+        """
+        if period not in self.periods:
+            msg = f"period {period} not available"
+            raise NotImplementedError(msg)
+
+        return self.returns[self.periods.index(period), self.columns]
+
+    def get(self, period: str) -> tuple[pd.DataFrame, float]:
+        """Get returns of components and of the index for a period.
+
+        Args:
+            period (str): one of calculated periods
+
+        Raises:
+            NotImplementedError: period was not calculated
+
+        Returns:
+            tuple[pd.DataFrame, float]: components with returns sorted descending and index return
+
+        """
+        returns = self.period_returns(period)
+        # stable, so ties keep the order of components, missing returns go last
+        order = np.argsort(-returns, kind="stable")
+
+        data = {"ticker": self._prices.tickers[self.columns[order]], "returns": returns[order]}
+        for column, values in self.metadata.items():
+            if column in self.categories:
+                data[column] = decode(values[order], self.categories[column])
+            else:
+                data[column] = values[order]
+        data["curr_prices"] = self.curr_prices[order]
+        data["mkt_cap"] = self.mkt_cap[order]
+        for column, values in self.analytics.items():
+            data[column] = values[self.columns[order]]
+        data[self.index_name] = self.index_name
+
+        return pd.DataFrame(data), float(self.index_returns[period])
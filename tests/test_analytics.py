@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import ANALYTICS, MIN_OBSERVATIONS, WINDOW, RollingAnalytics
+from price_matrix import PriceMatrix
+
+SHORT_WINDOW = 30
+
+
+def _prices(n_bars: int, n_tickers: int = 5, seed: int = 0) -> PriceMatrix:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_bars)
+    steps = rng.normal(0, 0.02, (n_bars, n_tickers))
+    values = 100 * np.exp(steps.cumsum(axis=0))
+    return PriceMatrix(dates.to_numpy(), np.array([f"T{i}" for i in range(n_tickers)]), values)
+
+
+def _brute_force(values: np.ndarray, row: int, window: int) -> dict[str, np.ndarray]:
+    """Analytics at a row computed from the whole window of every ticker."""
+    prices = values[: row + 1]
+    in_window = prices[-window:]
+    returns = (prices[1:] / prices[:-1] - 1)[-window:]
+    last = prices[-1]
+
+    high = in_window.max(axis=0)
+    low = in_window.min(axis=0)
+    if len(returns) < window - 1:
+        high = low = np.full(prices.shape[1], np.nan)
+    volatility = np.full(prices.shape[1], np.nan)
+    if len(returns) >= MIN_OBSERVATIONS:
+        volatility = returns.std(axis=0, ddof=1) * np.sqrt(WINDOW)
+
+    return {
+        "high_52w": high,
+        "low_52w": low,
+        "from_high": last / high - 1,
+        "from_low": last / low - 1,
+        "volatility": volatility,
+        "drawdown": last / prices.max(axis=0) - 1,
+    }
+
+
+def _assert_matches(analytics: RollingAnalytics, prices: PriceMatrix, row: int) -> None:
+    columns = analytics.columns(prices.tickers)
+    expected = _brute_force(prices.values, row, analytics.window)
+    for name in ANALYTICS:
+        np.testing.assert_allclose(columns[name], expected[name], rtol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize("row", [10, 25, SHORT_WINDOW, 100])
+def test_seeded_state_matches_brute_force(row):
+    prices = _prices(120)
+    analytics = RollingAnalytics(SHORT_WINDOW)
+
+    assert analytics.update(prices, row) == row + 1
+    _assert_matches(analytics, prices, row)
+
+
+def test_bar_by_bar_updates_match_brute_force():
+    prices = _prices(120)
+    analytics = RollingAnalytics(SHORT_WINDOW)
+    analytics.update(prices, 5)
+
+    for row in range(6, 120):
+        assert analytics.update(prices, row) == 1
+        _assert_matches(analytics, prices, row)
+
+
+def test_saved_state_continues_where_it_stopped(tmp_path):
+    prices = _prices(120)
+    analytics = RollingAnalytics(SHORT_WINDOW)
+    analytics.update(prices, 70)
+    analytics.save(tmp_path / "analytics.npz")
+
+    loaded = RollingAnalytics.load(tmp_path / "analytics.npz", SHORT_WINDOW)
+
+    assert loaded.update(prices, 119) == 49
+    _assert_matches(loaded, prices, 119)
+
+
+def test_adjusted_history_is_read_again():
+    prices = _prices(120)
+    analytics = RollingAnalytics(SHORT_WINDOW)
+    analytics.update(prices, 80)
+
+    # a 1:2 split of the first ticker adjusts all of its history
+    prices.values[:, 0] /= 2
+    analytics.update(prices, 90)
+
+    _assert_matches(analytics, prices, 90)
+
+
+def test_untracked_ticker_has_no_analytics():
+    prices = _prices(40)
+    analytics = RollingAnalytics(SHORT_WINDOW)
+    analytics.update(prices, 39)
+
+    columns = analytics.columns(["T0", "MISSING"])
+
+    assert not np.isnan(columns["volatility"][0])
+    assert all(np.isnan(columns[name][1]) for name in ANALYTICS)
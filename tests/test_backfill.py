@@ -0,0 +1,94 @@
+import json
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from backfill import HISTORY, backfill, trading_days
+
+DATES = pd.bdate_range("2025-03-03", periods=10, name="Date")
+
+
+class FakeRenderer:
+    """Renderer recording batches of jobs."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+        self.closed = False
+
+    def render(self, jobs: list[tuple[str, str]]) -> None:
+        self.batches.append([path for _, path in jobs])
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeBot:
+    """Bot with 1D returns of every day and 1W returns from its second week."""
+
+    render_workers = 1
+    indices = ("WIG", "WIG20", "MISSING")
+
+    def __init__(self) -> None:
+        self.renderer = FakeRenderer()
+        self.asof: date | None = None
+        self.loaded_from: datetime | None = None
+
+    def load_data(self, start: datetime) -> None:
+        self.loaded_from = start
+        self.prices = pd.DataFrame({"AAA": range(len(DATES))}, index=DATES)
+        self.index_prices = pd.DataFrame({"WIG": 1.0, "WIG20": 2.0}, index=DATES)
+
+    def set_asof(self, day: date) -> None:
+        self.asof = day
+
+    def _prepare_data_for_heatmap_and_tweet(self, period: str, index: str) -> tuple[str, float]:
+        if period == "1W" and self.asof < date(2025, 3, 10):
+            raise NotImplementedError
+        return f"{self.asof} {index} {period}", 0.01
+
+    def _prepare_tweet_text(self, data: str, index_return: float, period: str, index: str) -> str:
+        return f"{data} {index_return:+.0%}"
+
+    def build_heatmap(self, data: str, period: str, index: str) -> str:
+        return data
+
+
+@pytest.fixture
+def bot() -> FakeBot:
+    return FakeBot()
+
+
+def test_trading_days(bot):
+    bot.load_data(datetime(2025, 1, 1))
+
+    days = trading_days(bot, date(2025, 3, 8), date(2025, 3, 11))
+
+    assert days == [date(2025, 3, 10), date(2025, 3, 11)]
+
+
+def test_heatmaps_of_every_session_are_rendered_in_batches(bot, tmp_path):
+    entries = backfill(bot, date(2025, 3, 7), date(2025, 3, 11), ["1D", "1W"], tmp_path, batch=5)
+
+    assert bot.loaded_from == datetime(2025, 3, 7) - HISTORY
+    # 1W heatmap of March 7th could not be resolved
+    assert [(e.date, e.index, e.period) for e in entries[:4]] == [
+        ("2025-03-07", "WIG", "1D"),
+        ("2025-03-07", "WIG20", "1D"),
+        ("2025-03-10", "WIG", "1D"),
+        ("2025-03-10", "WIG", "1W"),
+    ]
+    assert len(entries) == 10
+    assert [len(batch) for batch in bot.renderer.batches] == [6, 4]
+    assert bot.renderer.batches[0][0] == str(tmp_path / "2025-03-07_wig_1D.png")
+    assert bot.renderer.closed
+
+    index = json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))
+    assert index[0] == {
+        "date": "2025-03-07",
+        "index": "WIG",
+        "period": "1D",
+        "path": "2025-03-07_wig_1D.png",
+        "index_return": 0.01,
+        "text": "2025-03-07 WIG 1D +1%",
+    }
@@ -0,0 +1,48 @@
+from benchmarks.bench_pipeline import compare, measure
+from benchmarks.synthetic import make_components, make_prices
+
+
+def test_synthetic_data_is_reproducible():
+    components = make_components(50)
+    prices, index = make_prices(components, years=1, end="2024-12-31")
+
+    assert len(components) == 50
+    assert components.sector.notna().all()
+    assert prices.shape == (252, 50)
+    assert prices.index[-1].date().isoformat() == "2024-12-31"
+    assert (prices > 0).all().all()
+    assert index.index.equals(prices.index)
+    assert make_prices(make_components(50), years=1, end="2024-12-31")[0].equals(prices)
+
+
+def test_measure():
+    calls = []
+
+    result = measure(lambda: calls.append(bytearray(2**20)), repeat=3)
+
+    # timed calls and one call tracing memory
+    assert len(calls) == 4
+    assert result["min"] <= result["median"]
+    assert result["peak_mb"] >= 1
+
+
+def test_only_slower_stages_above_noise_are_regressions():
+    baseline = {
+        "330x1y": {
+            "build_heatmap 1D": {"median": 0.100},
+            "prepare_data 1D": {"median": 0.100},
+            "get_periods_indicies 1D": {"median": 0.001},
+        },
+    }
+    results = {
+        "330x1y": {
+            "build_heatmap 1D": {"median": 0.150},
+            "prepare_data 1D": {"median": 0.120},
+            "get_periods_indicies 1D": {"median": 0.004},
+            "fill_prices": {"median": 1.0},
+        },
+    }
+
+    assert compare(results, baseline, threshold=0.25) == [
+        "330x1y build_heatmap 1D: 100.0 ms -> 150.0 ms (+50%)",
+    ]
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from calendar_index import TradingCalendar
+from planner import is_trading_day
+
+# sessions of two years around new year, a week spans both of them
+DATES = pd.DatetimeIndex(
+    [day for day in pd.bdate_range("2024-01-01", "2025-12-31") if is_trading_day(day.date())],
+)
+FREQS = {"YTD": "Y", "QTD": "Q", "MTD": "M", "1W": "W"}
+
+
+def _expected_rows(period: str, asof: pd.Timestamp) -> tuple[int, int]:
+    """Rows of a period found by scanning all dates, like the pandas code replaced by the index."""
+    end = int((DATES <= asof).sum()) - 1
+    if period == "1D":
+        return max(end - 1, 0), end
+    if period == "1Y":
+        return max(end - 252, 0), end
+
+    periods = DATES.to_period(FREQS[period])
+    in_period = (periods == asof.to_period(FREQS[period])) & (DATES <= asof)
+    if not in_period.any():
+        return end, end
+    return max(int(in_period.argmax()) - 1, 0), end
+
+
+@pytest.mark.parametrize("period", ["1D", "1W", "MTD", "QTD", "YTD", "1Y"])
+def test_period_rows_match_scanning_all_dates(period):
+    calendar = TradingCalendar(DATES)
+
+    for asof in pd.date_range("2024-01-02", "2025-12-31"):
+        assert calendar.period_rows(period, asof) == _expected_rows(period, asof), asof
+
+
+def test_week_spanning_new_year_starts_before_its_monday():
+    calendar = TradingCalendar(DATES)
+
+    start, end = calendar.period_rows("1W", "2025-01-03")
+
+    assert DATES[start] == pd.Timestamp("2024-12-27")
+    assert DATES[end] == pd.Timestamp("2025-01-03")
+
+
+def test_period_without_sessions_yet_is_empty():
+    calendar = TradingCalendar(DATES)
+
+    # 2025-06-01 is a sunday, the month has no sessions up to it
+    start, end = calendar.period_rows("MTD", "2025-06-01")
+
+    assert start == end
+    assert DATES[end] == pd.Timestamp("2025-05-30")
+
+
+def test_unknown_period_is_not_available():
+    calendar = TradingCalendar(DATES)
+
+    with pytest.raises(NotImplementedError):
+        calendar.period_rows("5Y", "2025-01-03")
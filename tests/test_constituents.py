@@ -0,0 +1,128 @@
+from datetime import UTC, datetime, timedelta
+from http import HTTPStatus
+
+import pandas as pd
+import pytest
+import requests
+
+from constituents import CachedComponents, ConstituentsCache
+from providers import YahooGPWProvider
+
+ISIN = "PL9999999995"
+TABLE = pd.DataFrame(
+    {
+        "company": ["ALPHA", "BETA"],
+        "ISIN": ["PLA000000001", "PLB000000002"],
+        "shares_num": [10, 20],
+    },
+)
+HTML = (
+    "<table><tr><th>Company</th><th>ISIN</th><th>Shares</th></tr>"
+    "<tr><td>GAMMA</td><td>PLC000000003</td><td>30</td></tr></table>"
+)
+
+
+def _response(status: int, text: str = "", headers: dict | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = text.encode()  # noqa: SLF001
+    response.encoding = "utf-8"
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeGet:
+    """Stand-in of requests.get answering with queued responses."""
+
+    def __init__(self, responses: list[requests.Response]) -> None:
+        self.responses = responses
+        self.headers: list[dict] = []
+
+    def __call__(self, url: str, headers: dict, timeout: float) -> requests.Response:
+        self.headers.append(headers)
+        return self.responses.pop(0)
+
+
+def _cache(tmp_path, age: timedelta) -> ConstituentsCache:
+    cache = ConstituentsCache(tmp_path)
+    fetched_at = datetime.now(UTC) - age
+    cache.save(ISIN, CachedComponents(TABLE, fetched_at, etag='"v1"', last_modified="Mon"))
+    return cache
+
+
+def _fake_get(monkeypatch, responses: list[requests.Response]) -> FakeGet:
+    get = FakeGet(responses)
+    monkeypatch.setattr("providers.requests.get", get)
+    return get
+
+
+def test_saved_components_are_loaded(tmp_path):
+    cache = _cache(tmp_path, timedelta(0))
+
+    loaded = cache.load(ISIN)
+
+    pd.testing.assert_frame_equal(loaded.table, TABLE)
+    assert (loaded.etag, loaded.last_modified) == ('"v1"', "Mon")
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"components_{ISIN}.csv",
+        f"components_{ISIN}.json",
+    ]
+
+
+def test_table_without_metadata_is_not_loaded(tmp_path):
+    cache = _cache(tmp_path, timedelta(0))
+    (tmp_path / f"components_{ISIN}.json").unlink()
+
+    assert cache.load(ISIN) is None
+
+
+def test_fresh_components_are_not_requested(tmp_path, monkeypatch):
+    _cache(tmp_path, timedelta(hours=1))
+    get = _fake_get(monkeypatch, [])
+
+    table = YahooGPWProvider(cache_dir=tmp_path).get_index_components(ISIN)
+
+    pd.testing.assert_frame_equal(table, TABLE)
+    assert get.headers == []
+
+
+def test_not_modified_components_are_revalidated(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, timedelta(hours=7))
+    get = _fake_get(monkeypatch, [_response(HTTPStatus.NOT_MODIFIED)])
+
+    table = YahooGPWProvider(cache_dir=tmp_path).get_index_components(ISIN)
+
+    pd.testing.assert_frame_equal(table, TABLE)
+    assert get.headers == [{"If-None-Match": '"v1"', "If-Modified-Since": "Mon"}]
+    # revalidated components are fresh again
+    assert cache.load(ISIN).is_fresh(timedelta(hours=1))
+
+
+def test_modified_components_replace_the_cache(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, timedelta(hours=7))
+    _fake_get(monkeypatch, [_response(HTTPStatus.OK, HTML, {"ETag": '"v2"'})])
+
+    table = YahooGPWProvider(cache_dir=tmp_path).get_index_components(ISIN)
+
+    assert table.company.tolist() == ["GAMMA"]
+    loaded = cache.load(ISIN)
+    assert loaded.table.company.tolist() == ["GAMMA"]
+    assert (loaded.etag, loaded.last_modified) == ('"v2"', None)
+
+
+def test_stale_components_are_used_when_download_fails(tmp_path, monkeypatch):
+    _cache(tmp_path, timedelta(days=2))
+    monkeypatch.setattr("providers.time.sleep", lambda seconds: None)
+    _fake_get(monkeypatch, [_response(HTTPStatus.BAD_GATEWAY)] * 2)
+
+    table = YahooGPWProvider(retry=2, cache_dir=tmp_path).get_index_components(ISIN)
+
+    pd.testing.assert_frame_equal(table, TABLE)
+
+
+def test_components_without_cache_fail_loudly(tmp_path, monkeypatch):
+    monkeypatch.setattr("providers.time.sleep", lambda seconds: None)
+    _fake_get(monkeypatch, [_response(HTTPStatus.BAD_GATEWAY)] * 2)
+
+    with pytest.raises(ConnectionError):
+        YahooGPWProvider(retry=2, cache_dir=tmp_path).get_index_components(ISIN)
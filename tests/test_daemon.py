@@ -0,0 +1,122 @@
+import random
+from datetime import date, datetime
+from datetime import time as clock
+
+import pytest
+import pytz
+
+import daemon
+from daemon import BotDaemon, parse_slot
+from planner import PlannedPost, plan_posts
+
+WARSAW = pytz.timezone("Europe/Warsaw")
+
+
+class FakeBot:
+    """Bot recording refreshes and due posts."""
+
+    tzinfo = WARSAW
+    dry_run = True
+    data_loaded = False
+
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.refreshes = 0
+        self.due: list[list[str]] = []
+
+    def refresh(self) -> None:
+        self.refreshes += 1
+        if self.fail:
+            raise SystemExit("no data")
+
+    def post_due(self, due: list[PlannedPost]) -> int:
+        self.due.append([post.period for post in due])
+        return len(due)
+
+
+class Clock:
+    """Warsaw wall clock moved by tests."""
+
+    now = WARSAW.localize(datetime(2025, 3, 31, 8, 0))
+
+    def set(self, hour: int, minute: int) -> None:
+        self.now = WARSAW.localize(datetime(2025, 3, 31, hour, minute))
+
+
+@pytest.fixture
+def wall_clock(monkeypatch) -> Clock:
+    wall_clock = Clock()
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz: object = None) -> datetime:
+            return wall_clock.now
+
+    monkeypatch.setattr(daemon, "datetime", FrozenDatetime)
+    # no random YTD posts
+    monkeypatch.setattr(daemon, "plan_posts", lambda day: plan_posts(day, random.Random(0), 0.0))
+    return wall_clock
+
+
+def _slot(hour: int, minute: int) -> float:
+    return WARSAW.localize(datetime(2025, 3, 31, hour, minute)).timestamp()
+
+
+def test_parse_slot():
+    assert parse_slot("daily=17:30") == ("daily", clock(17, 30))
+    with pytest.raises(ValueError, match="unknown reason"):
+        parse_slot("hourly=17:30")
+
+
+def test_posts_are_queued_once_at_their_slots(wall_clock):
+    # last day of the month and quarter
+    bot = FakeBot()
+    bot_daemon = BotDaemon(bot, slots={"daily": clock(17, 45)}, port=None)
+
+    bot_daemon.tick()
+    assert bot.due == []
+    assert bot_daemon.stats.next_run_at == _slot(17, 45)
+
+    wall_clock.set(17, 46)
+    bot_daemon.tick()
+    assert bot.due == [["1D"]]
+    assert bot_daemon.stats.next_run_at == _slot(17, 50)
+
+    # posts of one slot are queued together after one refresh
+    wall_clock.set(17, 55)
+    bot_daemon.tick()
+    bot_daemon.tick()
+    assert bot.due == [["1D"], ["MTD", "QTD"]]
+    assert bot.refreshes == 2
+    assert bot_daemon.stats.posts_queued == 3
+
+    # plan of tomorrow is made just after midnight
+    assert bot_daemon.stats.next_run_at == WARSAW.localize(
+        datetime.combine(date(2025, 4, 1), clock(0, 0, 1)),
+    ).timestamp()
+
+
+def test_missed_slots_are_run_together(wall_clock):
+    bot = FakeBot()
+    bot_daemon = BotDaemon(bot, port=None)
+
+    wall_clock.set(20, 0)
+    bot_daemon.tick()
+
+    assert bot.due == [["1D", "MTD", "QTD"]]
+
+
+def test_failed_slot_is_not_retried(wall_clock):
+    bot = FakeBot(fail=True)
+    bot_daemon = BotDaemon(bot, port=None)
+
+    wall_clock.set(17, 46)
+    bot_daemon.tick()
+    bot_daemon.tick()
+
+    assert bot.refreshes == 1
+    assert bot_daemon.stats.failures == 1
+    healthy, body = bot_daemon.health()
+    assert not healthy
+    assert body["last_error"] == "SystemExit: no data"
+    assert body["plan"] == ["MTD", "QTD"]
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from downloader import download_history
+
+DATES = pd.bdate_range("2024-01-01", periods=4, tz="Europe/Warsaw", name="Date")
+
+
+def _history(dividends: list[float], splits: list[float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"Close": [10.0, 11.0, 12.0, 13.0], "Dividends": dividends, "Stock Splits": splits},
+        index=DATES,
+    )
+
+
+class FakeTicker:
+    """Stand-in of yfinance.Ticker serving histories by symbol."""
+
+    histories: dict[str, pd.DataFrame] = {}
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+
+    def history(self, **kwargs: object) -> pd.DataFrame:
+        return self.histories[self.symbol]
+
+
+@pytest.fixture
+def fake_ticker(monkeypatch) -> type[FakeTicker]:
+    monkeypatch.setattr("yfinance.Ticker", FakeTicker)
+    return FakeTicker
+
+
+def test_only_splits_are_adjustment_events(fake_ticker):
+    fake_ticker.histories = {
+        "DIV.WA": _history([0, 0, 1.5, 0], [0, 0, 0, 0]),
+        "SPL.WA": _history([0, 0.5, 0, 0], [0, 2.0, 0, 0]),
+    }
+
+    report = download_history({DATES[0]: ["DIV.WA", "SPL.WA"]}, workers=2)
+
+    assert report.succeeded == ["DIV.WA", "SPL.WA"]
+    assert report.events == {"SPL.WA": pd.Timestamp("2024-01-02")}
+    assert report.prices.index.tz is None
+
+
+class FlakyTicker(FakeTicker):
+    """Ticker failing a number of times before serving its history."""
+
+    failures: dict[str, int] = {}
+    calls: dict[str, int] = {}
+
+    def history(self, **kwargs: object) -> pd.DataFrame:
+        self.calls[self.symbol] = self.calls.get(self.symbol, 0) + 1
+        if self.calls[self.symbol] <= self.failures.get(self.symbol, 0):
+            msg = f"{self.symbol}: timed out"
+            raise TimeoutError(msg)
+        return self.histories[self.symbol]
+
+
+@pytest.fixture
+def flaky_ticker(monkeypatch) -> type[FlakyTicker]:
+    monkeypatch.setattr("yfinance.Ticker", FlakyTicker)
+    monkeypatch.setattr("downloader.time.sleep", lambda seconds: None)
+    FlakyTicker.calls = {}
+    return FlakyTicker
+
+
+def test_failed_tickers_are_retried_on_their_own(flaky_ticker):
+    history = _history([0] * 4, [0] * 4)
+    flaky_ticker.histories = {"AAA.WA": history, "BBB.WA": history}
+    flaky_ticker.failures = {"AAA.WA": 2}
+
+    report = download_history({DATES[0]: ["AAA.WA", "BBB.WA"]}, retries=3)
+
+    assert report.succeeded == ["AAA.WA", "BBB.WA"]
+    assert report.failed == {}
+    assert flaky_ticker.calls == {"AAA.WA": 3, "BBB.WA": 1}
+    assert report.prices["AAA.WA"].tolist() == [10.0, 11.0, 12.0, 13.0]
+
+
+def test_ticker_failing_every_try_is_reported(flaky_ticker):
+    flaky_ticker.histories = {"AAA.WA": _history([0] * 4, [0] * 4)}
+    flaky_ticker.failures = {"BAD.WA": 10}
+
+    report = download_history({DATES[0]: ["AAA.WA"], DATES[2]: ["BAD.WA"]}, retries=2)
+
+    assert report.succeeded == ["AAA.WA"]
+    assert list(report.failed) == ["BAD.WA"]
+    assert "timed out" in report.failed["BAD.WA"]
+    assert flaky_ticker.calls["BAD.WA"] == 3
+    assert list(report.prices.columns) == ["AAA.WA"]
+
+
+def test_nothing_downloaded_gives_empty_prices(flaky_ticker):
+    flaky_ticker.failures = {"BAD.WA": 10}
+
+    report = download_history({DATES[0]: ["BAD.WA"]}, retries=0)
+
+    assert report.prices.empty
+    assert list(report.failed) == ["BAD.WA"]
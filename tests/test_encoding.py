@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from encoding import MIN_QUALITY, ImageEncoder, Variant, encode_variant
+
+
+def _noise(width: int = 400, height: int = 300) -> Image.Image:
+    """Smooth noise, palettes and JPEG compress it far worse than heatmaps."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (height // 4, width // 4, 3), dtype=np.uint8)
+    return Image.fromarray(pixels).resize((width, height), Image.Resampling.BICUBIC)
+
+
+def _flat(width: int = 400, height: int = 300) -> Image.Image:
+    image = Image.new("RGB", (width, height), (26, 26, 26))
+    image.paste((0, 204, 0), (0, 0, width // 2, height))
+    return image
+
+
+def test_flat_image_is_palette_png():
+    fmt, colors, data = encode_variant(_flat(), Variant("upload", budget=100_000))
+
+    assert (fmt, colors) == ("png", 256)
+    assert len(data) <= 100_000
+
+
+def test_noisy_image_searches_quality_fitting_budget():
+    image = _noise()
+    fmt, quality, data = encode_variant(image, Variant("upload", budget=50_000))
+    _, _, jpeg = encode_variant(image, Variant("upload", budget=50_000, fmt="jpeg"))
+
+    assert fmt == "jpeg"
+    assert MIN_QUALITY < quality < 95
+    assert len(data) <= 50_000
+    assert data == jpeg
+
+
+def test_archive_png_is_lossless(tmp_path):
+    source = tmp_path / "map.png"
+    _noise().save(source)
+    archive = ImageEncoder((Variant("archive", fmt="png"),))
+
+    (result,) = archive.encode([str(source)]).results
+
+    assert result.path == str(tmp_path / "map.archive.png")
+    with Image.open(result.path) as encoded, Image.open(source) as original:
+        assert np.array_equal(np.asarray(encoded), np.asarray(original))
+
+
+def test_variants_of_sources_are_in_order(tmp_path):
+    sources = []
+    for name, image in (("a.png", _flat(800, 450)), ("b.png", _noise(800, 450).convert("RGBA"))):
+        image.save(tmp_path / name)
+        sources.append(str(tmp_path / name))
+    encoder = ImageEncoder((Variant("upload", budget=10_000), Variant("thumb", width=200)))
+
+    report = encoder.encode(sources)
+
+    assert [(r.source, r.variant) for r in report.results] == [
+        (sources[0], "upload"),
+        (sources[0], "thumb"),
+        (sources[1], "upload"),
+        (sources[1], "thumb"),
+    ]
+    # noise does not fit a small budget even at the lowest quality
+    assert [r.fits for r in report.results] == [True, True, False, True]
+    assert report.results[2].setting == MIN_QUALITY
+    with Image.open(report.paths("thumb")[1]) as thumbnail:
+        assert thumbnail.size == (200, 112)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="format gif not available"):
+        ImageEncoder((Variant("upload", fmt="gif"),))
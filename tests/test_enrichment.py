@@ -0,0 +1,92 @@
+import json
+from datetime import UTC, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from enrichment import Enricher, SymbolCache
+from providers import ReplayProvider
+
+
+class CountingProvider(ReplayProvider):
+    """Replay provider counting symbol searches."""
+
+    def __init__(self, path) -> None:
+        super().__init__(path)
+        self.searched: list[str] = []
+
+    def search_symbol(self, query: str) -> str:
+        self.searched.append(query)
+        return super().search_symbol(query)
+
+
+@pytest.fixture
+def provider(tmp_path) -> CountingProvider:
+    (tmp_path / "symbols.json").write_text(json.dumps({"PLA000000001": "AAA.WA"}))
+    (tmp_path / "profiles.json").write_text(
+        json.dumps({"AAA.WA": {"sector": "Banks", "industry": "Banks"}}),
+    )
+    return CountingProvider(tmp_path)
+
+
+def _components() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "company": ["ALPHA", "NEW"],
+            "ISIN": ["PLA000000001", "PLN000000009"],
+            "yf_ticker": [None, None],
+            "sector": [None, None],
+            "industry": [None, None],
+        },
+    )
+
+
+def _age(cache: SymbolCache, isin: str, age: timedelta) -> None:
+    resolved_at = (datetime.now(UTC) - age).isoformat()
+    for field in list(cache.entries[isin]):
+        if field.endswith("_resolved_at"):
+            cache.entries[isin][field] = resolved_at
+
+
+def test_missing_ticker_is_not_searched_again_before_negative_ttl(provider, tmp_path):
+    cache = SymbolCache(tmp_path / "cache.json", negative_ttl=timedelta(days=7))
+    enricher = Enricher(provider, cache, workers=2)
+
+    enriched = enricher.enrich(_components())
+    _age(cache, "PLN000000009", timedelta(days=6))
+    enricher.enrich(_components())
+
+    assert sorted(provider.searched) == ["PLA000000001", "PLN000000009"]
+    assert enriched.yf_ticker.tolist()[0] == "AAA.WA"
+    assert pd.isna(enriched.yf_ticker[1])
+    assert enriched.sector.tolist()[0] == "Banks"
+
+
+def test_missing_ticker_is_searched_again_after_negative_ttl(provider, tmp_path):
+    cache = SymbolCache(tmp_path / "cache.json", negative_ttl=timedelta(days=7))
+    enricher = Enricher(provider, cache)
+
+    enricher.enrich(_components())
+    for isin in cache.entries:
+        _age(cache, isin, timedelta(days=8))
+    enricher.enrich(_components())
+
+    # found tickers do not expire
+    assert sorted(provider.searched) == ["PLA000000001", "PLN000000009", "PLN000000009"]
+
+
+def test_cache_is_saved_and_loaded(provider, tmp_path):
+    Enricher(provider, SymbolCache(tmp_path / "cache.json")).enrich(_components())
+
+    cache = SymbolCache(tmp_path / "cache.json")
+
+    assert cache.get("PLA000000001", "ticker") == (True, "AAA.WA")
+    assert cache.get("PLA000000001", "industry") == (True, "Banks")
+    assert cache.get("PLN000000009", "ticker") == (True, None)
+    assert cache.get("PLZ000000000", "ticker") == (False, None)
+
+
+def test_corrupted_cache_starts_from_scratch(tmp_path):
+    (tmp_path / "cache.json").write_text("{not json")
+
+    assert SymbolCache(tmp_path / "cache.json").entries == {}
@@ -0,0 +1,99 @@
+import json
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import Tracer, count, summary, traced
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path) -> Tracer:
+    tracer = Tracer(tmp_path / "report.jsonl", tmp_path / "bot.prom")
+    monkeypatch.setattr(instrumentation, "TRACER", tracer)
+    return tracer
+
+
+def test_nested_spans_know_their_parent(tracer):
+    with tracer.span("run"), tracer.span("download") as download:
+        download.count("rows", 10)
+        count("rows", 5)
+
+    spans = tracer.flush()
+
+    assert [(s.name, s.parent) for s in spans] == [("download", "run"), ("run", None)]
+    assert spans[0].counters == {"rows": 15}
+    assert all(s.wall >= 0 and s.error is None for s in spans)
+
+
+def test_error_of_span_is_recorded(tracer):
+    with pytest.raises(ValueError, match="no data"), tracer.span("load"):
+        raise ValueError("no data")
+
+    (span,) = tracer.flush()
+
+    assert span.error == "ValueError: no data"
+
+
+def test_spans_of_threads_do_not_nest(tracer):
+    @traced("encode")
+    def encode() -> None:
+        count("image_bytes", 100)
+
+    with tracer.span("render"):
+        thread = threading.Thread(target=encode)
+        thread.start()
+        thread.join()
+
+    spans = tracer.flush()
+
+    assert [(s.name, s.parent, s.counters) for s in spans] == [
+        ("encode", None, {"image_bytes": 100}),
+        ("render", None, {}),
+    ]
+
+
+def test_flush_writes_report_and_textfile(tracer):
+    with tracer.span("render") as render:
+        render.count("image_bytes", 2048)
+    run_id = tracer.run_id
+
+    tracer.flush()
+    tracer.flush()
+
+    (line,) = tracer.report.read_text().splitlines()
+    record = json.loads(line)
+    assert (record["run_id"], record["name"], record["counters"]) == (
+        run_id,
+        "render",
+        {"image_bytes": 2048},
+    )
+    # textfile of the last run, which had no spans
+    textfile = tracer.prometheus.read_text()
+    assert "twitter_bot_stage_wall_seconds" not in textfile
+    assert "twitter_bot_peak_rss_bytes" in textfile
+
+
+def test_textfile_aggregates_spans_by_stage(tracer):
+    for _ in range(3):
+        with tracer.span("encode") as encode:
+            encode.count("image_bytes", 10)
+
+    spans = tracer.flush()
+
+    textfile = tracer.prometheus.read_text()
+    assert 'twitter_bot_stage_calls{stage="encode"} 3' in textfile
+    assert 'twitter_bot_stage_image_bytes{stage="encode"} 30' in textfile
+    (line,) = summary(spans)
+    assert line.startswith("encode x3: ")
+    assert line.endswith(", image_bytes 30")
+
+
+def test_only_outermost_stage_is_profiled(tmp_path):
+    tracer = Tracer(profile_dir=tmp_path / "profiles")
+
+    with tracer.span("run"), tracer.span("render"):
+        sum(range(1000))
+
+    (dump,) = (tmp_path / "profiles").iterdir()
+    assert dump.name.endswith("-run.prof")
@@ -0,0 +1,63 @@
+import numpy as np
+
+from layout_cache import LayoutCache, structure_key
+
+TICKERS = np.array(["AAA", "BBB", "CCC", "DDD"])
+SECTORS = np.array(["Banks", "Banks", "Energy", "Retail"])
+MKT_CAP = np.array([400.0, 300.0, 200.0, 100.0])
+
+
+def test_key_does_not_depend_on_order():
+    order = [2, 0, 3, 1]
+
+    assert structure_key(TICKERS, SECTORS, 800, 450) == structure_key(
+        TICKERS[order],
+        SECTORS[order],
+        800,
+        450,
+    )
+    assert structure_key(TICKERS, SECTORS, 800, 450) != structure_key(TICKERS, SECTORS, 1600, 900)
+
+
+def test_layout_is_reused_within_tolerance():
+    cache = LayoutCache(directory=None, tolerance=0.01)
+    layout = cache.get(TICKERS, SECTORS, MKT_CAP, 800, 450)
+
+    # 0.5% of market cap moved from AAA to DDD
+    drifted = MKT_CAP + np.array([-5.0, 0.0, 0.0, 5.0])
+
+    assert cache.get(TICKERS, SECTORS, drifted, 800, 450) is layout
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_layout_is_computed_again_beyond_tolerance():
+    cache = LayoutCache(directory=None, tolerance=0.01)
+    layout = cache.get(TICKERS, SECTORS, MKT_CAP, 800, 450)
+
+    # 2% of market cap moved from AAA to DDD
+    drifted = MKT_CAP + np.array([-20.0, 0.0, 0.0, 20.0])
+    relaid = cache.get(TICKERS, SECTORS, drifted, 800, 450)
+
+    assert relaid is not layout
+    assert (cache.hits, cache.misses) == (0, 2)
+    # the new layout is the reference of later drift
+    assert cache.get(TICKERS, SECTORS, drifted, 800, 450) is relaid
+
+
+def test_layout_is_loaded_from_disk(tmp_path):
+    layout = LayoutCache(tmp_path).get(TICKERS, SECTORS, MKT_CAP, 800, 450)
+
+    cache = LayoutCache(tmp_path)
+    loaded = cache.get(TICKERS, SECTORS, MKT_CAP, 800, 450)
+
+    assert (cache.hits, cache.misses) == (1, 0)
+    np.testing.assert_array_equal(loaded.ticker_rects, layout.ticker_rects)
+    assert loaded.tickers.tolist() == layout.tickers.tolist()
+
+
+def test_only_newest_layouts_are_kept_on_disk(tmp_path):
+    cache = LayoutCache(tmp_path, max_files=2)
+    for width in (800, 900, 1000):
+        cache.get(TICKERS, SECTORS, MKT_CAP, width, 450)
+
+    assert len(list(tmp_path.glob("*.npz"))) == 2
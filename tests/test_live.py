@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from live import LIVE_BOUND, LiveHeatmap, color_bins
+
+N_COMPONENTS = 40
+
+
+@pytest.fixture
+def heatmap() -> LiveHeatmap:
+    rng = np.random.default_rng(0)
+    components = pd.DataFrame(
+        {
+            "yf_ticker": [f"T{i:02d}.WA" for i in range(N_COMPONENTS)],
+            "ticker": [f"T{i:02d}" for i in range(N_COMPONENTS)],
+            "sector": rng.choice(["Banks", "Energy", None], N_COMPONENTS),
+            "company": [f"COMPANY{i}" for i in range(N_COMPONENTS)],
+            "shares_num": rng.integers(1, 100, N_COMPONENTS) * 1e6,
+        },
+    )
+    return LiveHeatmap("WIG", components, rng.uniform(10, 100, N_COMPONENTS))
+
+
+def _changed(heatmap: LiveHeatmap, rendered_bins: np.ndarray) -> float:
+    """Share of market cap at the previous close whose colour bin changed."""
+    prev_cap = heatmap.prev_close * heatmap.shares
+    return prev_cap[heatmap.bins != rendered_bins].sum() / prev_cap.sum()
+
+
+def test_color_bins():
+    returns = np.array([0.0, 0.0015, -0.0015, 0.03, -0.5, np.nan])
+
+    np.testing.assert_array_equal(color_bins(returns, LIVE_BOUND), [0, 0, 0, 10, -10, 0])
+    np.testing.assert_array_equal(color_bins([0.0046], LIVE_BOUND), [2])
+
+
+def test_changed_share_follows_ticks(heatmap):
+    rng = np.random.default_rng(1)
+    rendered_bins = heatmap.bins.copy()
+    for tick in range(200):
+        symbols = rng.choice(heatmap.symbols, 5, replace=False)
+        positions = [int(symbol[1:3]) for symbol in symbols]
+        prices = heatmap.prices[positions] * np.exp(rng.normal(0, 0.01, 5))
+        heatmap.update(dict(zip(symbols, prices, strict=True)))
+
+        assert heatmap.changed == pytest.approx(_changed(heatmap, rendered_bins), abs=1e-9)
+        if tick % 50 == 49:
+            heatmap.spec("title", "subtitle", ("", "", ""))
+            rendered_bins = heatmap.bins.copy()
+            assert heatmap.changed == 0
+
+    assert heatmap.ticks == 200 * 5
+
+
+def test_returns_and_market_caps_of_quotes(heatmap):
+    price = heatmap.prev_close[3] * 1.02
+
+    applied = heatmap.update({"T03.WA": price, "UNKNOWN.WA": 10.0, "T04.WA": 0.0})
+
+    assert applied == 1
+    assert heatmap.returns[3] == pytest.approx(0.02)
+    assert heatmap.mkt_cap[3] == pytest.approx(price * heatmap.shares[3])
+    assert heatmap.prices[4] == heatmap.prev_close[4]
+    prev_cap = heatmap.prev_close * heatmap.shares
+    assert heatmap.index_return == pytest.approx(0.02 * prev_cap[3] / prev_cap.sum())
+
+
+def test_moving_back_to_rendered_colour_is_not_a_change(heatmap):
+    close = heatmap.prev_close[0]
+
+    heatmap.update({"T00.WA": close * 1.02})
+    assert heatmap.changed > 0
+
+    heatmap.update({"T00.WA": close})
+    assert heatmap.changed == pytest.approx(0)
@@ -0,0 +1,131 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+from tweepy.errors import Forbidden, TooManyRequests
+
+from outbox import Outbox, PostingWorker, TokenBucket
+
+
+def _response(status_code: int, body: dict, headers: dict | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = "error"
+    response._content = json.dumps(body).encode()  # noqa: SLF001
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeTwitter:
+    """Client and API answering with queued errors before succeeding."""
+
+    def __init__(self, errors: list[Exception] | None = None) -> None:
+        self.errors = list(errors or [])
+        self.uploads: list[str] = []
+        self.tweets: list[dict] = []
+
+    def media_upload(self, filename: str) -> SimpleNamespace:
+        self.uploads.append(filename)
+        return SimpleNamespace(media_id_string=str(len(self.uploads)))
+
+    def create_tweet(self, text: str, media_ids: list[str] | None) -> SimpleNamespace:
+        if self.errors:
+            raise self.errors.pop(0)
+        self.tweets.append({"text": text, "media_ids": media_ids})
+        return SimpleNamespace(data={"id": str(len(self.tweets))})
+
+
+@pytest.fixture
+def outbox(tmp_path) -> Outbox:
+    media = tmp_path / "1d_map.png"
+    media.write_bytes(b"png")
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    outbox.add("2025-03-14/WIG/1D", "WIG today", [str(media)])
+    return outbox
+
+
+def _worker(outbox: Outbox, twitter: FakeTwitter, max_attempts: int = 8) -> PostingWorker:
+    return PostingWorker(
+        outbox,
+        lambda: (twitter, twitter),
+        bucket=TokenBucket(rate=1000, capacity=1000),
+        max_attempts=max_attempts,
+        backoff=0,
+    )
+
+
+def test_added_key_is_not_added_again(outbox, tmp_path):
+    media = tmp_path / "again.png"
+    media.write_bytes(b"png")
+
+    assert not outbox.add("2025-03-14/WIG/1D", "WIG again", [str(media)])
+    assert media.exists()
+    assert outbox.counts() == {"pending": 1, "posted": 0, "failed": 0}
+
+
+def test_post_is_made_once(outbox):
+    twitter = FakeTwitter()
+    worker = _worker(outbox, twitter)
+
+    assert worker.drain() == 1
+    assert worker.drain() == 0
+    assert twitter.tweets == [{"text": "WIG today", "media_ids": ["1"]}]
+    assert outbox.counts() == {"pending": 0, "posted": 1, "failed": 0}
+    assert not any(outbox.spool.iterdir())
+
+
+def test_failed_post_is_retried_without_uploading_media_again(outbox):
+    twitter = FakeTwitter([ConnectionError("reset by peer")])
+    worker = _worker(outbox, twitter)
+
+    assert worker.drain() == 0
+    assert outbox.counts()["pending"] == 1
+    (post,) = outbox.due()
+    assert post.attempts == 1
+
+    assert worker.drain() == 1
+    assert len(twitter.uploads) == 1
+    assert twitter.tweets == [{"text": "WIG today", "media_ids": ["1"]}]
+
+
+def test_post_is_given_up_after_max_attempts(outbox):
+    twitter = FakeTwitter([ConnectionError("reset by peer")] * 2)
+    worker = _worker(outbox, twitter, max_attempts=2)
+
+    worker.drain()
+    worker.drain()
+
+    assert outbox.counts() == {"pending": 0, "posted": 0, "failed": 1}
+    assert twitter.tweets == []
+
+
+def test_rate_limited_post_waits_for_reset(outbox):
+    reset = time.time() + 120
+    limited = TooManyRequests(_response(429, {}, {"x-rate-limit-reset": str(int(reset))}))
+    worker = _worker(outbox, FakeTwitter([limited]))
+
+    assert worker.drain() == 0
+
+    assert outbox.due() == []
+    assert outbox.next_attempt() == pytest.approx(reset, abs=2)
+    assert worker.bucket._paused_until > time.monotonic() + 100  # noqa: SLF001
+
+
+def test_rejected_post_is_given_up(outbox):
+    rejected = Forbidden(_response(403, {"detail": "You are not permitted to perform this."}))
+    worker = _worker(outbox, FakeTwitter([rejected]))
+
+    assert worker.drain() == 0
+    assert outbox.counts() == {"pending": 0, "posted": 0, "failed": 1}
+
+
+def test_duplicate_of_earlier_attempt_is_posted(outbox):
+    duplicate = Forbidden(
+        _response(403, {"detail": "You are not allowed to create a Tweet with duplicate content."}),
+    )
+    worker = _worker(outbox, FakeTwitter([duplicate]))
+
+    assert worker.drain() == 1
+    assert outbox.counts() == {"pending": 0, "posted": 1, "failed": 0}
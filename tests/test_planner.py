@@ -0,0 +1,56 @@
+import random
+from datetime import date
+
+from planner import PlannedPost, easter_sunday, is_trading_day, plan_posts
+
+
+def _plan(day: date, ytd_probability: float = 0.0) -> list[PlannedPost]:
+    return plan_posts(day, random.Random(0), ytd_probability)
+
+
+def test_easter_sunday():
+    assert easter_sunday(2024) == date(2024, 3, 31)
+    assert easter_sunday(2025) == date(2025, 4, 20)
+
+
+def test_holidays_are_not_trading_days():
+    assert not is_trading_day(date(2025, 4, 21))  # Easter Monday
+    assert not is_trading_day(date(2025, 6, 19))  # Corpus Christi
+    assert not is_trading_day(date(2018, 11, 12))  # one-off closure
+    assert is_trading_day(date(2025, 4, 22))
+
+
+def test_daily_post_on_trading_day():
+    assert _plan(date(2025, 3, 12)) == [PlannedPost("1D", "daily")]
+
+
+def test_nothing_on_holiday():
+    assert _plan(date(2025, 4, 21)) == []
+
+
+def test_weekly_post_on_saturday():
+    assert _plan(date(2025, 3, 15)) == [PlannedPost("1W", "weekly")]
+
+
+def test_month_and_quarter_end():
+    assert _plan(date(2025, 3, 31)) == [
+        PlannedPost("1D", "daily"),
+        PlannedPost("MTD", "monthly"),
+        PlannedPost("QTD", "quarterly"),
+    ]
+
+
+def test_year_end_posts_ytd_once():
+    # new year's eve has no session and is a wednesday
+    assert _plan(date(2025, 12, 31), ytd_probability=1.0) == [
+        PlannedPost("MTD", "monthly"),
+        PlannedPost("QTD", "quarterly"),
+        PlannedPost("YTD", "yearly"),
+    ]
+
+
+def test_random_ytd_post():
+    assert _plan(date(2025, 3, 12), ytd_probability=1.0) == [
+        PlannedPost("1D", "daily"),
+        PlannedPost("YTD", "random ytd"),
+    ]
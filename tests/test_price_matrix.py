@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from price_matrix import PriceMatrix, decode, encode
+
+
+def _matrix() -> PriceMatrix:
+    prices = pd.DataFrame(
+        {
+            "AAA": [np.nan, 10.0, np.nan, 12.0],
+            "BBB": [5.0, np.nan, np.nan, 6.0],
+            "CCC": [np.nan, np.nan, np.nan, 7.0],
+        },
+        index=pd.bdate_range("2025-01-06", periods=4, name="Date"),
+    )
+    return PriceMatrix.from_frame(prices)
+
+
+def test_fill_matches_ffill_then_bfill():
+    matrix = _matrix()
+    expected = matrix.to_frame().ffill().bfill()
+
+    matrix.fill()
+
+    np.testing.assert_array_equal(matrix.values, expected.to_numpy())
+
+
+def test_codes_of_tickers():
+    matrix = _matrix()
+
+    np.testing.assert_array_equal(matrix.codes(["CCC", "AAA", "MISSING"]), [2, 0, -1])
+
+
+def test_saved_matrix_is_mapped_back(tmp_path):
+    matrix = _matrix()
+    matrix.save(tmp_path / "matrix")
+
+    loaded = PriceMatrix.load(tmp_path / "matrix")
+
+    assert isinstance(loaded.values, np.memmap)
+    np.testing.assert_array_equal(loaded.values, matrix.values)
+    np.testing.assert_array_equal(loaded.dates, matrix.dates)
+    assert loaded.tickers.tolist() == ["AAA", "BBB", "CCC"]
+
+
+def test_mapped_matrix_is_filled_in_a_copy(tmp_path):
+    _matrix().save(tmp_path / "matrix")
+    loaded = PriceMatrix.load(tmp_path / "matrix")
+
+    loaded.fill()
+
+    assert not np.isnan(loaded.values).any()
+    # the saved matrix is not changed
+    assert np.isnan(np.load(tmp_path / "matrix" / "values.npy")).any()
+
+
+def test_decode_missing_codes():
+    codes, categories = encode(pd.Series(["Banks", None, "Energy", "Banks"]))
+
+    np.testing.assert_array_equal(codes, [0, -1, 1, 0])
+    assert decode(codes, categories).tolist()[::2] == ["Banks", "Energy"]
+    assert pd.isna(decode(codes, categories)[1])
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from price_store import PriceStore
+
+
+def _prices(values: dict[str, list[float]], start: str = "2024-01-01") -> pd.DataFrame:
+    length = len(next(iter(values.values())))
+    return pd.DataFrame(values, index=pd.bdate_range(start, periods=length, name="Date"))
+
+
+def test_missing_starts_downloads_the_bar_before_the_last_one(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0, 13.0]})
+    store.merge(prices, ["AAA.WA"], prices.index[0])
+
+    starts = store.missing_starts(["AAA.WA", "NEW.WA"], prices.index[0])
+
+    assert starts == {prices.index[2]: ["AAA.WA"], prices.index[0]: ["NEW.WA"]}
+
+
+def test_unchanged_history_is_not_adjusted(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0, 13.0]})
+    store.merge(prices, ["AAA.WA"], prices.index[0])
+
+    # the last bar was stored before the end of its session
+    new = _prices({"AAA.WA": [12.0, 13.5, 14.0]}, start="2024-01-03")
+
+    assert store.adjusted(new) == {}
+
+
+def test_split_adjusted_history_is_downloaded_again(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0, 13.0], "BBB.WA": [5.0, 5.0, 5.0, 5.0]})
+    store.merge(prices, ["AAA.WA", "BBB.WA"], prices.index[0])
+
+    new = _prices({"AAA.WA": [6.0, 6.5, 7.0], "BBB.WA": [5.0, 5.0, 5.0]}, start="2024-01-03")
+    adjusted = store.adjusted(new)
+
+    assert adjusted == {prices.index[0]: ["AAA.WA"]}
+
+    store.merge(new.drop(columns="AAA.WA"), ["BBB.WA"], prices.index[0])
+    full = _prices({"AAA.WA": [5.0, 5.5, 6.0, 6.5, 7.0]})
+    store.replace(full, ["AAA.WA"], adjusted)
+
+    window = store.window(["AAA.WA", "BBB.WA"], prices.index[0])
+    assert window["AAA.WA"].to_list() == [5.0, 5.5, 6.0, 6.5, 7.0]
+    assert window["BBB.WA"].to_list() == [5.0] * 5
+    assert store.fetched_from["AAA.WA"] == prices.index[0]
+    assert store.fetched["AAA.WA"] == full.index[-1]
+
+
+def test_split_after_the_last_stored_bar_is_an_adjustment(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0]})
+    store.merge(prices, ["AAA.WA"], prices.index[0])
+
+    new = _prices({"AAA.WA": [11.0, 12.0, 6.5]}, start="2024-01-02")
+
+    assert store.adjusted(new, {"AAA.WA": new.index[-1]}) == {prices.index[0]: ["AAA.WA"]}
+    assert store.adjusted(new, {"AAA.WA": prices.index[0]}) == {}
+
+
+def test_failed_download_keeps_stored_history(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0]})
+    store.merge(prices, ["AAA.WA"], prices.index[0])
+
+    store.replace(pd.DataFrame(), [], {prices.index[0]: ["AAA.WA"]})
+    store.save()
+
+    reloaded = PriceStore(tmp_path / "prices.pkl")
+    assert reloaded.window(["AAA.WA"], prices.index[0])["AAA.WA"].to_list() == [10.0, 11.0, 12.0]
+    assert reloaded.fetched["AAA.WA"] == prices.index[-1]
+
+
+def test_suspended_symbol_is_fetched_from_its_own_last_bar(tmp_path):
+    store = PriceStore(tmp_path / "prices.pkl")
+    prices = _prices({"AAA.WA": [10.0, 11.0, 12.0, 13.0], "SUS.WA": [5.0, 5.1, None, None]})
+    store.merge(prices, ["AAA.WA", "SUS.WA"], prices.index[0])
+
+    assert store.fetched == {"AAA.WA": prices.index[3], "SUS.WA": prices.index[1]}
+    starts = store.missing_starts(["AAA.WA", "SUS.WA"], prices.index[0])
+    assert starts == {prices.index[2]: ["AAA.WA"], prices.index[0]: ["SUS.WA"]}
+
+    # a download without new bars does not move the last bar back
+    store.merge(_prices({"AAA.WA": [14.0], "SUS.WA": [None]}, start="2024-01-05"), ["SUS.WA"])
+    assert store.fetched["SUS.WA"] == prices.index[1]
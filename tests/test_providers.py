@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from downloader import DownloadReport
+from providers import MarketDataProvider, RecordingProvider, ReplayProvider
+
+ISIN = "PL9999999995"
+DATES = pd.bdate_range("2025-01-06", periods=4, name="Date")
+PRICES = pd.DataFrame(
+    {"AAA.WA": [10.0, 11.0, 12.0, 13.0], "BBB.WA": [5.0, 5.5, 6.0, 6.5]},
+    index=DATES,
+)
+COMPONENTS = pd.DataFrame(
+    {"company": ["ALPHA", "BETA"], "ISIN": ["PLA000000001", "PLB000000002"], "shares_num": [1, 2]},
+)
+
+
+class FakeProvider(MarketDataProvider):
+    """Provider serving constant data from memory."""
+
+    def get_history(self, starts: dict[pd.Timestamp, list[str]]) -> DownloadReport:
+        symbols = [symbol for symbols in starts.values() for symbol in symbols]
+        return DownloadReport(prices=PRICES[symbols], succeeded=symbols)
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:
+        return {symbol: 20.0 for symbol in symbols}
+
+    def get_index_components(self, isin: str) -> pd.DataFrame:
+        return COMPONENTS
+
+    def search_symbol(self, query: str) -> str:
+        return {"PLA000000001": "AAA.WA", "PLB000000002": "BBB.WA"}[query]
+
+    def get_asset_profiles(self, symbols: list[str]) -> dict[str, dict | None]:
+        return {"AAA.WA": {"sector": "Banks", "industry": "Banks"}, "BBB.WA": None}
+
+
+@pytest.fixture
+def recorded(tmp_path) -> ReplayProvider:
+    recording = RecordingProvider(FakeProvider(), tmp_path)
+    recording.get_history({DATES[0]: ["AAA.WA"]})
+    recording.get_history({DATES[0]: ["BBB.WA"]})
+    recording.get_quotes(["AAA.WA"])
+    recording.get_index_components(ISIN)
+    recording.search_symbol("PLA000000001")
+    recording.search_symbol("PLB000000002")
+    recording.get_asset_profiles(["AAA.WA", "BBB.WA"])
+    return ReplayProvider(tmp_path)
+
+
+def test_replayed_history_matches_recorded(recorded):
+    report = recorded.get_history({DATES[0]: ["AAA.WA"], DATES[2]: ["BBB.WA", "CCC.WA"]})
+
+    pd.testing.assert_series_equal(report.prices["AAA.WA"], PRICES["AAA.WA"], check_freq=False)
+    assert report.prices["BBB.WA"].dropna().tolist() == [6.0, 6.5]
+    assert report.succeeded == ["AAA.WA", "BBB.WA"]
+    assert report.failed == {"CCC.WA": "symbol not recorded"}
+
+
+def test_replayed_lookups_match_recorded(recorded):
+    assert recorded.get_quotes(["AAA.WA", "BBB.WA"]) == {"AAA.WA": 20.0}
+    pd.testing.assert_frame_equal(recorded.get_index_components(ISIN), COMPONENTS)
+    assert recorded.search_symbol("PLB000000002") == "BBB.WA"
+    assert recorded.get_asset_profiles(["AAA.WA", "BBB.WA", "CCC.WA"]) == {
+        "AAA.WA": {"sector": "Banks", "industry": "Banks"},
+        "BBB.WA": None,
+        "CCC.WA": None,
+    }
+
+
+def test_symbol_not_recorded_fails_loudly(recorded):
+    with pytest.raises(ValueError, match="not recorded"):
+        recorded.search_symbol("PLC000000003")
@@ -0,0 +1,68 @@
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from render import HeatmapRenderer
+from treemap import HeatmapSpec
+
+SIZE = (640, 360)
+
+
+def _spec(returns: list[float]) -> HeatmapSpec:
+    return HeatmapSpec(
+        tickers=np.array(["AAA", "BBB", "CCC"]),
+        sectors=np.array(["Banks", "Banks", "Energy"]),
+        mkt_cap=np.array([300.0, 200.0, 100.0]),
+        returns=np.array(returns),
+        prices=np.array([10.0, 20.0, 30.0]),
+        bound=0.03,
+        title="WIG Index",
+        subtitle="1D",
+        footer=("", "", ""),
+        width=SIZE[0],
+        height=SIZE[1],
+    )
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="backend svg not available"):
+        HeatmapRenderer(backend="svg")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_is_rendered_in_order_with_one_layout(tmp_path, workers):
+    renderer = HeatmapRenderer(workers, backend="native")
+    jobs = [(_spec([r, -r, 0.0]), str(tmp_path / f"{i}.png")) for i, r in enumerate([0.01, 0.02])]
+
+    try:
+        results = renderer.render(jobs)
+    finally:
+        renderer.close()
+
+    assert [result.path for result in results] == [path for _, path in jobs]
+    assert [result.size for result in results] == [
+        Path(path).stat().st_size for _, path in jobs
+    ]
+    assert (renderer.layouts.hits, renderer.layouts.misses) == (1, 1)
+    with Image.open(results[0].path) as image:
+        assert image.size == SIZE
+
+
+def test_frames_are_in_order_of_specs():
+    renderer = HeatmapRenderer(2, backend="native")
+    specs = [_spec([r, 0.0, -r]) for r in (0.0, 0.01, 0.02, 0.03)]
+    layout = renderer.layouts.get(specs[0].tickers, specs[0].sectors, specs[0].mkt_cap, *SIZE)
+    specs = [replace(spec, layout=layout) for spec in specs]
+
+    try:
+        frames = list(renderer.frames(iter(specs), window=2))
+    finally:
+        renderer.close()
+
+    single = HeatmapRenderer(backend="native")
+    assert frames == list(single.frames(specs))
+    assert all(len(frame) == SIZE[0] * SIZE[1] * 3 for frame in frames)
+    assert len(set(frames)) == len(specs)
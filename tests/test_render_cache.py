@@ -0,0 +1,57 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from render_cache import RenderCache, heatmap_key
+
+
+@pytest.fixture
+def image(tmp_path) -> str:
+    path = tmp_path / "render.png"
+    path.write_bytes(b"x" * 100)
+    return str(path)
+
+
+def _put(cache: RenderCache, key: str, image: str, age: float) -> None:
+    cache.put(key, image, f"text of {key}")
+    used = time.time() - age
+    os.utime(cache.directory / f"{key}.png", (used, used))
+
+
+def test_key_depends_on_data_and_params():
+    data = pd.DataFrame({"ticker": ["AAA", "BBB"], "returns": [0.01, -0.02]})
+
+    key = heatmap_key(data, period="1D")
+
+    assert heatmap_key(data.copy(), period="1D") == key
+    assert heatmap_key(data, period="1W") != key
+    assert heatmap_key(data.assign(returns=[0.01, -0.03]), period="1D") != key
+
+
+def test_cached_image_is_copied_with_its_text(tmp_path, image):
+    cache = RenderCache(tmp_path / "renders")
+    cache.put("key", image, "WIG zł")
+
+    assert cache.get("key", str(tmp_path / "copy.png")) == "WIG zł"
+    assert (tmp_path / "copy.png").read_bytes() == b"x" * 100
+    assert cache.get("missing", str(tmp_path / "none.png")) is None
+
+
+def test_least_recently_used_images_are_evicted(tmp_path, image):
+    cache = RenderCache(tmp_path / "renders", max_bytes=250)
+    _put(cache, "old", image, age=300)
+    _put(cache, "used", image, age=200)
+    # using the older image makes it the most recent
+    cache.get("old", str(tmp_path / "copy.png"))
+
+    _put(cache, "new", image, age=0)
+
+    assert sorted(path.name for path in cache.directory.iterdir()) == [
+        "new.json",
+        "new.png",
+        "old.json",
+        "old.png",
+    ]
+    assert cache.get("used", str(tmp_path / "copy.png")) is None
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calendar_index import TradingCalendar
+from price_matrix import PriceMatrix
+from returns import ReturnsEngine
+
+PERIODS = ["1D", "1W", "MTD", "QTD", "YTD", "1Y"]
+ASOF = pd.Timestamp("2025-03-14")
+
+
+@pytest.fixture
+def market() -> tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2023-06-01", ASOF, name="Date")
+    tickers = [f"T{i:02d}" for i in range(30)]
+    steps = rng.normal(0, 0.02, (len(dates), len(tickers)))
+    prices = pd.DataFrame(100 * np.exp(steps.cumsum(axis=0)), index=dates, columns=tickers)
+    index = prices.mean(axis=1).rename("WIG")
+    components = pd.DataFrame(
+        {
+            "company": [f"COMPANY{i}" for i in range(len(tickers))],
+            "ISIN": [f"PLSYN{i:07d}" for i in range(len(tickers))],
+            "yf_ticker": [f"{ticker}.WA" for ticker in tickers],
+            "sector": rng.choice(["Banks", "Energy", "Retail"], len(tickers)),
+            "industry": rng.choice(["A", "B", "C", "D"], len(tickers)),
+            "shares_num": rng.integers(1, 100, len(tickers)) * 1e6,
+            "ticker": tickers,
+        },
+    )
+    return prices, index, components
+
+
+def _engine(prices: pd.DataFrame, index: pd.Series, components: pd.DataFrame) -> ReturnsEngine:
+    calendar = TradingCalendar(prices.index)
+    rows = {period: calendar.period_rows(period, ASOF) for period in PERIODS}
+    return ReturnsEngine(PriceMatrix.from_frame(prices), index, components, rows)
+
+
+def _baseline(
+    prices: pd.DataFrame,
+    index: pd.Series,
+    components: pd.DataFrame,
+    rows: tuple[int, int],
+) -> tuple[pd.DataFrame, float]:
+    """Returns of a period calculated with pandas, like before the engine."""
+    data = prices.iloc[list(rows)].pct_change().T.iloc[:, [-1]]
+    data.columns = ["returns"]
+    data = data.merge(components.set_index("ticker"), left_index=True, right_index=True)
+    data["curr_prices"] = prices.iloc[-1]
+    data["mkt_cap"] = data.curr_prices * data.shares_num
+    data = data.rename_axis("ticker").reset_index().sort_values("returns", ascending=False)
+    return data, float(index.iloc[list(rows)].pct_change().iloc[-1])
+
+
+@pytest.mark.parametrize("period", PERIODS)
+def test_returns_match_pandas(market, period):
+    prices, index, components = market
+    engine = _engine(prices, index, components)
+
+    data, index_return = engine.get(period)
+    rows = TradingCalendar(prices.index).period_rows(period, ASOF)
+    expected, expected_index_return = _baseline(prices, index, components, rows)
+
+    assert index_return == pytest.approx(expected_index_return)
+    assert data.ticker.tolist() == expected.ticker.tolist()
+    for column in ["returns", "curr_prices", "mkt_cap"]:
+        np.testing.assert_allclose(data[column], expected[column])
+    for column in ["company", "sector", "industry"]:
+        assert data[column].tolist() == expected[column].tolist()
+
+
+def test_view_keeps_returns_of_shared_tickers(market):
+    prices, index, components = market
+    engine = _engine(prices, index, components)
+    sub_components = components.iloc[:10]
+    sub_index = prices[sub_components.ticker].mean(axis=1)
+
+    view = engine.view(sub_index, sub_components, "WIG20")
+    data, index_return = view.get("MTD")
+    rows = TradingCalendar(prices.index).period_rows("MTD", ASOF)
+    expected, expected_index_return = _baseline(prices, sub_index, sub_components, rows)
+
+    assert index_return == pytest.approx(expected_index_return)
+    assert data.ticker.tolist() == expected.ticker.tolist()
+    assert (data.WIG20 == "WIG20").all()
+    # the view does not change the engine it was made of
+    assert len(engine.get("MTD")[0]) == len(components)
+
+
+def test_sector_returns_match_pandas(market):
+    prices, index, components = market
+    engine = _engine(prices, index, components)
+
+    groups = engine.groups("sector")
+    for period in PERIODS:
+        data, _ = engine.get(period)
+        data["weighted"] = data.returns * data.mkt_cap
+        sectors = data.groupby("sector")
+        expected = sectors.weighted.sum() / sectors.mkt_cap.sum()
+
+        ranking = groups.ranking(period).set_index("label")
+        np.testing.assert_allclose(ranking.returns[expected.index], expected)
+        assert ranking.best[expected.index].tolist() == [
+            group.ticker.iloc[group.returns.argmax()] for _, group in sectors
+        ]
+
+
+def test_components_without_return_are_left_out_of_sectors(market):
+    prices, index, components = market
+    # listed a week ago, so it has no return in longer periods
+    prices.iloc[:-5, 0] = np.nan
+    engine = _engine(prices, index, components)
+
+    groups = engine.groups("sector")
+    for period in PERIODS:
+        data, _ = engine.get(period)
+        data = data[data.returns.notna()]
+        sectors = data.assign(weighted=data.returns * data.mkt_cap).groupby("sector")
+
+        ranking = groups.ranking(period).set_index("label").loc[list(sectors.groups)]
+        np.testing.assert_allclose(ranking.returns, sectors.weighted.sum() / sectors.mkt_cap.sum())
+        np.testing.assert_allclose(ranking.mkt_cap, sectors.mkt_cap.sum())
+        assert ranking["count"].tolist() == sectors.size().tolist()
+        assert ranking.contribution.sum() == pytest.approx(
+            (data.returns * data.mkt_cap).sum() / data.mkt_cap.sum(),
+        )
@@ -0,0 +1,73 @@
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from layout_cache import LayoutCache
+from price_matrix import PriceMatrix
+from timelapse import default_bound, frame_specs
+
+DATES = pd.bdate_range("2025-03-03", periods=10, name="Date")
+
+
+@pytest.fixture
+def bot() -> SimpleNamespace:
+    rng = np.random.default_rng(0)
+    tickers = ["AAA", "BBB", "CCC", "DELISTED"]
+    prices = pd.DataFrame(
+        100 * np.exp(rng.normal(0, 0.02, (len(DATES), 3)).cumsum(axis=0)),
+        index=DATES,
+        columns=tickers[:3],
+    )
+    components = pd.DataFrame(
+        {"ticker": tickers, "sector": ["Banks", None, "Banks", "Energy"], "shares_num": 1e6},
+    )
+    return SimpleNamespace(
+        prices=prices,
+        matrix=PriceMatrix.from_frame(prices),
+        components={"WIG": components},
+        index_prices={"WIG": prices.mean(axis=1)},
+        _index_config=lambda index: SimpleNamespace(title=f"{index} Index"),
+        _heatmap_texts=lambda period, index: ("", "", ("", "@bot", "source")),
+    )
+
+
+def test_default_bound():
+    assert default_bound(date(2025, 3, 3), date(2025, 3, 7)) == 0.1
+    assert default_bound(date(2025, 1, 1), date(2025, 3, 31)) == 0.3
+    assert default_bound(date(2024, 1, 1), date(2025, 1, 1)) == 0.5
+
+
+def test_frames_have_returns_since_the_day_before_start(bot):
+    layouts = LayoutCache(directory=None)
+
+    specs = list(
+        frame_specs(bot, "WIG", date(2025, 3, 5), date(2025, 3, 11), 0.1, layouts, (640, 360)),
+    )
+
+    prices = bot.prices
+    assert len(specs) == 5
+    for spec, day in zip(specs, prices.index[2:7], strict=True):
+        np.testing.assert_allclose(spec.returns, prices.loc[day] / prices.iloc[1] - 1)
+        np.testing.assert_allclose(spec.mkt_cap, prices.loc[day] * 1e6)
+        assert spec.subtitle.startswith(f"{day:%Y/%m/%d} ⁕ ")
+    # one geometry for all frames, components without prices are left out
+    assert all(spec.layout is specs[0].layout for spec in specs)
+    assert specs[0].tickers.tolist() == ["AAA", "BBB", "CCC"]
+    assert specs[0].footer == ("2025/03/04 - 2025/03/11", "@bot", "source")
+    assert layouts.misses == 1
+
+
+def test_range_without_sessions_fails(bot):
+    with pytest.raises(ValueError, match="no sessions"):
+        frame_specs(
+            bot,
+            "WIG",
+            date(2025, 3, 8),
+            date(2025, 3, 9),
+            0.1,
+            LayoutCache(directory=None),
+            (640, 360),
+        )
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from treemap import (
+    HeatmapSpec,
+    compute_layout,
+    draw_heatmap,
+    fit_glyphs,
+    squarify,
+    values_to_colors,
+)
+
+TICKERS = np.array(["AAA", "BBB", "CCC", "DDD", "EEE"])
+SECTORS = np.array(["Banks", "Banks", "Energy", "Retail", "Energy"])
+MKT_CAP = np.array([500.0, 300.0, 100.0, 50.0, 50.0])
+
+
+def _inside(inner: np.ndarray, outer: np.ndarray) -> bool:
+    eps = 1e-6
+    return (
+        inner[0] >= outer[0] - eps
+        and inner[1] >= outer[1] - eps
+        and inner[0] + inner[2] <= outer[0] + outer[2] + eps
+        and inner[1] + inner[3] <= outer[1] + outer[3] + eps
+    )
+
+
+def test_squarify_areas_are_proportional_to_values():
+    values = np.array([6.0, 6.0, 4.0, 3.0, 2.0, 2.0, 1.0])
+    rect = np.array([10.0, 20.0, 600.0, 400.0])
+
+    rects = squarify(values, rect)
+
+    np.testing.assert_allclose(rects[:, 2] * rects[:, 3], values / values.sum() * 600 * 400)
+    assert all(_inside(tile, rect) for tile in rects)
+    # tiles do not overlap, so with their areas they cover the whole rectangle
+    for i in range(len(rects)):
+        for j in range(i + 1, len(rects)):
+            overlap_w = min(rects[i, 0] + rects[i, 2], rects[j, 0] + rects[j, 2]) - max(
+                rects[i, 0],
+                rects[j, 0],
+            )
+            overlap_h = min(rects[i, 1] + rects[i, 3], rects[j, 1] + rects[j, 3]) - max(
+                rects[i, 1],
+                rects[j, 1],
+            )
+            assert min(overlap_w, overlap_h) < 1e-6
+
+
+def test_squarify_nothing_to_split():
+    assert not squarify(np.array([0.0, 0.0]), np.array([0, 0, 10, 10])).any()
+
+
+def test_tickers_are_laid_out_in_their_sectors():
+    layout = compute_layout(TICKERS, SECTORS, MKT_CAP, 768, 432)
+
+    assert layout.sectors.tolist() == ["Banks", "Energy", "Retail"]
+    assert layout.tickers.tolist() == ["AAA", "BBB", "CCC", "EEE", "DDD"]
+    for rect, sector in zip(layout.ticker_rects, layout.ticker_sector, strict=True):
+        assert _inside(rect, layout.sector_rects[sector])
+    np.testing.assert_array_equal(layout.positions(np.array(["DDD", "ZZZ"])), [4, -1])
+
+
+def test_values_to_colors():
+    colors = values_to_colors(np.array([-0.03, 0.0, 0.03, np.nan, 0.5]), (-0.03, 0.03))
+
+    assert colors.tolist() == [[204, 0, 0], [41, 41, 41], [0, 204, 0], [41, 41, 41], [0, 204, 0]]
+
+
+def test_symbols_without_glyph_are_substituted():
+    assert fit_glyphs("⁕ Wzrost spółek", "regular") == "* Wzrost spółek"
+
+
+@pytest.mark.parametrize("size", [(768, 432), (1600, 900)])
+def test_heatmap_is_drawn_in_its_size(size):
+    spec = HeatmapSpec(
+        tickers=TICKERS,
+        sectors=SECTORS,
+        mkt_cap=MKT_CAP,
+        returns=np.array([0.01, -0.02, np.nan, 0.0, 0.05]),
+        prices=np.array([10.0, 20.0, 30.0, 40.0, 50.0]),
+        bound=0.03,
+        title="WIG Index 1D: +0.50%",
+        subtitle="⁕ Spółki",
+        footer=("źródło", "", "@bot"),
+        width=size[0],
+        height=size[1],
+    )
+
+    image = draw_heatmap(spec)
+
+    assert image.size == size
+    assert image.mode == "RGB"
@@ -0,0 +1,360 @@
+"""Heatmap timelapses.
+
+Shows how the treemap of an index evolved session by session, e.g. over a
+week, a month or a year. Cumulative returns of every frame are calculated
+from loaded prices in one vectorized gather, the geometry of tiles is solved
+once and kept for all frames, frames are drawn by the pool of rendering
+processes and streamed to ffmpeg, so no more than a few frames are held in
+memory at once.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import shutil
+import subprocess
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from instrumentation import TRACER, count, span
+
+if TYPE_CHECKING:
+    from layout_cache import LayoutCache
+    from main import TwitterBot
+    from render import HeatmapRenderer
+    from treemap import HeatmapSpec
+
+# ffmpeg output options, the last frame is held so the final state can be read
+FORMATS = {
+    "mp4": ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "20", "-movflags", "+faststart"],
+    "gif": [],
+    "webp": ["-c:v", "libwebp_anim", "-quality", "75", "-loop", "0"],
+}
+GIF_FILTER = "split[a][b];[a]palettegen=stats_mode=diff[p];[b][p]paletteuse=dither=none"
+SIZES = {"mp4": (1920, 1080), "gif": (960, 540), "webp": (1280, 720)}
+
+# prices of a few days before the first frame are needed for its returns
+HISTORY = timedelta(days=10)
+
+# colour bound by length of the range, like colour bounds of periods
+BOUNDS = ((timedelta(days=7), 0.1), (timedelta(days=31), 0.2), (timedelta(days=92), 0.3))
+MAX_BOUND = 0.5
+
+
+@dataclass
+class TimelapseReport:
+    """Encoded timelapse.
+
+    Attributes:
+        path (str): path of the video
+        frames (int): number of frames
+        seconds (float): wall time of drawing and encoding
+        size (int): size of the video in bytes
+
+    """
+
+    path: str
+    frames: int
+    seconds: float
+    size: int
+
+    @property
+    def fps(self) -> float:
+        """Frames drawn and encoded per second of wall time."""
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+def default_bound(start: date, end: date) -> float:
+    """Get return at the ends of the colour scale of a range.
+
+    Args:
+        start (date): first day
+        end (date): last day
+
+    Returns:
+        float: colour bound
+
+    """
+    for length, bound in BOUNDS:
+        if end - start <= length:
+            return bound
+    return MAX_BOUND
+
+
+def cumulative_returns(values: np.ndarray, base: int, rows: np.ndarray) -> np.ndarray:
+    """Get returns since the base row of every frame row.
+
+    Args:
+        values (np.ndarray): prices with rows of dates and columns of tickers
+        base (int): row of the bar before the first frame
+        rows (np.ndarray): rows of frames
+
+    Returns:
+        np.ndarray: returns with rows of frames and columns of tickers
+
+    """
+    return values[rows] / values[base] - 1
+
+
+def frame_specs(
+    bot: TwitterBot,
+    index: str,
+    start: date,
+    end: date,
+    bound: float,
+    layouts: LayoutCache,
+    size: tuple[int, int],
+) -> Iterator[HeatmapSpec]:
+    """Get heatmaps of every session between two dates with one fixed geometry.
+
+    Returns and market caps of all frames are gathered at once, heatmaps
+    are made lazily. Tiles are laid out by market caps of the last frame.
+
+    Args:
+        bot (TwitterBot): bot with loaded data
+        index (str): name of the index
+        start (date): first day, inclusive
+        end (date): last day, inclusive
+        bound (float): return at the ends of the colour scale
+        layouts (LayoutCache): cache of treemap layouts
+        size (tuple[int, int]): width and height of frames
+
+    Raises:
+        ValueError: no sessions in the range
+
+    Returns:
+        Iterator[HeatmapSpec]: heatmaps in order of sessions
+
+    """
+    from treemap import HeatmapSpec
+
+    dates = bot.prices.index
+    rows = np.flatnonzero((dates.date >= start) & (dates.date <= end))
+    if not len(rows):
+        msg = f"no sessions between {start} and {end} in loaded prices"
+        raise ValueError(msg)
+    base = max(int(rows[0]) - 1, 0)
+
+    components = bot.components[index]
+    columns = bot.matrix.codes(components.ticker)
+    components = components[columns >= 0]
+    columns = columns[columns >= 0]
+    tickers = components.ticker.to_numpy(dtype=str)
+    sectors = components.sector.fillna("").to_numpy(dtype=str)
+    values = bot.matrix.values[:, columns].astype(np.float64, copy=False)
+
+    returns = cumulative_returns(values, base, rows)
+    prices = values[rows]
+    mkt_cap = prices * components.shares_num.to_numpy(dtype=np.float64)
+    index_values = bot.index_prices[index].to_numpy(dtype=np.float64)
+    index_returns = cumulative_returns(index_values, base, rows)
+
+    width, height = size
+    layout = layouts.get(tickers, sectors, mkt_cap[-1], width, height)
+    title = bot._index_config(index).title  # noqa: SLF001
+    _, _, (_, handle, source) = bot._heatmap_texts("1D", index)  # noqa: SLF001
+    footer = (f"{dates[base]:%Y/%m/%d} - {dates[rows[-1]]:%Y/%m/%d}", handle, source)
+
+    def specs() -> Iterator[HeatmapSpec]:
+        for frame, row in enumerate(rows):
+            yield HeatmapSpec(
+                tickers=tickers,
+                sectors=sectors,
+                mkt_cap=mkt_cap[frame],
+                returns=returns[frame],
+                prices=prices[frame],
+                bound=bound,
+                title=title,
+                subtitle=f"{dates[row]:%Y/%m/%d} ⁕ {index_returns[frame]:+.2%}",
+                footer=footer,
+                root=index,
+                width=width,
+                height=height,
+                layout=layout,
+            )
+
+    return specs()
+
+
+class _FFmpeg:
+    """Encoder reading raw RGB frames from a pipe."""
+
+    def __init__(
+        self,
+        path: Path,
+        fmt: str,
+        size: tuple[int, int],
+        fps: float,
+        hold: float,
+    ) -> None:
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            msg = "ffmpeg not found, install it to encode timelapses"
+            raise FileNotFoundError(msg)
+
+        video_filter = f"tpad=stop_mode=clone:stop_duration={hold}"
+        if fmt == "gif":
+            video_filter += f",{GIF_FILTER}"
+        width, height = size
+        command = [
+            ffmpeg,
+            *("-y", "-loglevel", "error"),
+            *("-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}"),
+            *("-framerate", str(fps), "-i", "-"),
+            *("-vf", video_filter),
+            *FORMATS[fmt],
+            str(path),
+        ]
+        self.process = subprocess.Popen(  # noqa: S603
+            command,
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def write(self, frame: bytes) -> None:
+        # a broken pipe means ffmpeg exited, close tells why
+        self.process.stdin.write(frame)
+
+    def close(self) -> None:
+        _, stderr = self.process.communicate()
+        if self.process.returncode != 0:
+            msg = f"ffmpeg failed: {stderr.decode(errors='replace').strip()}"
+            raise RuntimeError(msg)
+
+
+def load_history(bot: TwitterBot, start: date) -> None:
+    """Load data of timelapses starting on a day, with prices of a few days before it.
+
+    Args:
+        bot (TwitterBot): bot to load data of
+        start (date): first day of timelapses
+
+    """
+    bot.load_data(start=datetime.combine(start, datetime.min.time()) - HISTORY)
+
+
+def timelapse_renderer(bot: TwitterBot) -> HeatmapRenderer:
+    """Get a native renderer drawing frames of timelapses, shared by videos of all indices.
+
+    Args:
+        bot (TwitterBot): bot with the number of rendering processes and data directory
+
+    Returns:
+        HeatmapRenderer: renderer to close after the last video
+
+    """
+    from layout_cache import LayoutCache
+    from render import HeatmapRenderer
+
+    layouts = LayoutCache(bot.data_dir / "layouts")
+    return HeatmapRenderer(workers=bot.render_workers, backend="native", layouts=layouts)
+
+
+def timelapse(
+    bot: TwitterBot,
+    start: date,
+    end: date,
+    output: str | Path = "archive",
+    index: str | None = None,
+    fmt: str = "mp4",
+    fps: float = 4.0,
+    hold: float = 2.0,
+    bound: float | None = None,
+    renderer: HeatmapRenderer | None = None,
+) -> TimelapseReport:
+    """Draw the treemap of every session between two dates and encode them as a video.
+
+    Returns of every frame are cumulative since the last session before start.
+    Data is loaded only if the bot has none loaded, see load_history, so videos
+    of many indices share one download. Nothing is posted.
+
+    Args:
+        bot (TwitterBot): bot with indices and rendering processes to use
+        start (date): first day, inclusive
+        end (date): last day, inclusive
+        output (str | Path, optional): output directory. Defaults to "archive".
+        index (str | None, optional): name of the index. Defaults to the first one.
+        fmt (str, optional): one of 'mp4', 'gif', 'webp'. Defaults to "mp4".
+        fps (float, optional): frames per second of the video. Defaults to 4.0.
+        hold (float, optional): seconds the last frame is shown for. Defaults to 2.0.
+        bound (float | None, optional): return at the ends of the colour scale.
+            Defaults to a bound by length of the range.
+        renderer (HeatmapRenderer | None, optional): native renderer of frames, left open.
+            Defaults to a timelapse_renderer closed after the video.
+
+    Raises:
+        ValueError: unknown format or no sessions in the range
+        FileNotFoundError: ffmpeg is not installed
+        RuntimeError: ffmpeg failed
+
+    Returns:
+        TimelapseReport: path, number of frames and throughput
+
+    """
+    if fmt not in FORMATS:
+        msg = f"format {fmt} not available, use one of {list(FORMATS)}"
+        raise ValueError(msg)
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    config = bot._index_config(index)  # noqa: SLF001
+    path = output / f"{config.name.lower()}_{start:%Y-%m-%d}_{end:%Y-%m-%d}.{fmt}"
+    width, height = SIZES[fmt]
+
+    owned = renderer is None
+    renderer = renderer or timelapse_renderer(bot)
+    try:
+        with span("timelapse", profile=False):
+            if not bot.data_loaded:
+                load_history(bot, start)
+
+            specs = frame_specs(
+                bot,
+                config.name,
+                start,
+                end,
+                bound or default_bound(start, end),
+                renderer.layouts,
+                (width, height),
+            )
+            began = time.perf_counter()
+            frames = renderer.frames(specs)
+            # ffmpeg is started after rendering processes are forked, otherwise they
+            # would inherit its input and it would never see the end of frames,
+            # processes of a shared renderer were forked before the first video
+            first = next(frames)
+            encoder = _FFmpeg(path, fmt, (width, height), fps, hold)
+            n_frames = 0
+            try:
+                for frame in itertools.chain([first], frames):
+                    encoder.write(frame)
+                    n_frames += 1
+            finally:
+                encoder.close()
+            seconds = time.perf_counter() - began
+            count("frames", n_frames)
+            count("video_bytes", path.stat().st_size)
+    finally:
+        if owned:
+            renderer.close()
+        TRACER.flush()
+
+    report = TimelapseReport(
+        path=str(path),
+        frames=n_frames,
+        seconds=seconds,
+        size=path.stat().st_size,
+    )
+    info = (
+        f"timelapse {report.path}: {report.frames} frames in {report.seconds:.1f}s, "
+        f"{report.fps:.2f} fps with {bot.render_workers} workers, {report.size / 1e6:.1f} MB"
+    )
+    logging.info(info)
+    return report
@@ -0,0 +1,569 @@
+"""Native treemap renderer.
+
+Computes the squarified index -> sector -> ticker layout in NumPy and draws
+the heatmap with Pillow, without plotly, Kaleido and a headless browser.
+The image follows the plotly heatmap made by TwitterBot.build_heatmap_figure.
+"""
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+BACKGROUND = (26, 26, 26)  # #1a1a1a
+LINE_COLOR = (46, 46, 46)  # #2e2e2e
+COLOR_SCALE = np.array([[204, 0, 0], [41, 41, 41], [0, 204, 0]], dtype=np.float64)
+
+FONT_FILES = {
+    "regular": (
+        "Times New Roman.ttf",
+        "times.ttf",
+        "LiberationSerif-Regular.ttf",
+        "DejaVuSerif.ttf",
+    ),
+    "bold": (
+        "Times New Roman Bold.ttf",
+        "timesbd.ttf",
+        "LiberationSerif-Bold.ttf",
+        "DejaVuSerif-Bold.ttf",
+    ),
+    "italic": (
+        "Times New Roman Italic.ttf",
+        "timesi.ttf",
+        "LiberationSerif-Italic.ttf",
+        "DejaVuSerif-Italic.ttf",
+    ),
+}
+# letters of company and sector names, a font lacking any of them is skipped
+REQUIRED_GLYPHS = "ąćęłńóśźżĄĆĘŁŃÓŚŹŻ%+-.0123456789"
+# symbols of subtitles replaced when the font has no glyph for them, serif fonts lack "⁕"
+GLYPH_SUBSTITUTES = {"⁕": "*"}
+
+# sizes in pixels of a 7680x4320 image, scaled for other sizes
+MARGIN = {"t": 350, "l": 5, "r": 5, "b": 120}
+HEADER = 110
+PAD = 6
+CORNER_RADIUS = 25
+LINE_WIDTH = 3
+MAX_LABEL_SIZE = 140
+MIN_LABEL_SIZE = 9
+
+
+@dataclass
+class TreemapLayout:
+    """Geometry of a treemap, rectangles are rows of (x, y, width, height).
+
+    Attributes:
+        root_rect (np.ndarray): rectangle of the root
+        sectors (np.ndarray): sector names
+        sector_rects (np.ndarray): rectangles of sectors
+        tickers (np.ndarray): tickers in order of ticker_rects
+        ticker_sector (np.ndarray): position of the sector of every ticker
+        ticker_rects (np.ndarray): rectangles of tickers
+
+    """
+
+    root_rect: np.ndarray
+    sectors: np.ndarray
+    sector_rects: np.ndarray
+    tickers: np.ndarray
+    ticker_sector: np.ndarray
+    ticker_rects: np.ndarray
+
+    def positions(self, tickers: np.ndarray) -> np.ndarray:
+        """Get positions of tickers in the layout.
+
+        Args:
+            tickers (np.ndarray): tickers
+
+        Returns:
+            np.ndarray: position of every ticker in ticker_rects, -1 if it is not in the layout
+
+        """
+        order = np.argsort(self.tickers)
+        found = np.searchsorted(self.tickers, tickers, sorter=order)
+        found = np.clip(found, 0, len(order) - 1)
+        positions = order[found]
+        return np.where(self.tickers[positions] == tickers, positions, -1)
+
+
+@dataclass
+class HeatmapSpec:
+    """Everything needed to draw a heatmap, picklable for worker processes.
+
+    Attributes:
+        tickers (np.ndarray): tickers of components
+        sectors (np.ndarray): sectors of components
+        mkt_cap (np.ndarray): market caps, sizes of tiles
+        returns (np.ndarray): returns, colors of tiles
+        prices (np.ndarray): current prices
+        bound (float): return at the ends of the color scale
+        title (str): title of the image
+        subtitle (str): subtitle of the image
+        footer (tuple[str, str, str]): texts at the bottom left, center and right
+        root (str): label of the treemap root
+        width (int): width of the image
+        height (int): height of the image
+        layout (TreemapLayout | None): precomputed geometry, e.g. from a LayoutCache
+        colors (np.ndarray | None): values colouring tiles instead of returns, e.g. volatility
+        color_range (tuple[float, float] | None): values at the red and green ends of the
+            color scale, (-bound, bound) if missing
+
+    """
+
+    tickers: np.ndarray
+    sectors: np.ndarray
+    mkt_cap: np.ndarray
+    returns: np.ndarray
+    prices: np.ndarray
+    bound: float
+    title: str
+    subtitle: str
+    footer: tuple[str, str, str]
+    root: str = "WIG"
+    width: int = 7680
+    height: int = 4320
+    layout: TreemapLayout | None = None
+    colors: np.ndarray | None = None
+    color_range: tuple[float, float] | None = None
+
+    @property
+    def color_scale(self) -> tuple[float, float]:
+        """Values at the red and green ends of the color scale."""
+        return self.color_range or (-self.bound, self.bound)
+
+
+def _worst_ratio(row: np.ndarray, side: float) -> float:
+    total = row.sum()
+    return max(side**2 * row.max() / total**2, total**2 / (side**2 * row.min()))
+
+
+def squarify(values: np.ndarray, rect: np.ndarray) -> np.ndarray:
+    """Split a rectangle into rectangles with areas proportional to values.
+
+    Squarified treemap algorithm of Bruls, Huizing and van Wijk.
+    Values have to be sorted descending.
+
+    Args:
+        values (np.ndarray): positive sizes
+        rect (np.ndarray): (x, y, width, height) to split
+
+    Returns:
+        np.ndarray: rectangles in order of values
+
+    """
+    x, y, w, h = (float(v) for v in rect)
+    n = len(values)
+    rects = np.zeros((n, 4))
+    if n == 0 or w <= 0 or h <= 0 or values.sum() <= 0:
+        return rects
+
+    areas = np.asarray(values, dtype=np.float64) * (w * h / values.sum())
+    i = 0
+    while i < n:
+        side = min(w, h)
+        end = i + 1
+        worst = _worst_ratio(areas[i:end], side)
+        while end < n:
+            ratio = _worst_ratio(areas[i : end + 1], side)
+            if ratio > worst:
+                break
+            worst = ratio
+            end += 1
+
+        row = areas[i:end]
+        offsets = np.concatenate(([0.0], np.cumsum(row)[:-1]))
+        if w >= h:  # stack row vertically at the left side
+            row_w = row.sum() / h
+            rects[i:end] = np.column_stack(
+                (np.full(end - i, x), y + offsets / row_w, np.full(end - i, row_w), row / row_w),
+            )
+            x, w = x + row_w, w - row_w
+        else:  # stack row horizontally at the top
+            row_h = row.sum() / w
+            rects[i:end] = np.column_stack(
+                (x + offsets / row_h, np.full(end - i, y), row / row_h, np.full(end - i, row_h)),
+            )
+            y, h = y + row_h, h - row_h
+        i = end
+
+    return rects
+
+
+def _inset(rect: np.ndarray, pad: float, header: float = 0) -> np.ndarray:
+    x, y, w, h = rect
+    return np.array([x + pad, y + pad + header, max(w - 2 * pad, 0), max(h - 2 * pad - header, 0)])
+
+
+def compute_layout(
+    tickers: np.ndarray,
+    sectors: np.ndarray,
+    mkt_cap: np.ndarray,
+    width: int = 7680,
+    height: int = 4320,
+) -> TreemapLayout:
+    """Compute root -> sector -> ticker squarified layout.
+
+    Args:
+        tickers (np.ndarray): tickers of components
+        sectors (np.ndarray): sectors of components
+        mkt_cap (np.ndarray): market caps, sizes of tiles
+        width (int, optional): width of the image. Defaults to 7680.
+        height (int, optional): height of the image. Defaults to 4320.
+
+    Returns:
+        TreemapLayout: geometry of the treemap
+
+    """
+    scale = width / 7680
+    tickers = np.asarray(tickers, dtype=str)
+    sectors = np.asarray(sectors, dtype=str)
+    mkt_cap = np.nan_to_num(np.asarray(mkt_cap, dtype=np.float64)).clip(min=0)
+
+    root_rect = np.array(
+        [
+            MARGIN["l"] * scale,
+            MARGIN["t"] * scale,
+            width - (MARGIN["l"] + MARGIN["r"]) * scale,
+            height - (MARGIN["t"] + MARGIN["b"]) * scale,
+        ],
+    )
+
+    sector_names, sector_codes = np.unique(sectors, return_inverse=True)
+    sector_caps = np.bincount(sector_codes, weights=mkt_cap, minlength=len(sector_names))
+    sector_order = np.argsort(-sector_caps, kind="stable")
+    sector_rects = squarify(
+        sector_caps[sector_order],
+        _inset(root_rect, PAD * scale, HEADER * scale),
+    )
+
+    ticker_rects = np.zeros((len(tickers), 4))
+    ticker_order = []
+    for rect, code in zip(sector_rects, sector_order, strict=True):
+        members = np.flatnonzero(sector_codes == code)
+        members = members[np.argsort(-mkt_cap[members], kind="stable")]
+        ticker_rects[members] = squarify(
+            mkt_cap[members],
+            _inset(rect, PAD * scale, HEADER * scale),
+        )
+        ticker_order.append(members)
+
+    order = np.concatenate(ticker_order) if ticker_order else np.array([], dtype=int)
+    sector_position = np.empty(len(sector_names), dtype=int)
+    sector_position[sector_order] = np.arange(len(sector_names))
+
+    return TreemapLayout(
+        root_rect=root_rect,
+        sectors=sector_names[sector_order],
+        sector_rects=sector_rects,
+        tickers=tickers[order],
+        ticker_sector=sector_position[sector_codes[order]],
+        ticker_rects=ticker_rects[order],
+    )
+
+
+def values_to_colors(values: np.ndarray, scale: tuple[float, float]) -> np.ndarray:
+    """Map values to the red - grey - green color scale.
+
+    Args:
+        values (np.ndarray): values, missing ones are grey
+        scale (tuple[float, float]): values at the red and green ends,
+            red is the greater one for scales where lower is better
+
+    Returns:
+        np.ndarray: uint8 RGB colors
+
+    """
+    low, high = scale
+    middle, half = (low + high) / 2, (high - low) / 2
+    values = np.asarray(values, dtype=np.float64)
+    position = np.nan_to_num((values - middle) / half).clip(-1, 1)
+    lower = np.where(position < 0, 0, 1)
+    weight = np.abs(position)[:, None]
+    colors = COLOR_SCALE[1] + (COLOR_SCALE[lower * 2] - COLOR_SCALE[1]) * weight
+    return colors.round().astype(np.uint8)
+
+
+def _has_glyph(font: ImageFont.FreeTypeFont, char: str) -> bool:
+    # characters without a glyph are drawn as the .notdef box of a private use character
+    notdef = font.getmask("\U0010fffd")
+    mask = font.getmask(char)
+    return mask.size != notdef.size or bytes(mask) != bytes(notdef)
+
+
+@lru_cache(maxsize=4)
+def _font_file(style: str) -> tuple[str, dict[int, str]]:
+    """Find a serif font file covering Polish letters.
+
+    Files of the regular style are tried after files of the style, e.g. when
+    DejaVu Serif is installed without its italic.
+
+    Args:
+        style (str): one of 'regular', 'bold', 'italic'
+
+    Raises:
+        FileNotFoundError: no font file with glyphs of all required letters is installed
+
+    Returns:
+        tuple[str, dict[int, str]]: font file and translation table of symbols it lacks
+
+    """
+    files = dict.fromkeys(FONT_FILES[style] + FONT_FILES["regular"])
+    for file in files:
+        try:
+            font = ImageFont.truetype(file, 40)
+        except OSError:
+            continue
+        required = REQUIRED_GLYPHS + "".join(GLYPH_SUBSTITUTES.values())
+        if all(_has_glyph(font, char) for char in required):
+            substitutes = {
+                symbol: substitute
+                for symbol, substitute in GLYPH_SUBSTITUTES.items()
+                if not _has_glyph(font, symbol)
+            }
+            return file, str.maketrans(substitutes)
+        info = f"font {file} lacks Polish letters, skipping it"
+        logging.warning(info)
+    msg = f"none of fonts {list(files)} covering {REQUIRED_GLYPHS} is installed"
+    raise FileNotFoundError(msg)
+
+
+@lru_cache(maxsize=512)
+def get_font(style: str, size: int) -> ImageFont.FreeTypeFont:
+    """Get a serif font with glyphs of Polish letters.
+
+    Args:
+        style (str): one of 'regular', 'bold', 'italic'
+        size (int): size in pixels
+
+    Returns:
+        ImageFont.FreeTypeFont: font
+
+    """
+    return ImageFont.truetype(_font_file(style)[0], size)
+
+
+def fit_glyphs(text: str, style: str) -> str:
+    """Replace symbols without a glyph in the font of the style.
+
+    Args:
+        text (str): text to draw
+        style (str): one of 'regular', 'bold', 'italic'
+
+    Returns:
+        str: text with symbols from GLYPH_SUBSTITUTES replaced where needed
+
+    """
+    return text.translate(_font_file(style)[1])
+
+
+def _text_width(text: str, style: str, size: int) -> float:
+    return get_font(style, size).getlength(fit_glyphs(text, style))
+
+
+def _draw_label(
+    draw: ImageDraw.ImageDraw,
+    rect: np.ndarray,
+    lines: list[tuple[str, str, float]],
+) -> None:
+    """Draw centered multiline label fitted into a rectangle.
+
+    Args:
+        draw (ImageDraw.ImageDraw): canvas
+        rect (np.ndarray): (x, y, width, height)
+        lines (list[tuple[str, str, float]]): text, font style and relative size of every line
+
+    """
+    x, y, w, h = rect
+    base = 100
+    block_w = max(_text_width(text, style, int(base * rel)) for text, style, rel in lines)
+    block_h = sum(rel for _, _, rel in lines) * 1.2 * base
+    size = min(MAX_LABEL_SIZE, base * 0.85 * w / max(block_w, 1), base * 0.85 * h / block_h)
+    if size < MIN_LABEL_SIZE:
+        return
+
+    line_y = y + (h - block_h * size / base) / 2
+    for text, style, rel in lines:
+        line_size = max(int(size * rel), 1)
+        draw.text(
+            (x + w / 2, line_y + line_size * 0.6),
+            fit_glyphs(text, style),
+            fill="white",
+            font=get_font(style, line_size),
+            anchor="mm",
+        )
+        line_y += line_size * 1.2
+
+
+def render_heatmap(spec: HeatmapSpec, path: str, layout: TreemapLayout | None = None) -> None:
+    """Draw the heatmap and save it.
+
+    Args:
+        spec (HeatmapSpec): data and texts of the heatmap
+        path (str): filename with extension
+        layout (TreemapLayout | None, optional): precomputed geometry.
+            Defaults to spec.layout, computed if it is missing too.
+
+    """
+    draw_heatmap(spec, layout).save(path)
+
+
+def draw_heatmap(spec: HeatmapSpec, layout: TreemapLayout | None = None) -> Image.Image:
+    """Draw the heatmap.
+
+    Args:
+        spec (HeatmapSpec): data and texts of the heatmap
+        layout (TreemapLayout | None, optional): precomputed geometry.
+            Defaults to spec.layout, computed if it is missing too.
+
+    Returns:
+        Image.Image: RGB image of spec.width x spec.height
+
+    """
+    if layout is None:
+        layout = spec.layout
+    if layout is None:
+        layout = compute_layout(spec.tickers, spec.sectors, spec.mkt_cap, spec.width, spec.height)
+
+    scale = spec.width / 7680
+    image = Image.new("RGB", (spec.width, spec.height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    positions = layout.positions(np.asarray(spec.tickers, dtype=str))
+    in_layout = positions >= 0
+    returns = np.full(len(layout.tickers), np.nan)
+    returns[positions[in_layout]] = np.asarray(spec.returns, dtype=np.float64)[in_layout]
+    prices = np.full(len(layout.tickers), np.nan)
+    prices[positions[in_layout]] = np.asarray(spec.prices, dtype=np.float64)[in_layout]
+    mkt_cap = np.zeros(len(layout.tickers))
+    mkt_cap[positions[in_layout]] = np.asarray(spec.mkt_cap, dtype=np.float64)[in_layout]
+    values = returns
+    if spec.colors is not None:
+        values = np.full(len(layout.tickers), np.nan)
+        values[positions[in_layout]] = np.asarray(spec.colors, dtype=np.float64)[in_layout]
+
+    # parents are coloured with cap weighted values of their children
+    weights = np.where(np.isnan(values), 0, mkt_cap)
+    weighted = np.nan_to_num(values) * weights
+    sector_values = np.bincount(
+        layout.ticker_sector,
+        weights=weighted,
+        minlength=len(layout.sectors),
+    )
+    sector_values /= np.bincount(
+        layout.ticker_sector,
+        weights=weights,
+        minlength=len(layout.sectors),
+    ).clip(min=1e-12)
+    root_value = weighted.sum() / max(weights.sum(), 1e-12)
+
+    radius = CORNER_RADIUS * scale
+    line_width = max(round(LINE_WIDTH * scale), 1)
+    header = HEADER * scale
+
+    def tile(rect: np.ndarray, color: np.ndarray) -> None:
+        x, y, w, h = rect
+        x0, y0, x1, y1 = round(x), round(y), round(x + w), round(y + h)
+        if x1 - x0 < 1 or y1 - y0 < 1:
+            return
+        fill = tuple(int(c) for c in color)
+        if min(x1 - x0, y1 - y0) <= 4 * line_width:  # too small for rounded corners and outline
+            draw.rectangle((x0, y0, x1, y1), fill=fill)
+            return
+        draw.rounded_rectangle(
+            (x0, y0, x1, y1),
+            radius=int(min(radius, (x1 - x0) / 2 - 1, (y1 - y0) / 2 - 1)),
+            fill=fill,
+            outline=LINE_COLOR,
+            width=line_width,
+        )
+
+    def header_text(rect: np.ndarray, text: str) -> None:
+        x, y, w, _ = rect
+        size = int(min(header * 0.8, 0.9 * w / max(_text_width(text, "regular", 100), 1) * 100))
+        if size >= MIN_LABEL_SIZE:
+            draw.text(
+                (x + w / 2, y + header / 2 + PAD * scale),
+                fit_glyphs(text, "regular"),
+                fill="white",
+                font=get_font("regular", size),
+                anchor="mm",
+            )
+
+    tile(layout.root_rect, values_to_colors(np.array([root_value]), spec.color_scale)[0])
+    header_text(layout.root_rect, spec.root)
+
+    sector_colors = values_to_colors(sector_values, spec.color_scale)
+    for rect, name, color in zip(layout.sector_rects, layout.sectors, sector_colors, strict=True):
+        tile(rect, color)
+        header_text(rect, name)
+
+    ticker_colors = values_to_colors(values, spec.color_scale)
+    for rect, ticker, ret, price, value, color in zip(
+        layout.ticker_rects,
+        layout.tickers,
+        returns,
+        prices,
+        values,
+        ticker_colors,
+        strict=True,
+    ):
+        if np.isnan(ret):
+            continue
+        tile(rect, color)
+        lines = [
+            (ticker, "regular", 1.0),
+            (f"{ret:.2%}", "bold", 1.0),
+            (f"{price:.2f} zł", "italic", 0.7),
+        ]
+        # the value colouring the tile is shown too unless it is the return
+        if spec.colors is not None and not np.isnan(value):
+            lines.append((f"{value:.1%}", "italic", 0.7))
+        _draw_label(draw, rect, lines)
+
+    _draw_colorbar(image, spec, scale)
+    _draw_texts(draw, spec, scale)
+
+    return image
+
+
+def _draw_colorbar(image: Image.Image, spec: HeatmapSpec, scale: float) -> None:
+    x0, x1 = MARGIN["l"] * scale, spec.width - MARGIN["r"] * scale
+    y0, y1 = 30 * scale, 205 * scale
+    low, high = spec.color_scale
+    steps = np.linspace(low, high, max(int(x1 - x0), 2))
+    colors = values_to_colors(steps, spec.color_scale)
+    gradient = Image.fromarray(np.repeat(colors[None, :, :], max(int(y1 - y0), 1), axis=0), "RGB")
+    image.paste(gradient, (int(x0), int(y0)))
+
+    draw = ImageDraw.Draw(image)
+    font = get_font("regular", int(125 * scale))
+    draw.text((x0 + 60 * scale, y1), f"{low:.0%}", fill="white", font=font, anchor="ld")
+    draw.text((x1 - 60 * scale, y1), f"{high:.0%}", fill="white", font=font, anchor="rd")
+
+
+def _draw_texts(draw: ImageDraw.ImageDraw, spec: HeatmapSpec, scale: float) -> None:
+    draw.text(
+        (spec.width / 2, 117 * scale),
+        fit_glyphs(spec.title, "regular"),
+        fill="white",
+        font=get_font("regular", int(170 * scale)),
+        anchor="mm",
+    )
+    draw.text(
+        (spec.width / 2, 290 * scale),
+        fit_glyphs(spec.subtitle, "regular"),
+        fill="white",
+        font=get_font("regular", int(110 * scale)),
+        anchor="mm",
+    )
+
+    # annotations are white with 0.7 opacity over the background
+    faded = tuple(int(0.7 * 255 + 0.3 * c) for c in BACKGROUND)
+    font = get_font("regular", int(80 * scale))
+    y = spec.height - 60 * scale
+    for x, text in zip((0.1, 0.5, 0.9), spec.footer, strict=True):
+        text = fit_glyphs(text, "regular")
+        draw.text((spec.width * x, y), text, fill=faded, font=font, anchor="mm")